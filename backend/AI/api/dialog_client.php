@@ -0,0 +1,132 @@
+<?php
+/**
+ * Client for the long-lived Python dialog server (core/dialog_server.py)
+ * Requests are sent as one JSON line over a Unix socket; one JSON line comes back
+ */
+
+if (!defined('DIALOG_SOCKET')) define('DIALOG_SOCKET', getenv('AGYRUS_DIALOG_SOCKET') ?: '/tmp/agyrus_dialog.sock');
+if (!defined('DIALOG_TIMEOUT')) define('DIALOG_TIMEOUT', 5.0);
+// Encoded rows per load_tutors/load_courses chunk, well below the server's 64 KB line limit
+if (!defined('DIALOG_CHUNK_BYTES')) define('DIALOG_CHUNK_BYTES', 32 * 1024);
+
+/**
+ * Send a request to the dialog server
+ * Returns the decoded response array, or null if the server is unavailable
+ */
+function dialog_server_request(array $payload) {
+    if (!file_exists(DIALOG_SOCKET)) {
+        return null;
+    }
+
+    $socket = @stream_socket_client('unix://' . DIALOG_SOCKET, $errno, $errstr, DIALOG_TIMEOUT);
+    if ($socket === false) {
+        return null;
+    }
+
+    stream_set_timeout($socket, (int) DIALOG_TIMEOUT);
+
+    $written = fwrite($socket, json_encode($payload, JSON_UNESCAPED_UNICODE) . "\n");
+    if ($written === false) {
+        fclose($socket);
+        return null;
+    }
+
+    $line = fgets($socket);
+    fclose($socket);
+
+    if ($line === false) {
+        return null;
+    }
+
+    $response = json_decode($line, true);
+    return is_array($response) ? $response : null;
+}
+
+/**
+ * Send several requests over one connection, in order
+ * Returns the decoded responses (stopping after the first failed one),
+ * or null if the server is unavailable
+ */
+function dialog_server_requests(array $payloads) {
+    if (!file_exists(DIALOG_SOCKET)) {
+        return null;
+    }
+
+    $socket = @stream_socket_client('unix://' . DIALOG_SOCKET, $errno, $errstr, DIALOG_TIMEOUT);
+    if ($socket === false) {
+        return null;
+    }
+
+    stream_set_timeout($socket, (int) DIALOG_TIMEOUT);
+
+    $responses = [];
+    foreach ($payloads as $payload) {
+        if (fwrite($socket, json_encode($payload, JSON_UNESCAPED_UNICODE) . "\n") === false) {
+            fclose($socket);
+            return null;
+        }
+        $line = fgets($socket);
+        $response = $line === false ? null : json_decode($line, true);
+        if (!is_array($response)) {
+            fclose($socket);
+            return null;
+        }
+        $responses[] = $response;
+        if (empty($response['success'])) {
+            break;
+        }
+    }
+
+    fclose($socket);
+    return $responses;
+}
+
+/**
+ * Replace a reference table on the server (action 'load_tutors' with key 'tutors', ...)
+ * Rows go out in chunks of at most DIALOG_CHUNK_BYTES over one connection;
+ * the server applies them together with the last chunk.
+ * Returns the response to the last chunk (or the first error), null if the server is unavailable
+ */
+function dialog_server_load_table($action, $key, array $rows) {
+    $chunks = [[]];
+    $size = 0;
+    foreach ($rows as $row) {
+        $rowSize = strlen(json_encode($row, JSON_UNESCAPED_UNICODE)) + 1;
+        $last = count($chunks) - 1;
+        if ($chunks[$last] && $size + $rowSize > DIALOG_CHUNK_BYTES) {
+            $chunks[] = [];
+            $last++;
+            $size = 0;
+        }
+        $chunks[$last][] = $row;
+        $size += $rowSize;
+    }
+
+    $payloads = [];
+    foreach ($chunks as $i => $chunk) {
+        $payloads[] = [
+            'action' => $action,
+            $key => $chunk,
+            'append' => $i > 0,
+            'more' => $i < count($chunks) - 1
+        ];
+    }
+
+    $responses = dialog_server_requests($payloads);
+    return $responses === null ? null : end($responses);
+}
+
+/**
+ * Run a Python script from core/ directly (fallback when the server is down)
+ * Returns [output lines, return code]
+ */
+function dialog_exec_script($scriptName, array $args) {
+    $scriptPath = realpath(__DIR__ . '/../core/' . $scriptName);
+    $escapedArgs = implode(' ', array_map('escapeshellarg', $args));
+
+    // Clear LD_LIBRARY_PATH to avoid LAMPP lib conflicts
+    $command = "LD_LIBRARY_PATH= /usr/bin/python3 $scriptPath $escapedArgs 2>&1";
+
+    exec($command, $output, $returnCode);
+    return [$output, $returnCode];
+}
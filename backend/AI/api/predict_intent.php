@@ -4,6 +4,8 @@
  * Calls Python intent classifier and returns JSON response
  */
 
+require_once __DIR__ . '/dialog_client.php';
+
 header('Content-Type: application/json');
 header('Access-Control-Allow-Origin: *');
 header('Access-Control-Allow-Methods: POST, OPTIONS');
@@ -29,45 +31,35 @@ if (empty($text)) {
     exit;
 }
 
-// Call Python script with cleared LD_LIBRARY_PATH to avoid LAMPP lib conflicts
-$scriptPath = realpath(__DIR__ . '/../core/intent_classifier.py');
-$escapedText = escapeshellarg($text);
-$command = "LD_LIBRARY_PATH= /usr/bin/python3 $scriptPath $escapedText 2>&1";
+// Preferred path: long-lived dialog server (model already loaded)
+$response = dialog_server_request([
+    'action' => 'predict_intent',
+    'text' => $text
+]);
 
-exec($command, $output, $returnCode);
+if ($response === null) {
+    // Fallback: dialog server is down, run the classifier in a fresh process
+    [$output, $returnCode] = dialog_exec_script('intent_classifier.py', ['--json', $text]);
+
+    $decoded = $returnCode === 0 ? json_decode(end($output), true) : null;
+    $response = is_array($decoded)
+        ? ['success' => true, 'result' => $decoded]
+        : ['success' => false, 'error' => implode("\n", $output)];
+}
 
-// Parse output
-if ($returnCode !== 0) {
+if (empty($response['success'])) {
     http_response_code(500);
     echo json_encode([
         'success' => false,
         'error' => 'Failed to classify intent',
-        'details' => implode("\n", $output)
+        'details' => $response['error'] ?? ''
     ]);
     exit;
 }
 
-// Extract intent and confidence from output
-$intent = 'general';
-$confidence = 0.0;
-
-foreach ($output as $line) {
-    if (strpos($line, 'Intent:') !== false) {
-        $parts = explode(':', $line, 2);
-        $intentPart = trim($parts[1]);
-        $intent = explode(' ', $intentPart)[0];
-    }
-    if (strpos($line, 'Confidence:') !== false) {
-        $parts = explode(':', $line, 2);
-        $confidencePart = trim($parts[1]);
-        $confidence = floatval(str_replace('%', '', $confidencePart)) / 100;
-    }
-}
-
 echo json_encode([
     'success' => true,
-    'intent' => $intent,
-    'confidence' => $confidence,
+    'intent' => $response['result']['intent'],
+    'confidence' => (float) $response['result']['confidence'],
     'text' => $text
 ]);
-
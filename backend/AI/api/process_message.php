@@ -4,6 +4,8 @@
  * Handles natural language understanding and dialog management
  */
 
+require_once __DIR__ . '/dialog_client.php';
+
 header('Content-Type: application/json');
 header('Access-Control-Allow-Origin: *');
 header('Access-Control-Allow-Methods: POST, OPTIONS');
@@ -22,6 +24,8 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 // Get input
 $input = json_decode(file_get_contents('php://input'), true);
 $message = $input['message'] ?? '';
+$sessionId = $input['session_id'] ?? null;
+// Legacy clients still send the whole context; new ones send only session_id
 $context = $input['context'] ?? [];
 
 if (empty($message)) {
@@ -30,17 +34,50 @@ if (empty($message)) {
     exit;
 }
 
-// Call Python dialog manager
-$scriptPath = realpath(__DIR__ . '/../core/dialog_manager.py');
-$escapedMessage = escapeshellarg($message);
+if ($sessionId !== null && (!is_string($sessionId) || !preg_match('/^[A-Za-z0-9_-]{1,128}$/', $sessionId))) {
+    http_response_code(400);
+    echo json_encode(['success' => false, 'error' => 'Invalid session_id']);
+    exit;
+}
 
-// Pass context as JSON if provided
-$contextJson = !empty($context) ? escapeshellarg(json_encode($context)) : "'{}'";
+// Preferred path: long-lived dialog server (model already loaded)
+$payload = ['action' => 'process_message', 'message' => $message];
+if ($sessionId !== null) {
+    $payload['session_id'] = $sessionId;
+}
+if (!empty($context)) {
+    $payload['context'] = (object) $context;
+}
+$response = dialog_server_request($payload);
 
-// Clear LD_LIBRARY_PATH to avoid LAMPP lib conflicts
-$command = "LD_LIBRARY_PATH= /usr/bin/python3 $scriptPath $escapedMessage $contextJson 2>&1";
+if ($response !== null) {
+    if (empty($response['success'])) {
+        http_response_code(500);
+        echo json_encode([
+            'success' => false,
+            'error' => 'Failed to process message',
+            'details' => $response['error'] ?? ''
+        ]);
+        exit;
+    }
+
+    $result = $response['result'];
+    $result['success'] = true;
+    echo json_encode($result, JSON_UNESCAPED_UNICODE);
+    exit;
+}
 
-exec($command, $output, $returnCode);
+// Fallback: dialog server is down, run the dialog manager in a fresh process
+// (context is shared with the server only when it runs with --session-backend sqlite)
+$args = [];
+if ($sessionId !== null) {
+    array_push($args, '--session-id', $sessionId);
+}
+if (!empty($context)) {
+    array_push($args, '--context', json_encode($context));
+}
+array_push($args, '--', $message);
+[$output, $returnCode] = dialog_exec_script('dialog_manager.py', $args);
 
 if ($returnCode !== 0) {
     http_response_code(500);
@@ -81,4 +118,3 @@ if ($jsonStart !== false) {
         'output' => $outputText
     ]);
 }
-
@@ -0,0 +1,43 @@
+<?php
+/**
+ * Push tutor and course data to the running dialog server
+ * Call after tutors or courses change (or from cron); the server only
+ * rebuilds what actually changed.
+ */
+
+require_once __DIR__ . '/../../config/config.php';
+require_once __DIR__ . '/dialog_client.php';
+
+header('Content-Type: application/json');
+
+if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
+    http_response_code(405);
+    echo json_encode(['success' => false, 'error' => 'Method not allowed']);
+    exit;
+}
+
+try {
+    $pdo = getPDO();
+    $tutors = $pdo->query("SELECT tutor_id, name, surname FROM tutor")->fetchAll();
+    $courses = $pdo->query("SELECT course_id, course_name FROM course")->fetchAll();
+} catch (Throwable $e) {
+    http_response_code(500);
+    echo json_encode(['success' => false, 'error' => 'Database error']);
+    exit;
+}
+
+// Sent in chunks: a large tutor table does not fit in one request line
+$tutorResponse = dialog_server_load_table('load_tutors', 'tutors', $tutors);
+$courseResponse = dialog_server_load_table('load_courses', 'courses', $courses);
+
+if ($tutorResponse === null || $courseResponse === null) {
+    http_response_code(503);
+    echo json_encode(['success' => false, 'error' => 'Dialog server is not running']);
+    exit;
+}
+
+echo json_encode([
+    'success' => !empty($tutorResponse['success']) && !empty($courseResponse['success']),
+    'tutors' => $tutorResponse['result'] ?? $tutorResponse['error'] ?? null,
+    'courses' => $courseResponse['result'] ?? $courseResponse['error'] ?? null
+]);
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cold-start benchmark for the AI entry points
+
+Each entry point runs in a fresh interpreter (like the PHP exec fallback)
+and is timed in three phases: module import, model load and first
+prediction. The per-module breakdown comes from `python -X importtime`.
+
+Usage:
+    python3 benchmarks/cold_start.py [--runs N] [--top N] [--budget FILE]
+
+Exits with status 1 when any entry point exceeds its budget.
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+DEFAULT_BUDGET_FILE = CURRENT_DIR / 'cold_start_budget.json'
+
+# Code executed in the child interpreter for each entry point:
+# (import statement, model load statement, first prediction statement)
+ENTRY_POINTS = {
+    'dialog_manager': (
+        "from dialog_manager import DialogManager",
+        "manager = DialogManager()",
+        "manager.process_message('find math tutor for tomorrow at 3pm')"
+    ),
+    'intent_classifier': (
+        "from intent_classifier import load_model, predict_intent",
+        "model = load_model('logistic')",
+        "predict_intent(model, 'show my bookings')"
+    ),
+    'entity_extractor': (
+        "from entity_extractor import EntityExtractor",
+        "extractor = EntityExtractor()",
+        "extractor.extract_all('Book physics class for 2025-10-20 at 14:30')"
+    ),
+}
+
+CHILD_TEMPLATE = """
+import json, time
+t0 = time.perf_counter()
+{imports}
+t1 = time.perf_counter()
+{load}
+t2 = time.perf_counter()
+{predict}
+t3 = time.perf_counter()
+print(json.dumps({{'import_ms': (t1 - t0) * 1000, 'load_ms': (t2 - t1) * 1000,
+                  'first_prediction_ms': (t3 - t2) * 1000}}))
+"""
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Aggregate `-X importtime` self times (ms) per top-level package"""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_part, _, name = line.split('|')
+            self_us = int(self_part.split(':')[1])
+        except ValueError:
+            continue
+        package = name.strip().split('.')[0]
+        totals[package] += self_us / 1000
+    return dict(totals)
+
+
+def run_entry_point(name: str) -> dict:
+    """Run one entry point in a fresh interpreter and collect its timings"""
+    imports, load, predict = ENTRY_POINTS[name]
+    code = CHILD_TEMPLATE.format(imports=imports, load=load, predict=predict)
+
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', code],
+        cwd=str(CORE_DIR),
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{completed.stderr[-2000:]}")
+
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['total_ms'] = timings['import_ms'] + timings['load_ms'] + timings['first_prediction_ms']
+    timings['modules'] = parse_importtime(completed.stderr)
+    return timings
+
+
+def benchmark(runs: int) -> dict:
+    """Median timings over several runs for every entry point"""
+    results = {}
+    for name in ENTRY_POINTS:
+        samples = [run_entry_point(name) for _ in range(runs)]
+        summary = {
+            key: statistics.median(sample[key] for sample in samples)
+            for key in ('import_ms', 'load_ms', 'first_prediction_ms', 'total_ms')
+        }
+        packages = set().union(*(sample['modules'] for sample in samples))
+        summary['modules'] = {
+            package: statistics.median(sample['modules'].get(package, 0.0) for sample in samples)
+            for package in packages
+        }
+        results[name] = summary
+    return results
+
+
+def check_budget(results: dict, budget: dict) -> list:
+    """Return a list of human-readable budget violations"""
+    violations = []
+    for name, limits in budget.items():
+        if name not in results:
+            continue
+        for key, limit in limits.items():
+            value = results[name].get(key)
+            if value is not None and value > limit:
+                violations.append(f"{name}.{key}: {value:.1f} ms > budget {limit:.1f} ms")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for AI entry points')
+    parser.add_argument('--runs', type=int, default=5, help='runs per entry point (median is reported)')
+    parser.add_argument('--top', type=int, default=8, help='modules to show in the import breakdown')
+    parser.add_argument('--budget', default=str(DEFAULT_BUDGET_FILE), help='budget JSON file')
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    results = benchmark(args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, summary in results.items():
+            print(f"\n{name}")
+            print(f"  import:           {summary['import_ms']:8.1f} ms")
+            print(f"  model load:       {summary['load_ms']:8.1f} ms")
+            print(f"  first prediction: {summary['first_prediction_ms']:8.1f} ms")
+            print(f"  total:            {summary['total_ms']:8.1f} ms")
+            print(f"  slowest imports (self time):")
+            modules = sorted(summary['modules'].items(), key=lambda item: item[1], reverse=True)
+            for package, ms in modules[:args.top]:
+                print(f"    {package:30} {ms:8.1f} ms")
+
+    budget_path = Path(args.budget)
+    if not budget_path.exists():
+        return 0
+
+    with open(budget_path, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+
+    violations = check_budget(results, budget)
+    if violations:
+        print("\nCold-start budget exceeded:")
+        for violation in violations:
+            print(f"  ✗ {violation}")
+        return 1
+
+    print("\n✓ All entry points within cold-start budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
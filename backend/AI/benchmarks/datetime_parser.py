@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DateTimeParser correctness suite and microbenchmark
+
+Runs a table of expressions against the current parser with a fixed clock
+and reports any mismatch, then times it against the previous
+implementation (kept below as LegacyDateTimeParser for comparison).
+
+Usage:
+    python3 benchmarks/datetime_parser.py [--iterations N]
+
+Exits with status 1 when a correctness case fails.
+"""
+
+import re
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from nlp_utils import DateTimeParser
+from intent_classifier import load_training_data
+
+# Saturday, so weekday arithmetic crosses a week boundary
+FIXED_NOW = datetime(2026, 10, 17, 12, 0)
+
+# (text, expected date, expected time, expected end time)
+CASES = [
+    ("Find tutor for tomorrow at 3pm", '2026-10-18', '15:00', None),
+    ("Show schedule for next week", '2026-10-24', None, None),
+    ("Book class on 2025-10-20 at 14:30", '2025-10-20', '14:30', None),
+    ("Book class on 15.10.2025", '2025-10-15', None, None),
+    ("Book class on 15/10/2025 at 9:05", '2025-10-15', '09:05', None),
+    ("Tomorrow morning appointment", '2026-10-18', '09:00', None),
+    ("Friday evening appointment", '2026-10-23', '18:00', None),
+    ("day after tomorrow at 5 pm", '2026-10-19', '17:00', None),
+    ("see you monday", '2026-10-19', None, None),
+    ("see you mon", '2026-10-19', None, None),
+    ("in 3 days", '2026-10-20', None, None),
+    ("in two weeks", '2026-10-31', None, None),
+    ("next Friday", '2026-10-23', None, None),
+    ("this sunday at noon", '2026-10-18', '12:00', None),
+    ("October 20", '2026-10-20', None, None),
+    ("20th of October 2027", '2027-10-20', None, None),
+    ("jan 5 at 10am", '2027-01-05', '10:00', None),
+    ("meet at 3:30pm", None, '15:30', None),
+    ("between 2 and 4pm", None, '14:00', '16:00'),
+    ("from 10:30 to 12", None, '10:30', '12:00'),
+    ("tomorrow morning at 10", '2026-10-18', '10:00', None),
+    ("I am satisfied with the result", None, None, None),
+    ("may I see my bookings", None, None, None),
+    ("at 25", None, None, None),
+]
+
+
+class LegacyDateTimeParser:
+    """Previous implementation (per-call re.search and substring scans)"""
+
+    WEEKDAYS = {
+        'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'wednesday': 2, 'wed': 2,
+        'thursday': 3, 'thu': 3, 'friday': 4, 'fri': 4, 'saturday': 5, 'sat': 5,
+        'sunday': 6, 'sun': 6
+    }
+    RELATIVE_DATES = {'today': 0, 'tomorrow': 1, 'yesterday': -1, 'day after tomorrow': 2}
+
+    def __init__(self, now):
+        self.now = now
+
+    def parse_date(self, text):
+        text_lower = text.lower()
+        today = self.now
+        for pattern in [r'(\d{4})-(\d{2})-(\d{2})', r'(\d{2})\.(\d{2})\.(\d{4})', r'(\d{2})/(\d{2})/(\d{4})']:
+            match = re.search(pattern, text)
+            if match:
+                if '-' in pattern:
+                    year, month, day = match.groups()
+                else:
+                    day, month, year = match.groups()
+                try:
+                    return datetime(int(year), int(month), int(day)).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+        for keyword, delta in self.RELATIVE_DATES.items():
+            if keyword in text_lower:
+                return (today + timedelta(days=delta)).strftime('%Y-%m-%d')
+        for day_name, day_num in self.WEEKDAYS.items():
+            if day_name in text_lower:
+                days_ahead = day_num - today.weekday()
+                if days_ahead <= 0:
+                    days_ahead += 7
+                return (today + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+        if 'next week' in text_lower:
+            return (today + timedelta(days=7)).strftime('%Y-%m-%d')
+        return None
+
+    def parse_time(self, text):
+        text_lower = text.lower()
+        match = re.search(r'(\d{1,2})[:.](\d{2})', text)
+        if match:
+            hour, minute = int(match.group(1)), int(match.group(2))
+            if 0 <= hour < 24 and 0 <= minute < 60:
+                return f"{hour:02d}:{minute:02d}"
+        match = re.search(r'(?:at)\s+(\d{1,2})', text_lower)
+        if match:
+            hour = int(match.group(1))
+            if 'pm' in text_lower and hour < 12:
+                hour += 12
+            elif 'am' in text_lower and hour == 12:
+                hour = 0
+            if 0 <= hour < 24:
+                return f"{hour:02d}:00"
+        for keyword, time_val in {'morning': '09:00', 'afternoon': '14:00',
+                                  'evening': '18:00', 'night': '20:00'}.items():
+            if keyword in text_lower:
+                return time_val
+        return None
+
+
+def run_correctness(parser) -> int:
+    failures = 0
+    legacy = LegacyDateTimeParser(FIXED_NOW)
+    print(f"{'text':40} {'result':32} {'legacy':24}")
+    for text, expected_date, expected_time, expected_end in CASES:
+        result = parser.parse(text)
+        ok = (result['date'], result['time'], result['time_end']) == (expected_date, expected_time, expected_end)
+        failures += not ok
+        shown = f"{result['date']} {result['time']}" + (f"-{result['time_end']}" if result['time_end'] else '')
+        legacy_shown = f"{legacy.parse_date(text)} {legacy.parse_time(text)}"
+        print(f"{'✓' if ok else '✗'} {text:38} {shown:32} {legacy_shown:24}")
+    print(f"\n{len(CASES) - failures}/{len(CASES)} cases passed")
+    return failures
+
+
+def time_per_message(func, texts, iterations) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (iterations * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DateTimeParser correctness and speed')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    current = DateTimeParser(clock=lambda: FIXED_NOW)
+    failures = run_correctness(current)
+
+    legacy = LegacyDateTimeParser(FIXED_NOW)
+    corpora = {
+        'date/time cases': [text for text, *_ in CASES],
+        # Realistic chat traffic: mostly messages without any date or time
+        'training corpus': [text for text, _ in load_training_data()],
+    }
+
+    print(f"\nLatency per message (date + time):")
+    print(f"  {'corpus':18} {'legacy µs':>10} {'current µs':>11}")
+    for name, texts in corpora.items():
+        iterations = max(1, args.iterations * len(CASES) // len(texts))
+        legacy_us = time_per_message(lambda t: (legacy.parse_date(t), legacy.parse_time(t)), texts, iterations)
+        current_us = time_per_message(current.parse, texts, iterations)
+        print(f"  {name:18} {legacy_us:10.2f} {current_us:11.2f}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ensemble accuracy/latency trade-off on the held-out split
+
+The 80/20 split of train_test_split.py (stratified, random_state 42) is
+taken; decision tree, logistic and KNN models are trained on the 80% with
+their MODEL_PARAMS and exported to the compact format, as they are served.
+On the 20% held out, messages are classified one at a time by:
+  - each model alone
+  - the ensemble (ensemble.py) at several early-exit thresholds, from
+    "never" (every message reaches the weighted vote) down
+  - the ensemble with logistic weighted x2, and with concurrent and
+    sequential evaluation forced, all at the default threshold
+  - compare_all_models-style: all three pickles loaded per message
+Reported: accuracy, median µs/message of interleaved rounds, the early
+exit rate and the ensemble's own per-model latency (stats()).
+
+Usage:
+    python3 benchmarks/ensemble.py [--rounds 5]
+"""
+
+import io
+import os
+import sys
+import time
+import pickle
+import argparse
+import statistics
+import tempfile
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent
+AI_DIR = (CURRENT_DIR / '..').resolve()
+CORE_DIR = AI_DIR / 'core'
+for path in (AI_DIR, CORE_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from compact_model import load_compact_model
+from ensemble import EnsembleModel, ENSEMBLE_MODELS, ENSEMBLE_WEIGHTS, EARLY_EXIT_CONFIDENCE
+from intent_classifier import train_model, export_compact_model, preprocess_texts
+from train_test_split import split_data
+
+THRESHOLDS = (None, 0.99, 0.95, EARLY_EXIT_CONFIDENCE, 0.8, 0.7, 0.6)
+
+
+def time_pass(func, texts) -> float:
+    """Mean µs per message of one pass, one message per call"""
+    start = time.perf_counter()
+    for text in texts:
+        func([text])
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ensemble accuracy/latency on the held-out split')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--reload-messages', type=int, default=20,
+                        help='messages timed with per-message pickle loading (it is slow)')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        x_train, x_test, y_train, y_test = split_data()
+    x_train, x_test = preprocess_texts(x_train), preprocess_texts(x_test)
+    y_test = np.array(y_test)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        models, pickles = {}, {}
+        for model_type in ENSEMBLE_MODELS:
+            pipeline = train_model(model_type, x_train, y_train)
+            pickles[model_type] = tmp / f'{model_type}.pkl'
+            with open(pickles[model_type], 'wb') as f:
+                pickle.dump(pipeline, f)
+            models[model_type] = load_compact_model(export_compact_model(pipeline, tmp / model_type))
+
+        variants = {name: models[name] for name in ENSEMBLE_MODELS}
+        for threshold in THRESHOLDS:
+            label = 'never' if threshold is None else f'{threshold:g}'
+            variants[f'ensemble, exit {label}'] = EnsembleModel(models, early_exit_confidence=threshold or 2.0)
+        variants['ensemble, logistic x2'] = EnsembleModel(models, weights={'logistic': 2.0})
+        variants['ensemble, concurrent'] = EnsembleModel(models, concurrent=True)
+        variants['ensemble, sequential'] = EnsembleModel(models, concurrent=False)
+
+        def reload_per_message(texts):
+            # What compare_all_models did per call: every pickle read from disk
+            for path in pickles.values():
+                with open(path, 'rb') as f:
+                    pickle.load(f).predict_proba(texts)
+
+        accuracy = {name: float(np.mean(model.predict(x_test) == y_test)) for name, model in variants.items()}
+        for model in variants.values():
+            if isinstance(model, EnsembleModel):
+                model.reset_stats()
+            time_pass(model.predict_proba, x_test)
+
+        samples = {name: [] for name in variants}
+        for round_index in range(args.rounds):
+            # Alternate the order, so no variant always runs right after another
+            for name in (list(variants) if round_index % 2 == 0 else list(variants)[::-1]):
+                samples[name].append(time_pass(variants[name].predict_proba, x_test))
+        reload_us = time_pass(reload_per_message, x_test[:args.reload_messages])
+
+    print(f"Held-out split: {len(x_train)} training / {len(x_test)} test messages, one message per call, "
+          f"{args.rounds} interleaved rounds (median µs/message)")
+    print(f"Vote weights {ENSEMBLE_WEIGHTS}, default early exit at {EARLY_EXIT_CONFIDENCE}, "
+          f"{os.cpu_count()} CPUs\n")
+    print(f"{'variant':26} {'accuracy':>9} {'µs/msg':>9} {'early exit':>11}")
+    for name, model in variants.items():
+        exit_rate = f"{model.stats()['early_exit_rate']:11.1%}" if isinstance(model, EnsembleModel) else ''
+        print(f"{name:26} {accuracy[name]:9.1%} {statistics.median(samples[name]):9.1f} {exit_rate}")
+    print(f"{'pickles loaded per message':26} {'':>9} {reload_us:9.1f}")
+
+    default = variants[f'ensemble, exit {EARLY_EXIT_CONFIDENCE:g}'].stats()
+    print(f"\nensemble, exit {EARLY_EXIT_CONFIDENCE:g}: per-model latency (stats())")
+    for name, model_stats in default['models'].items():
+        print(f"  {name:14} weight {model_stats['weight']:.1f}  {model_stats['texts']:6} messages  "
+              f"{model_stats['ms_per_text'] * 1000:7.1f} µs/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Intent fast path: hit rate, latency saved and agreement with the model
+
+For synthetic corpora of increasing noise (see nlp_pipeline.py; the clean
+one is training phrases only) the logistic model classifies every message
+with the fast path off, in exact mode and with keyword rules. Reported per
+corpus and mode:
+  - hit rate: share of messages answered without the classifier
+  - µs/msg of predict_intent and of DialogManager.process_message
+  - agreement: share of messages whose intent equals the model's answer
+    (exact hits always agree; keyword hits may not)
+  - accuracy against the corpus labels
+  - saved: predict_intent µs/msg saved against "off", measured and as
+    estimated by the index's own stats() (hits x mean classifier time of
+    a miss; rare misses run on a cold classifier, so it overestimates at
+    high hit rates)
+The agreement report of the index build is printed first.
+
+Usage:
+    python3 benchmarks/fast_path.py [--messages 2000] [--rounds 5]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from fast_path import build_fast_path
+from intent_classifier import predict_intent, preprocess_texts
+from model_registry import ModelRegistry
+from nlp_pipeline import generate_corpus
+
+# (label, typo rate, entity rate)
+CORPORA = [
+    ('clean', 0.0, 0.0),
+    ('entities', 0.0, 0.5),
+    ('typos+entities', 0.2, 0.5),
+]
+MODES = ('off', 'exact', 'keywords')
+
+
+def time_pass(func, texts) -> float:
+    """Mean µs per message of one pass"""
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intent fast path hit rate and latency')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as registry_dir:
+        registry = ModelRegistry(registry_dir)
+        managers = {mode: DialogManager(registry=registry, fast_path=None if mode == 'off' else mode)
+                    for mode in MODES}
+        model = managers['off'].intent_model
+
+        report = managers['keywords'].fast_path.report
+        print(f"Index: {report['entries']} of {report['unique_texts']} training phrases "
+              f"(model agrees on {report['model_agreement']:.1%} of {report['examples']} examples, "
+              f"built in {report['build_ms']:.0f} ms)")
+        for disagreement in report['model_disagreements']:
+            print(f"  left out: {disagreement['text']!r} labeled {disagreement['label']}, "
+                  f"model says {disagreement['model']}")
+        for rule in report['rules']:
+            state = 'on ' if rule['enabled'] else 'off'
+            print(f"  rule {state} {rule['intent']:15} {'+'.join(rule['all']):14} matches {rule['matched']:3}, "
+                  f"precision {rule['precision']:.0%}, confidence {rule['confidence']:.2f}")
+
+        for label, typo_rate, entity_rate in CORPORA:
+            corpus = generate_corpus(args.messages, typo_rate, entity_rate, args.seed)
+            texts = [text for text, _ in corpus]
+            # Fresh indexes per corpus, so hit counters only cover this corpus
+            indexes = {'off': None, 'exact': build_fast_path(model),
+                       'keywords': build_fast_path(model, keyword_rules=True)}
+            for mode, manager in managers.items():
+                manager.fast_path = indexes[mode]
+
+            # Accuracy and agreement on the normalized texts, computed once per mode
+            processed = preprocess_texts(texts)
+            answers = {mode: [predict_intent(model, text, fast_path=index)['intent'] for text in processed]
+                       for mode, index in indexes.items()}
+            for index in indexes.values():
+                if index is not None:
+                    index.exact_hits = index.keyword_hits = index.misses = 0
+                    index.miss_seconds = 0.0
+
+            variants = {}
+            for mode, index in indexes.items():
+                variants[(mode, 'predict')] = lambda text, index=index: predict_intent(model, text, fast_path=index)
+                variants[(mode, 'process')] = managers[mode].process_message
+            for func in variants.values():
+                time_pass(func, texts)
+            samples = {key: [] for key in variants}
+            for round_index in range(args.rounds):
+                # Alternate the order, so no variant always runs right after another
+                order = list(variants) if round_index % 2 == 0 else list(variants)[::-1]
+                for key in order:
+                    samples[key].append(time_pass(variants[key], texts))
+            medians = {key: statistics.median(values) for key, values in samples.items()}
+
+            print(f"\n{label}: {len(texts)} messages (typo rate {typo_rate}, entity rate {entity_rate})")
+            print(f"  {'mode':9} {'hit rate':>9} {'predict µs':>11} {'process µs':>11} {'agreement':>10} "
+                  f"{'accuracy':>9} {'saved':>8} {'estimated':>10}")
+            for mode, index in indexes.items():
+                stats = index.stats() if index is not None else None
+                hit_rate = f"{stats['hit_rate']:9.1%}" if stats else f"{'':>9}"
+                saved = f"{'':>8} {'':>10}"
+                if stats:
+                    lookups = stats['exact_hits'] + stats['keyword_hits'] + stats['misses']
+                    saved = (f"{medians[('off', 'predict')] - medians[(mode, 'predict')]:8.1f} "
+                             f"{stats['estimated_saved_ms'] * 1000 / lookups:10.1f}")
+                agreement = sum(a == b for a, b in zip(answers[mode], answers['off'])) / len(texts)
+                accuracy = sum(a == intent for a, (_, intent) in zip(answers[mode], corpus)) / len(texts)
+                print(f"  {mode:9} {hit_rate} {medians[(mode, 'predict')]:11.1f} {medians[(mode, 'process')]:11.1f} "
+                      f"{agreement:10.1%} {accuracy:9.1%} {saved}")
+
+
+if __name__ == '__main__':
+    main()
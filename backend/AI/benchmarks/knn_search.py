@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KNN search scaling: full scan vs postings vs LSH, 1k to 1M training rows
+
+For each corpus size a cosine KNN model is trained on the training data
+scaled with misspelled copies (see model_memory.py; every term kept) and
+exported to the compact format. Queries are synthetic messages (see
+nlp_pipeline.py) after preprocess_text. Searched by:
+  - sklearn:  the Pipeline's brute force kneighbors (up to --sklearn-max rows)
+  - scan:     CompactKNNModel.kneighbors_scan, dense distances to every row
+  - postings: exact sparse search (knn_search.PostingsIndex), forced on
+              below KNN_SCAN_MAX_ROWS
+  - lsh:      HyperplaneLSH with --bits x --tables
+Reported per size: µs/query at batch size 1 and --batch (median of
+interleaved rounds), the share of queries the postings search answered by
+the full scan, prediction agreement with the scan, and LSH recall@k (share
+of the scan's k-th distance or closer among the LSH neighbors).
+
+Usage:
+    python3 benchmarks/knn_search.py [--sizes 1000,10000,100000,1000000] [--queries 200]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from compact_model import load_compact_model, KNN_TIE_TOLERANCE
+from intent_classifier import train_model, export_compact_model, preprocess_texts
+from model_memory import synthetic_corpus
+from nlp_pipeline import generate_corpus
+
+
+def time_batches(func, batches) -> float:
+    """Mean µs per query of one pass over the batches"""
+    start = time.perf_counter()
+    count = 0
+    for batch in batches:
+        func(batch)
+        count += len(batch[2]) - 1
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def split_batches(model, texts, size):
+    return [model.featurize(texts[i:i + size]) for i in range(0, len(texts), size)]
+
+
+def run_size(size: int, base_texts, queries, tmp: Path, args):
+    """Build the models of one corpus size in tmp and print its rows"""
+    scale = -(-size // len(base_texts))
+    texts, labels = synthetic_corpus(scale, args.seed)
+    texts, labels = texts[:size], labels[:size]
+    pipeline = train_model('knn', texts, labels, tfidf_params={'max_features': None})
+    del texts, labels
+    start = time.perf_counter()
+    # Both models map the same artifact
+    model = load_compact_model(export_compact_model(pipeline, tmp))
+    export_s = time.perf_counter() - start
+    model.scan_max_rows = 0
+    start = time.perf_counter()
+    lsh = load_compact_model(tmp).use_lsh(args.bits, args.tables, args.seed)
+    lsh_s = time.perf_counter() - start
+    with_sklearn = size <= args.sklearn_max
+    if not with_sklearn:
+        del pipeline
+
+    singles = split_batches(model, queries, 1)
+    batched = split_batches(model, queries, args.batch)
+    variants = {'scan': model.kneighbors_scan, 'postings': model.kneighbors, 'lsh': lsh.kneighbors}
+    if with_sklearn:
+        knn = pipeline.named_steps['clf']
+        vectorizer = pipeline.named_steps['tfidf']
+        sk_singles = [vectorizer.transform(queries[i:i + 1]) for i in range(len(queries))]
+        sk_batched = [vectorizer.transform(queries[i:i + args.batch])
+                      for i in range(0, len(queries), args.batch)]
+
+    def run(name, batches):
+        if name == 'sklearn':
+            batches = sk_singles if batches is singles else sk_batched
+            start = time.perf_counter()
+            for batch in batches:
+                knn.kneighbors(batch)
+            return (time.perf_counter() - start) / len(queries) * 1e6
+        return time_batches(variants[name], batches)
+
+    names = list(variants) + (['sklearn'] if with_sklearn else [])
+    keys = [(name, batches) for name in names for batches in ('singles', 'batched')]
+    sources = {'singles': singles, 'batched': batched}
+    samples = {key: [] for key in keys}
+    model.full_scans = 0
+    for round_index in range(args.rounds):
+        # Alternate the order, so no variant always runs right after another
+        for key in (keys if round_index % 2 == 0 else keys[::-1]):
+            samples[key].append(run(key[0], sources[key[1]]))
+    fallback_rate = model.full_scans / (2 * args.rounds * len(queries))
+
+    # Dense scan distances are (batch x rows), so everything below runs batch by batch
+    scan_distances = np.concatenate([model.kneighbors_scan(batch)[0] for batch in batched])
+    lsh_distances = np.concatenate([lsh.kneighbors(batch)[0] for batch in batched])
+    kth = scan_distances[:, -1:] + KNN_TIE_TOLERANCE
+    recall = float(np.mean(lsh_distances <= kth))
+    predictions = {}
+    for name, scan_max_rows in (('scan', size), ('postings', 0)):
+        model.scan_max_rows = scan_max_rows
+        predictions[name] = np.concatenate([model.predict_proba_features(batch).argmax(axis=1)
+                                            for batch in batched])
+    predictions['lsh'] = np.concatenate([lsh.predict_proba_features(batch).argmax(axis=1) for batch in batched])
+    if with_sklearn:
+        predictions['sklearn'] = np.searchsorted(model.classes_, pipeline.predict(queries))
+
+    notes = {
+        'scan': f"export {export_s:.1f} s",
+        'postings': f"full scan fallback {fallback_rate:.1%}",
+        'lsh': f"recall@{model.n_neighbors} {recall:.1%}, index {lsh_s:.1f} s",
+        'sklearn': 'brute force',
+    }
+    n_terms = model.vectorizer.n_features
+    for index, name in enumerate(names):
+        medians = [statistics.median(samples[(name, batches)]) for batches in ('singles', 'batched')]
+        agreement = float(np.mean(predictions[name] == predictions['scan']))
+        prefix = f"{size:8} {n_terms:7} {len(model.data):9}" if index == 0 else f"{'':8} {'':7} {'':9}"
+        print(f"{prefix} {name:9} {medians[0]:10.1f} {medians[1]:10.1f} {agreement:10.1%} {notes[name]}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KNN search scaling')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='training rows (comma separated)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--sklearn-max', type=int, default=100000, help='largest corpus searched by sklearn')
+    parser.add_argument('--bits', type=int, default=16)
+    parser.add_argument('--tables', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    queries = preprocess_texts([text for text, _ in generate_corpus(args.queries, 0.2, 0.5, args.seed)])
+    base_texts, _ = synthetic_corpus(1, args.seed)
+
+    print(f"{args.queries} queries, batch sizes 1 and {args.batch}, {args.rounds} interleaved rounds "
+          f"(median µs/query); LSH {args.bits} bits x {args.tables} tables\n")
+    print(f"{'rows':>8} {'terms':>7} {'nnz':>9} {'search':9} {'µs b=1':>10} {f'µs b={args.batch}':>10} "
+          f"{'agreement':>10} {'notes'}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            run_size(size, base_texts, queries, Path(tmp), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing: shared MessageAnalysis vs. re-deriving text per stage
+
+Old path (before MessageAnalysis): the classifier normalizes the raw text,
+then a fresh EntityExtractor analyzes the same text again.
+New path: the message is analyzed once and both stages consume it, with
+one extractor reused across messages (what DialogManager does now).
+
+Usage:
+    python3 benchmarks/message_analysis.py [--repeats N]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from entity_extractor import EntityExtractor
+from intent_classifier import load_training_data, predict_intents
+from nlp_utils import analyze_message
+
+
+def time_stages(texts, stages, repeats):
+    """Median per-message µs of each (name, func) stage, run in sequence per message"""
+    totals = {name: [] for name, _ in stages}
+    for _ in range(repeats):
+        elapsed = {name: 0.0 for name, _ in stages}
+        for text in texts:
+            value = text
+            for name, func in stages:
+                start = time.perf_counter()
+                result = func(text, value)
+                elapsed[name] += time.perf_counter() - start
+                if result is not None:
+                    value = result
+        for name in elapsed:
+            totals[name].append(elapsed[name] / len(texts) * 1e6)
+    return {name: statistics.median(samples) for name, samples in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage timing of message analysis')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    model = DialogManager().intent_model
+    texts = [text for text, _ in load_training_data()]
+    shared_extractor = EntityExtractor()
+
+    # Warm caches (typo index, compiled patterns) outside the timed region
+    for text in texts:
+        predict_intents(model, [text])
+        shared_extractor.extract_all(text)
+
+    old_stages = [
+        ('analyze', lambda text, _: None),
+        ('classify', lambda text, _: predict_intents(model, [text], top_k=1) and None),
+        ('extract', lambda text, _: EntityExtractor().extract_all(text) and None),
+    ]
+    new_stages = [
+        ('analyze', lambda text, _: analyze_message(text)),
+        ('classify', lambda text, analysis: predict_intents(model, [analysis], top_k=1) and None),
+        ('extract', lambda text, analysis: shared_extractor.extract_all(analysis) and None),
+    ]
+
+    old = time_stages(texts, old_stages, args.repeats)
+    new = time_stages(texts, new_stages, args.repeats)
+
+    print(f"{len(texts)} messages, median of {args.repeats} runs (µs per message)\n")
+    print(f"{'stage':10} {'per-stage':>10} {'shared':>10}")
+    for name in old:
+        print(f"{name:10} {old[name]:10.1f} {new[name]:10.1f}")
+    print(f"{'total':10} {sum(old.values()):10.1f} {sum(new.values()):10.1f}")
+
+
+if __name__ == '__main__':
+    main()
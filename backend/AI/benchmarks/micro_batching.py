@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-batching load test
+
+Starts each server variant as a subprocess on a temporary socket and
+drives it with N concurrent clients sending process_message requests:
+  - threaded:  dialog_server.py (one classification per request)
+  - async b=1: async_dialog_server.py with batching disabled
+  - async b=K: async_dialog_server.py with --max-batch-size K
+
+Reports throughput, client-side latency percentiles and, for the async
+server, the batch-size and queue-delay histograms it exports.
+
+Usage:
+    python3 benchmarks/micro_batching.py [--clients 64] [--requests 50]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import load_training_data
+
+
+async def request(reader, writer, payload):
+    writer.write((json.dumps(payload) + '\n').encode('utf-8'))
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def client(socket_path, messages, latencies):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    try:
+        for message in messages:
+            start = time.perf_counter()
+            response = await request(reader, writer, {'action': 'process_message', 'message': message})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not response.get('success'):
+                raise RuntimeError(response)
+    finally:
+        writer.close()
+
+
+async def drive(socket_path, texts, clients, per_client):
+    latencies = []
+    workload = [
+        [texts[(c * per_client + i) % len(texts)] for i in range(per_client)]
+        for c in range(clients)
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(socket_path, messages, latencies) for messages in workload))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    stats = (await request(reader, writer, {'action': 'stats'}))['result']
+    writer.close()
+    return len(latencies) / elapsed, latencies, stats.get('batching')
+
+
+def start_server(script, socket_path, extra_args):
+    process = subprocess.Popen(
+        [sys.executable, str(CORE_DIR / script), socket_path, *extra_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while not Path(socket_path).exists():
+        if process.poll() is not None or time.time() > deadline:
+            raise RuntimeError(f"{script} failed to start")
+        time.sleep(0.05)
+    return process
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching load test')
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    variants = [
+        ('threaded', 'dialog_server.py', []),
+        ('async b=1', 'async_dialog_server.py', ['--max-batch-size', '1']),
+        (f'async b={args.max_batch_size}', 'async_dialog_server.py',
+         ['--max-batch-size', str(args.max_batch_size), '--max-wait-ms', str(args.max_wait_ms)]),
+    ]
+
+    texts = [text for text, _ in load_training_data()]
+    print(f"{args.clients} concurrent clients x {args.requests} requests\n")
+    print(f"{'server':14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11} {'queue p99 ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, script, extra in variants:
+            socket_path = str(Path(tmp) / 'dialog.sock')
+            process = start_server(script, socket_path, extra)
+            try:
+                throughput, latencies, batching = asyncio.run(drive(socket_path, texts, args.clients, args.requests))
+            finally:
+                process.terminate()
+                process.wait()
+            mean_batch = f"{batching['batch_size']['mean']:.1f}" if batching else '-'
+            queue_p99 = f"{batching['queue_delay']['p99']:g}" if batching else '-'
+            print(f"{label:14} {throughput:8.0f} {statistics.median(latencies):8.2f} "
+                  f"{percentile(latencies, 0.99):8.2f} {mean_batch:>11} {queue_p99:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Model memory benchmark: private memory per process by storage format
+
+Trains logistic and KNN models with a large vocabulary on a synthetic corpus
+(training_data scaled with misspelled copies, no typo correction, every
+n-gram kept), stores them as sklearn pickles and as compact artifacts, then
+starts --workers independent processes per format. Each loads the model,
+runs predictions and waits while /proc/<pid>/smaps_rollup is read:
+  - RSS: everything resident, shared pages counted in full
+  - PSS: shared pages divided among the processes mapping them
+  - USS: private pages only, i.e. what every extra process costs
+
+"imports only" rows are processes that import the same modules without
+loading a model; the model's own cost is the difference to them.
+Linux only (reads /proc).
+
+Usage:
+    python3 benchmarks/model_memory.py [--scale 40] [--workers 4]
+"""
+
+import re
+import sys
+import json
+import random
+import importlib
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from prefork_scaling import memory_kb
+
+# (row label, model type, loader) per child process
+RUNS = [
+    ('imports only (numpy)', None, 'numpy'),
+    ('imports only (sklearn)', None, 'sklearn'),
+    ('logistic pickle', 'logistic', 'pickle'),
+    ('logistic compact, read', 'logistic', 'eager'),
+    ('logistic compact, mmap', 'logistic', 'mmap'),
+    ('knn pickle', 'knn', 'pickle'),
+    ('knn compact, read', 'knn', 'eager'),
+    ('knn compact, mmap', 'knn', 'mmap'),
+]
+
+
+def child(loader: str, path: str, texts_path: str):
+    """Load one model, predict, report ready and wait for stdin to close"""
+    import numpy as np
+    from compact_model import load_compact_model
+    with open(texts_path, encoding='utf-8') as f:
+        texts = json.load(f)
+    model = None
+    if loader == 'sklearn':
+        # Baseline of the pickle rows: the modules unpickling a model imports
+        for module in ('sklearn.pipeline', 'sklearn.linear_model', 'sklearn.neighbors'):
+            importlib.import_module(module)
+    elif loader == 'pickle':
+        import pickle
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+    elif loader in ('eager', 'mmap'):
+        model = load_compact_model(path, mmap=loader == 'mmap')
+    if model is not None:
+        for i in range(0, len(texts), 50):
+            np.asarray(model.predict_proba(texts[i:i + 50]))
+    print('ready', flush=True)
+    sys.stdin.read()
+
+
+def synthetic_corpus(scale: int, seed: int = 42):
+    """Training texts plus misspelled copies, lowercased but not typo-corrected"""
+    from intent_classifier import load_training_data
+    from typo_correction import misspell
+
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for text, intent in load_training_data():
+        for copy in range(scale):
+            words = re.sub(r'[^\w\s]', ' ', text.lower()).split()
+            if copy:
+                words = [misspell(w, rng) if len(w) >= 4 and rng.random() < 0.4 else w for w in words]
+            texts.append(' '.join(words))
+            labels.append(intent)
+    return texts, labels
+
+
+def build_models(tmp: Path, scale: int):
+    from intent_classifier import train_model, save_model, export_compact_model
+
+    texts, labels = synthetic_corpus(scale)
+    paths = {}
+    for model_type in ('logistic', 'knn'):
+        model = train_model(model_type, texts, labels,
+                            tfidf_params={'max_features': None, 'ngram_range': (1, 3)})
+        save_model(model, model_type, tmp / f'{model_type}.pkl')
+        export_compact_model(model, tmp / model_type)
+        paths[model_type] = {'pickle': tmp / f'{model_type}.pkl', 'eager': tmp / model_type,
+                             'mmap': tmp / model_type}
+        paths[model_type]['features'] = len(model.named_steps['tfidf'].vocabulary_)
+    return texts, paths
+
+
+def measure(loader: str, path, texts_path: Path, workers: int):
+    processes = [subprocess.Popen([sys.executable, __file__, '--child', loader, str(path), str(texts_path)],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    try:
+        for process in processes:
+            if process.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f'{loader} worker failed')
+        samples = [memory_kb(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    return {key: sum(s[key] for s in samples) / len(samples) for key in ('rss', 'pss', 'uss')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model memory per process by storage format')
+    parser.add_argument('--scale', type=int, default=40, help='copies of each training example')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        texts, paths = build_models(tmp, args.scale)
+        texts_path = tmp / 'texts.json'
+        with open(texts_path, 'w', encoding='utf-8') as f:
+            json.dump(texts[::max(1, len(texts) // 500)], f)
+
+        print(f"{len(texts)} training texts; features: logistic {paths['logistic']['features']}, "
+              f"knn {paths['knn']['features']}; {args.workers} processes per row\n")
+        print(f"{'':26} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'model USS':>10} "
+              f"{'files MB':>9}")
+        baselines = {}
+        for label, model_type, loader in RUNS:
+            path = paths[model_type][loader] if model_type else ''
+            memory = measure(loader, path, texts_path, args.workers)
+            if model_type is None:
+                baselines[loader] = memory['uss']
+            baseline = baselines['sklearn' if loader == 'pickle' else 'numpy']
+            extra = f"{(memory['uss'] - baseline) / 1024:10.1f}" if model_type else f"{'':>10}"
+            size = ''
+            if model_type:
+                files = [path] if path.is_file() else list(path.iterdir())
+                size = f"{sum(p.stat().st_size for p in files) / 1e6:9.1f}"
+            print(f"{label:26} {memory['rss'] / 1024:8.1f} {memory['pss'] / 1024:8.1f} "
+                  f"{memory['uss'] / 1024:8.1f} {extra} {size}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Model hot reload benchmark
+
+Publishes two logistic versions to a temporary registry and serves one of
+them from a DialogManager with a running ModelWatcher, while client threads
+send messages continuously. Versions are promoted back and forth and the
+benchmark reports:
+  - cost of a watcher poll when nothing changed (one stat of the manifest)
+  - time from promote to the new version serving (load + warm-up + swap)
+  - request latency while reloads happen vs. without reloads, and errors
+
+Usage:
+    python3 benchmarks/model_reload.py [--swaps 10] [--clients 4]
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import load_corpus, load_training_data, train_model
+from model_registry import ModelRegistry
+from dialog_manager import DialogManager
+
+
+def drive(manager, texts, stop, latencies, errors):
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            manager.process_message(texts[i % len(texts)])
+        except Exception:
+            errors.append(1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+
+
+def run_clients(manager, texts, clients, body):
+    """Run client threads while body() executes; returns (latencies ms, errors)"""
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=drive, args=(manager, texts[i::clients], stop, latencies, errors))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        body()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return latencies, errors
+
+
+def p99(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model hot reload benchmark')
+    parser.add_argument('--swaps', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--poll', type=float, default=0.05, help='watcher poll interval in seconds')
+    args = parser.parse_args()
+
+    texts = [text for text, _ in load_training_data()]
+    corpus = load_corpus()
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp)
+        versions = [registry.publish(train_model('logistic', *corpus, clf_params={'C': c}), 'logistic')
+                    for c in (1.0, 10.0)]
+        registry.promote('logistic', versions[0])
+
+        manager = DialogManager(registry=registry)
+        watcher = manager.model_watcher(args.poll)
+
+        rounds = 20000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            watcher.check()
+        poll_us = (time.perf_counter() - start) / rounds * 1e6
+        watcher.start()
+
+        baseline, _ = run_clients(manager, texts, args.clients, lambda: time.sleep(2.0))
+
+        reload_ms = []
+
+        def swaps():
+            for i in range(args.swaps):
+                version = versions[(i + 1) % 2]
+                start = time.perf_counter()
+                registry.promote('logistic', version)
+                while manager.model_version != version:
+                    time.sleep(0.001)
+                reload_ms.append((time.perf_counter() - start) * 1000)
+                time.sleep(0.1)
+
+        during, errors = run_clients(manager, texts, args.clients, swaps)
+        watcher.stop()
+
+    print(f"watcher poll without changes: {poll_us:.1f} µs")
+    print(f"promote -> serving ({args.swaps} swaps, poll {args.poll * 1000:g} ms): "
+          f"median {statistics.median(reload_ms):.1f} ms, max {max(reload_ms):.1f} ms\n")
+    print(f"{'request latency':24} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for name, latencies, errs in (('no reloads', baseline, []), ('during reloads', during, errors)):
+        print(f"{name:24} {len(latencies):9d} {statistics.median(latencies):8.2f} "
+              f"{p99(latencies):8.2f} {max(latencies):8.2f} {len(errs):7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NLP pipeline benchmark suite with a regression check against a baseline
+
+Generates a synthetic message corpus from training_data/*.json: examples
+are sampled, words of 4+ letters are misspelled with --typo-rate, and
+subjects, tutor names and date/time phrases are appended with
+--entity-rate each. For every corpus size every stage is called once per
+message (after a warm-up pass, so caches are in steady state) and the
+throughput and p50/p95/p99 latency are reported:
+
+    preprocess_text                       normalization + typo correction
+    predict_intent[<model>]               logistic, decision_tree, knn pickles
+                                          and the compact logistic/knn models
+    extract_all                           EntityExtractor
+    datetime_parse                        DateTimeParser (fixed clock)
+    process_message                       DialogManager end to end, no cache
+
+Results can be written as JSON (--output) and are compared against the
+baseline file: a stage regresses when a latency percentile grows, or the
+throughput drops, by more than the relative threshold stored in the
+baseline (and by more than min_delta_us, so µs-level jitter is ignored).
+--save-baseline replaces the baseline results with the current run.
+
+Usage:
+    python3 benchmarks/nlp_pipeline.py [--sizes 200,1000] [--typo-rate 0.2] [--entity-rate 0.5]
+                                       [--stages a,b] [--output FILE] [--baseline FILE] [--save-baseline]
+
+Exits with status 1 when a stage regressed against the baseline.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+MODELS_DIR = (CURRENT_DIR / '..' / 'models').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from compact_model import load_compact_model
+from dialog_manager import DialogManager
+from entity_extractor import EntityExtractor
+from intent_classifier import load_training_data, load_model, predict_intent, preprocess_text
+from model_registry import ModelRegistry
+from nlp_utils import DateTimeParser
+from typo_correction import misspell
+
+DEFAULT_BASELINE_FILE = CURRENT_DIR / 'nlp_pipeline_baseline.json'
+
+# Relative growth allowed per metric before it counts as a regression
+DEFAULT_THRESHOLDS = {
+    'p50_us': 0.4,
+    'p95_us': 0.5,
+    'p99_us': 1.0,
+    'throughput_per_s': 0.4,
+    # Latency changes smaller than this are never reported
+    'min_delta_us': 5.0,
+}
+
+# Phrases appended to messages by entity injection
+SUBJECTS = ['math', 'physics', 'english', 'chemistry', 'python programming', 'history', 'spanish']
+TUTORS = ['John Smith', 'Maria Ivanova', 'Ivan Petrov', 'Anna Lee']
+DATETIMES = ['tomorrow at 3pm', 'on friday evening', 'on 2026-11-05 at 14:30', 'next week', 'in 3 days',
+             'on 15.11.2026', 'between 2 and 4 pm', 'day after tomorrow at 10am', 'this sunday at noon']
+
+# Saturday; keeps DateTimeParser results independent of the day the suite runs
+FIXED_NOW = datetime(2026, 10, 17, 12, 0)
+
+
+def generate_corpus(size: int, typo_rate: float, entity_rate: float, seed: int = 42):
+    """(message, intent) pairs sampled from the training data with typos and entities injected"""
+    rng = random.Random(seed)
+    examples = load_training_data()
+    corpus = []
+    for _ in range(size):
+        text, intent = rng.choice(examples)
+        words = [
+            misspell(word, rng) if len(word) >= 4 and word.isalpha() and rng.random() < typo_rate else word
+            for word in text.split()
+        ]
+        if rng.random() < entity_rate:
+            words.append(f"for {rng.choice(SUBJECTS)}")
+        if rng.random() < entity_rate:
+            words.append(f"with {rng.choice(TUTORS)}")
+        if rng.random() < entity_rate:
+            words.append(rng.choice(DATETIMES))
+        corpus.append((' '.join(words), intent))
+    return corpus
+
+
+def build_stages(registry_dir: Path):
+    """Stage name -> callable taking one message"""
+    extractor = EntityExtractor()
+    parser = DateTimeParser(clock=lambda: FIXED_NOW)
+    # Empty registry: the manager serves the files in models/, not whatever was promoted locally
+    manager = DialogManager(registry=ModelRegistry(registry_dir))
+
+    stages = {'preprocess_text': preprocess_text}
+    for model_type in ('logistic', 'decision_tree', 'knn'):
+        model = load_model(model_type)
+        stages[f'predict_intent[{model_type}]'] = lambda text, model=model: predict_intent(model, text)
+    for model_type in ('logistic', 'knn'):
+        model = load_compact_model(MODELS_DIR / f'intent_model_{model_type}')
+        stages[f'predict_intent[{model_type}_compact]'] = lambda text, model=model: predict_intent(model, text)
+    stages['extract_all'] = extractor.extract_all
+    stages['datetime_parse'] = parser.parse
+    stages['process_message'] = manager.process_message
+    return stages
+
+
+def percentile(ordered, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(func, texts, repeats: int):
+    """Call func once per text, repeats times after a warm-up pass; latency summary in µs"""
+    for text in texts:
+        func(text)
+    latencies = []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter()
+            func(text)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    ordered = sorted(latencies)
+    return {
+        'calls': len(latencies),
+        'throughput_per_s': len(latencies) / (sum(latencies) / 1e6),
+        'mean_us': sum(latencies) / len(latencies),
+        'p50_us': percentile(ordered, 0.5),
+        'p95_us': percentile(ordered, 0.95),
+        'p99_us': percentile(ordered, 0.99),
+    }
+
+
+def environment():
+    import numpy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def run_suite(sizes, typo_rate: float, entity_rate: float, seed: int, repeats: int, stage_names=None):
+    with tempfile.TemporaryDirectory() as registry_dir:
+        stages = build_stages(Path(registry_dir))
+        unknown = sorted(set(stage_names or []) - set(stages))
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+        results = {}
+        for size in sizes:
+            texts = [text for text, _ in generate_corpus(size, typo_rate, entity_rate, seed)]
+            results[str(size)] = {
+                name: measure(func, texts, repeats)
+                for name, func in stages.items() if not stage_names or name in stage_names
+            }
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'sizes': list(sizes), 'typo_rate': typo_rate, 'entity_rate': entity_rate,
+                   'seed': seed, 'repeats': repeats},
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def compare(report, baseline) -> list:
+    """Human-readable regressions of report against baseline (matching sizes and stages only)"""
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get('thresholds', {})}
+    regressions = []
+    for size, stages in report['results'].items():
+        for name, current in stages.items():
+            previous = baseline.get('results', {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            for key in ('p50_us', 'p95_us', 'p99_us'):
+                limit = previous[key] * (1 + thresholds[key])
+                if current[key] > limit and current[key] - previous[key] > thresholds['min_delta_us']:
+                    regressions.append(f"{name} (n={size}) {key}: {current[key]:.1f} µs > "
+                                       f"{previous[key]:.1f} µs baseline +{thresholds[key]:.0%}")
+            key = 'throughput_per_s'
+            if current[key] < previous[key] / (1 + thresholds[key]):
+                regressions.append(f"{name} (n={size}) throughput: {current[key]:.0f}/s < "
+                                   f"{previous[key]:.0f}/s baseline -{thresholds[key]:.0%}")
+    return regressions
+
+
+def print_report(report, baseline=None):
+    config = report['config']
+    print(f"typo rate {config['typo_rate']}, entity rate {config['entity_rate']}, seed {config['seed']}, "
+          f"{config['repeats']} repeats; {report['environment']['cpus']} CPUs")
+    for size, stages in report['results'].items():
+        print(f"\n{size} messages")
+        print(f"  {'stage':34} {'msg/s':>9} {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9} {'p50 vs base':>12}")
+        for name, summary in stages.items():
+            previous = (baseline or {}).get('results', {}).get(size, {}).get(name)
+            change = f"{summary['p50_us'] / previous['p50_us'] - 1:+12.0%}" if previous else f"{'':>12}"
+            print(f"  {name:34} {summary['throughput_per_s']:9.0f} {summary['p50_us']:9.1f} "
+                  f"{summary['p95_us']:9.1f} {summary['p99_us']:9.1f} {change}")
+
+
+def write_json(path: Path, data):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    tmp_path.replace(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NLP pipeline benchmark suite')
+    parser.add_argument('--sizes', default='200,1000', help='comma-separated corpus sizes')
+    parser.add_argument('--typo-rate', type=float, default=0.2, help='chance a word of 4+ letters is misspelled')
+    parser.add_argument('--entity-rate', type=float, default=0.5,
+                        help='chance of appending a subject, a tutor and a date/time (each)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=3, help='timed passes over each corpus')
+    parser.add_argument('--stages', default=None, help='comma-separated subset of stages')
+    parser.add_argument('--output', default=None, help='write the results JSON here')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE_FILE), help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store this run as the baseline (thresholds are kept)')
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    stage_names = [name.strip() for name in args.stages.split(',')] if args.stages else None
+    try:
+        report = run_suite(sizes, args.typo_rate, args.entity_rate, args.seed, args.repeats, stage_names)
+    except ValueError as e:
+        parser.error(str(e))
+
+    baseline_path = Path(args.baseline)
+    baseline = None
+    if baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+    if args.output:
+        write_json(Path(args.output), report)
+
+    if args.save_baseline:
+        write_json(baseline_path, {'thresholds': (baseline or {}).get('thresholds', DEFAULT_THRESHOLDS), **report})
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+    if baseline is None:
+        return 0
+
+    if baseline.get('config', {}) != report['config']:
+        print("\nNote: baseline was recorded with a different corpus configuration; "
+              "only matching sizes and stages are compared")
+    regressions = compare(report, baseline)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  ✗ {regression}")
+        return 1
+
+    print("\n✓ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Online learning benchmark: update latency and accuracy drift
+
+Holds out a stratified test split, fits the online model on a fraction of
+the remaining examples and streams the rest in small batches through
+DialogManager-style copy-and-swap updates. Reports:
+  - update latency per batch (copy + partial_fit), p50/p95/max
+  - held-out accuracy of the online model after the stream, next to full
+    retrains on the same examples (SGD with the same features, and the
+    served TF-IDF + logistic regression pipeline); the gap is the drift
+  - prediction latency while updates run in a background thread, against
+    an idle baseline (the swap never blocks readers)
+
+Usage:
+    python3 benchmarks/online_learning.py [--initial 0.5] [--batch-size 8]
+"""
+
+import sys
+import time
+import argparse
+import threading
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import load_corpus, train_model
+from online_model import OnlineIntentModel
+
+
+def accuracy(model, texts, labels) -> float:
+    return sum(p == y for p, y in zip(model.predict(texts), labels)) / len(labels)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def prediction_latency_ms(get_model, texts, seconds: float):
+    """Single-message predict latencies (ms) over a fixed time window"""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        get_model().predict_proba([texts[i % len(texts)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+    return latencies
+
+
+def main():
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description='Online learning benchmark')
+    parser.add_argument('--initial', type=float, default=0.5,
+                        help='fraction of the training split used for the initial fit')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    texts, labels = load_corpus()
+    train_texts, test_texts, train_labels, test_labels = train_test_split(
+        texts, labels, test_size=args.test_size, random_state=args.seed, stratify=labels)
+    initial_texts, stream_texts, initial_labels, stream_labels = train_test_split(
+        train_texts, train_labels, train_size=args.initial, random_state=args.seed, stratify=train_labels)
+
+    model = OnlineIntentModel().fit(initial_texts, initial_labels)
+    initial_accuracy = accuracy(model, test_texts, test_labels)
+
+    update_ms = []
+    for i in range(0, len(stream_texts), args.batch_size):
+        start = time.perf_counter()
+        model = model.updated(stream_texts[i:i + args.batch_size], stream_labels[i:i + args.batch_size])
+        update_ms.append((time.perf_counter() - start) * 1000)
+    online_accuracy = accuracy(model, test_texts, test_labels)
+
+    retrained_sgd = OnlineIntentModel().fit(train_texts, train_labels)
+    retrained_logistic = train_model('logistic', train_texts, train_labels)
+    sgd_accuracy = accuracy(retrained_sgd, test_texts, test_labels)
+    logistic_accuracy = accuracy(retrained_logistic, test_texts, test_labels)
+
+    print(f"{len(texts)} examples: {len(initial_texts)} initial fit, {len(stream_texts)} streamed "
+          f"in {len(update_ms)} batches of {args.batch_size}, {len(test_texts)} held out\n")
+    print(f"update latency per batch: p50 {percentile(update_ms, 0.5):.1f} ms, "
+          f"p95 {percentile(update_ms, 0.95):.1f} ms, max {max(update_ms):.1f} ms\n")
+    print(f"{'held-out accuracy':40} {'':>8}")
+    print(f"{'online, after initial fit':40} {initial_accuracy:8.3f}")
+    print(f"{'online, after stream':40} {online_accuracy:8.3f}")
+    print(f"{'full retrain, SGD (same features)':40} {sgd_accuracy:8.3f}   "
+          f"drift {online_accuracy - sgd_accuracy:+.3f}")
+    print(f"{'full retrain, TF-IDF + logistic':40} {logistic_accuracy:8.3f}   "
+          f"drift {online_accuracy - logistic_accuracy:+.3f}")
+
+    # Readers grab the current reference; a writer keeps swapping in updated copies
+    current = {'model': model}
+    idle = prediction_latency_ms(lambda: current['model'], test_texts, 1.0)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            batch = slice(i % len(stream_texts), i % len(stream_texts) + args.batch_size)
+            current['model'] = current['model'].updated(stream_texts[batch], stream_labels[batch])
+            i += args.batch_size
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    busy = prediction_latency_ms(lambda: current['model'], test_texts, 1.0)
+    stop.set()
+    thread.join()
+
+    print(f"\nprediction latency   idle p50 {statistics.median(idle):.2f} ms p99 {percentile(idle, 0.99):.2f} ms"
+          f" | during updates p50 {statistics.median(busy):.2f} ms p99 {percentile(busy, 0.99):.2f} ms"
+          f" ({current['model'].version - model.version} swaps)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prefork server scaling and memory benchmark
+
+For each worker count, starts core/prefork_server.py on a temporary socket,
+drives it for a fixed time from separate client processes (one new
+connection per request, like the PHP endpoint) and reports:
+  - throughput and speedup over one worker
+  - per-worker memory from /proc/<pid>/smaps_rollup: RSS, PSS and USS
+    (private pages) right after warm-up and after the load. A flat USS
+    means workers keep sharing the parent's model pages copy-on-write.
+
+Linux only (reads /proc). Throughput can only scale up to the number of
+cores not busy running the load generator.
+
+Usage:
+    python3 benchmarks/prefork_scaling.py [--workers 1,2,4] [--duration 5]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import load_training_data
+
+
+def memory_kb(pid: int) -> dict:
+    """Rss, Pss and USS (private clean + dirty) of a process, in kB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def worker_pids(parent_pid: int) -> list:
+    with open(f'/proc/{parent_pid}/task/{parent_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def mean_memory(pids) -> dict:
+    samples = [memory_kb(pid) for pid in pids]
+    return {key: sum(s[key] for s in samples) / len(samples) for key in ('rss', 'pss', 'uss')}
+
+
+def one_request(socket_path: str, message: str):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({'action': 'process_message', 'message': message}) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as rfile:
+            response = json.loads(rfile.readline())
+    if not response.get('success'):
+        raise RuntimeError(response)
+
+
+def load_client(args) -> int:
+    socket_path, texts, offset, duration = args
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        one_request(socket_path, texts[(offset + count) % len(texts)])
+        count += 1
+    return count
+
+
+def run(workers: int, clients: int, duration: float, texts, tmp: str) -> dict:
+    socket_path = str(Path(tmp) / f'prefork_{workers}.sock')
+    process = subprocess.Popen(
+        [sys.executable, str(CORE_DIR / 'prefork_server.py'), socket_path,
+         '--workers', str(workers), '--max-requests', '0',
+         '--session-db', str(Path(tmp) / 'sessions.sqlite3')],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while not Path(socket_path).exists() or len(worker_pids(process.pid)) < workers:
+            if process.poll() is not None or time.time() > deadline:
+                raise RuntimeError('prefork_server.py failed to start')
+            time.sleep(0.05)
+        one_request(socket_path, 'hello')
+
+        pids = worker_pids(process.pid)
+        before = mean_memory(pids)
+        with multiprocessing.Pool(clients) as pool:
+            counts = pool.map(load_client, [(socket_path, texts, i * 97, duration) for i in range(clients)])
+        after = mean_memory(pids)
+        parent = memory_kb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {'throughput': sum(counts) / duration, 'before': before, 'after': after, 'parent': parent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prefork server scaling benchmark')
+    cpus = os.cpu_count() or 1
+    default_workers = ','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= max(cpus, 2))
+    parser.add_argument('--workers', default=default_workers)
+    parser.add_argument('--clients-per-worker', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    texts = [text for text, _ in load_training_data()]
+    print(f"{cpus} CPUs, {args.duration:g} s per run, "
+          f"{args.clients_per_worker} client processes per worker\n")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>8} {'RSS MB':>8} {'PSS MB':>8} "
+          f"{'USS MB':>8} {'USS after':>10} {'parent RSS':>11}")
+
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (int(n) for n in args.workers.split(',')):
+            result = run(workers, workers * args.clients_per_worker, args.duration, texts, tmp)
+            base = base or result['throughput']
+            before, after = result['before'], result['after']
+            print(f"{workers:7d} {result['throughput']:8.0f} {result['throughput'] / base:7.2f}x "
+                  f"{before['rss'] / 1024:8.1f} {before['pss'] / 1024:8.1f} {before['uss'] / 1024:8.1f} "
+                  f"{after['uss'] / 1024:10.1f} {result['parent']['rss'] / 1024:11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request profiler overhead and capture check
+
+The same synthetic corpus (see nlp_pipeline.py) is processed in interleaved
+rounds by managers that differ only in their profiler:
+  - none:      profiler=None
+  - off:       profiler attached but switched off (server default)
+  - every=N:   every Nth request profiled and written
+  - slow_ms:   every request profiled, only the slow ones written
+Afterwards the captures in the temporary profile directory are counted
+(rotation keeps --keep of them) and one redacted summary is shown.
+
+Usage:
+    python3 benchmarks/request_profiler.py [--messages 1000] [--rounds 5] [--every 100]
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from model_registry import ModelRegistry
+from request_profiler import RequestProfiler, redact_message
+from nlp_pipeline import generate_corpus
+
+# Messages whose redaction is printed: names, ids and an email must not survive
+REDACTION_EXAMPLES = [
+    'book with Walter Whitman tomorrow at 3pm',
+    'my student id is 20261234, mail me at walter.whitman@example.com',
+    'find math tutor on 20.10.2026 at 14:30',
+]
+
+
+def time_pass(func, texts) -> float:
+    """Mean µs per message of one pass"""
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request profiler overhead')
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--every', type=int, default=100, help='sampling interval of the every=N variant')
+    parser.add_argument('--slow-ms', type=float, default=10.0, help='threshold of the slow_ms variant')
+    parser.add_argument('--keep', type=int, default=20, help='captures kept per directory')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    texts = [text for text, _ in generate_corpus(args.messages, 0.2, 0.5, args.seed)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        registry = ModelRegistry(tmp / 'registry')
+        profilers = {
+            'none': None,
+            'off': RequestProfiler(args.every, args.slow_ms, tmp / 'off', args.keep),
+            f'every={args.every}': RequestProfiler(args.every, 0, tmp / 'every', args.keep, enabled=True),
+            f'slow_ms={args.slow_ms:g}': RequestProfiler(0, args.slow_ms, tmp / 'slow', args.keep, enabled=True),
+        }
+        managers = {name: DialogManager(registry=registry, profiler=profiler)
+                    for name, profiler in profilers.items()}
+        for manager in managers.values():
+            # Warm up without the profiler, as the servers do
+            profiler, manager.profiler = manager.profiler, None
+            time_pass(manager.process_message, texts)
+            manager.profiler = profiler
+
+        samples = {name: [] for name in managers}
+        for round_index in range(args.rounds):
+            # Alternate the order, so no variant always runs right after another
+            order = list(managers) if round_index % 2 == 0 else list(managers)[::-1]
+            for name in order:
+                samples[name].append(time_pass(managers[name].process_message, texts))
+
+        medians = {name: statistics.median(values) for name, values in samples.items()}
+        base = medians['none']
+        print(f"{len(texts)} messages x {args.rounds} interleaved rounds (median µs per message)\n")
+        print(f"{'variant':14} {'µs/msg':>9} {'vs none':>9} {'profiled':>9} {'written':>8} {'on disk':>8}")
+        for name, value in medians.items():
+            profiler = profilers[name]
+            counts = f"{'':>9} {'':>8} {'':>8}"
+            if profiler is not None:
+                on_disk = len(list(profiler.directory.glob('*.json'))) if profiler.directory.exists() else 0
+                counts = f"{profiler.profiled:9} {profiler.written:8} {on_disk:8}"
+            print(f"{name:14} {value:9.1f} {value / base - 1:+9.2%} {counts}")
+
+        captures = sorted((tmp / 'every').glob('*.json'))
+        if captures:
+            with open(captures[-1], 'r', encoding='utf-8') as f:
+                details = json.load(f)
+            top = details.pop('top_functions')
+            print(f"\nLatest capture {captures[-1].stem}:")
+            print(json.dumps(details, ensure_ascii=False, indent=2))
+            print('\n'.join(top.strip().splitlines()[:12]))
+
+    print("\nRedaction:")
+    for text in REDACTION_EXAMPLES:
+        print(f"  {text}\n  -> {redact_message(text)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Session store benchmark: per-turn payload and cost vs. conversation length
+
+Replays a scripted chat for a growing number of turns and compares:
+  - context: the client round-trips its accumulated state (entities plus
+    the tutor search results chatbot.js keeps in currentData) every turn
+  - memory / sqlite: the client sends only a session id, the context is
+    kept by the session store
+
+Reported per turn at the end of the conversation: request payload bytes,
+request parse time and the full process_message time.
+
+Usage:
+    python3 benchmarks/session_store.py [--turns 1,10,100,500]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+SCRIPT = [
+    "find a math tutor",
+    "tomorrow at 3pm please",
+    "actually make it physics",
+    "show my bookings for next week",
+    "cancel my friday booking",
+]
+
+SESSION_ID = 'c0ffee00-0000-4000-8000-000000000001'
+
+
+def fake_search_results(turn: int):
+    """What chatbot.js stores in currentData.tutors after a search"""
+    return [
+        {'tutor_id': turn * 10 + i, 'name': f'Tutor{i}', 'surname': f'Surname{turn}',
+         'subject': 'Mathematics', 'rating': 4.5, 'picture': f'/img/tutor_{i}.png'}
+        for i in range(10)
+    ]
+
+
+def run_conversation(manager: DialogManager, turns: int, mode: str):
+    """Returns (payload bytes, parse µs, process µs) of the last turn"""
+    client_state = {}
+    for turn in range(turns):
+        message = SCRIPT[turn % len(SCRIPT)]
+        if mode == 'context':
+            payload = {'action': 'process_message', 'message': message, 'context': client_state}
+        else:
+            payload = {'action': 'process_message', 'message': message, 'session_id': SESSION_ID}
+        raw = json.dumps(payload)
+
+        start = time.perf_counter()
+        request = json.loads(raw)
+        parsed = time.perf_counter()
+        result = manager.process_message(request['message'], request.get('context'),
+                                         request.get('session_id'))
+        done = time.perf_counter()
+
+        # Legacy client: Object.assign(currentData, result.entities) plus search results
+        client_state.update(result['entities'])
+        if result['intent'] == 'search_tutor':
+            client_state.setdefault('tutors', []).extend(fake_search_results(turn))
+    return len(raw), (parsed - start) * 1e6, (done - parsed) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session store benchmark')
+    parser.add_argument('--turns', default='1,10,100,500')
+    args = parser.parse_args()
+
+    turn_counts = [int(n) for n in args.turns.split(',')]
+    base = DialogManager()
+    base.process_message('hello')  # warm lazy initialization
+
+    with tempfile.TemporaryDirectory() as tmp:
+        managers = {
+            'context': base,
+            'memory': DialogManager(session_store=MemorySessionStore()),
+            'sqlite': DialogManager(session_store=SQLiteSessionStore(str(Path(tmp) / 'sessions.sqlite3'))),
+        }
+        # Share the loaded model so only the context handling differs
+        for manager in managers.values():
+            manager.intent_model = base.intent_model
+
+        print(f"{'mode':8} {'turns':>6} {'payload B':>10} {'parse µs':>9} {'process µs':>11}")
+        for mode, manager in managers.items():
+            for turns in turn_counts:
+                if manager.session_store is not None:
+                    manager.session_store.delete(SESSION_ID)
+                size, parse_us, process_us = run_conversation(manager, turns, mode)
+                print(f"{mode:8} {turns:6d} {size:10d} {parse_us:9.1f} {process_us:11.1f}")
+
+
+if __name__ == '__main__':
+    main()
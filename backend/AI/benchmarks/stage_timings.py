@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage timing overhead and per-stage breakdown of DialogManager.process_message
+
+Two managers process the same synthetic corpus (see nlp_pipeline.py) in
+interleaved rounds, so machine noise hits every variant alike:
+  - off:   timings=False, what the library default costs
+  - on:    timings=True, stage histograms recorded (server default)
+  - debug: timings=True and debug=True, "timings" added to every result
+The disabled path only adds "timer is None" checks; their cost is also
+timed directly. Finally the recorded histograms give the mean and p99 of
+every stage.
+
+Usage:
+    python3 benchmarks/stage_timings.py [--messages 1000] [--rounds 7]
+"""
+
+import sys
+import time
+import timeit
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from model_registry import ModelRegistry
+from nlp_pipeline import generate_corpus
+
+# "timer is None" checks on the process_message path when timings are off
+DISABLED_CHECKS = 8
+
+
+def time_pass(func, texts) -> float:
+    """Mean µs per message of one pass"""
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage timing overhead of process_message')
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    texts = [text for text, _ in generate_corpus(args.messages, 0.2, 0.5, args.seed)]
+    with tempfile.TemporaryDirectory() as registry_dir:
+        registry = ModelRegistry(registry_dir)
+        off = DialogManager(registry=registry)
+        on = DialogManager(registry=registry, timings=True)
+        variants = {
+            'off': off.process_message,
+            'on': on.process_message,
+            'debug': lambda text: on.process_message(text, debug=True),
+        }
+        for func in variants.values():
+            time_pass(func, texts)
+        on.reset_timings()
+
+        samples = {name: [] for name in variants}
+        for round_index in range(args.rounds):
+            # Alternate the order, so no variant always runs right after another
+            order = list(variants) if round_index % 2 == 0 else list(variants)[::-1]
+            for name in order:
+                samples[name].append(time_pass(variants[name], texts))
+
+    check_ns = min(timeit.repeat('if timer is not None: pass', 'timer = None', number=1000000, repeat=5)) * 1000
+    medians = {name: statistics.median(values) for name, values in samples.items()}
+    base = medians['off']
+
+    print(f"{len(texts)} messages x {args.rounds} interleaved rounds (median µs per message)\n")
+    print(f"{'variant':10} {'µs/msg':>9} {'vs off':>9}")
+    for name, value in medians.items():
+        print(f"{name:10} {value:9.1f} {value / base - 1:+9.2%}")
+    print(f"\ndisabled path: {DISABLED_CHECKS} checks x {check_ns:.1f} ns = "
+          f"{DISABLED_CHECKS * check_ns / 1000:.3f} µs per message ({DISABLED_CHECKS * check_ns / 1000 / base:.3%})")
+
+    print(f"\n{'stage':20} {'mean µs':>9} {'p99 µs':>9} {'share':>7}")
+    stages = on.timing_stats()
+    total = stages['total']['mean']
+    for stage, snapshot in stages.items():
+        p99 = snapshot['p99'] * 1000 if snapshot['p99'] != float('inf') else float('inf')
+        print(f"{stage:20} {snapshot['mean'] * 1000:9.1f} {p99:9.0f} {snapshot['mean'] / total:7.1%}")
+    print("(p99 is the upper bound of its histogram bucket)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Training pipeline benchmark: per-model reload vs. train_models.py
+
+Builds synthetic corpora by scaling training_data/*.json with misspelled
+copies (so texts stay distinct), then compares wall-clock time of:
+  - sequential: each model type loads and preprocesses the corpus itself
+    and is trained one after the other (the previous behaviour)
+  - train_all: one load + preprocess, models trained in a process pool
+
+Models (and their registry) are written to a temporary directory, never to models/.
+
+Usage:
+    python3 benchmarks/training_pipeline.py [--scales 1,10,50] [--jobs N]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+AI_DIR = CURRENT_DIR.parent.resolve()
+CORE_DIR = AI_DIR / 'core'
+for path in (AI_DIR, CORE_DIR, CURRENT_DIR.resolve()):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from intent_classifier import MODEL_TYPES, load_training_data, load_corpus, train_model, save_model
+from train_models import train_all
+from typo_correction import misspell
+
+
+def write_scaled_corpus(data_dir: Path, scale: int, seed: int = 42):
+    """training_data scaled by `scale`: originals plus misspelled copies"""
+    rng = random.Random(seed)
+    by_intent = {}
+    for text, intent in load_training_data():
+        by_intent.setdefault(intent, []).append(text)
+
+    for intent, examples in by_intent.items():
+        scaled = list(examples)
+        for _ in range(scale - 1):
+            for text in examples:
+                words = [misspell(w, rng) if len(w) >= 4 and rng.random() < 0.3 else w
+                         for w in text.split()]
+                scaled.append(' '.join(words))
+        with open(data_dir / f'{intent}.json', 'w', encoding='utf-8') as f:
+            json.dump({'intent': intent, 'examples': scaled}, f)
+
+
+def sequential(data_dir: Path, output_dir: Path) -> float:
+    start = time.perf_counter()
+    for model_type in MODEL_TYPES:
+        texts, labels = load_corpus(data_dir)
+        save_model(train_model(model_type, texts, labels), model_type,
+                   output_dir / f'intent_model_{model_type}.pkl')
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Training pipeline benchmark')
+    parser.add_argument('--scales', default='1,10,50')
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    # Pay one-time costs (sklearn import, typo index) before timing anything
+    train_model('knn', *load_corpus())
+
+    print(f"{'scale':>6} {'examples':>9} {'sequential s':>13} {'train_all s':>12} {'speedup':>8}  stages")
+    for scale in (int(s) for s in args.scales.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir, output_dir = Path(tmp) / 'data', Path(tmp) / 'models'
+            data_dir.mkdir()
+            output_dir.mkdir()
+            write_scaled_corpus(data_dir, scale)
+
+            baseline = sequential(data_dir, output_dir)
+            start = time.perf_counter()
+            stages, _, examples = train_all(list(MODEL_TYPES), data_dir, output_dir, args.jobs,
+                                            registry_dir=output_dir / 'registry')
+            elapsed = time.perf_counter() - start
+
+            breakdown = ' '.join(f"{name}={seconds:.2f}" for name, seconds in stages.items())
+            print(f"{scale:6d} {examples:9d} {baseline:13.2f} {elapsed:12.2f} "
+                  f"{baseline / elapsed:7.2f}x  {breakdown}")
+
+
+if __name__ == '__main__':
+    main()
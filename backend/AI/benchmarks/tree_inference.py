@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decision tree inference: sklearn Pipeline vs compact flat-array tree
+
+Loads intent_model_decision_tree.pkl and its compact export (written by
+`intent_classifier.py export decision_tree`) and checks on a synthetic
+corpus (see nlp_pipeline.py) plus the training phrases that both reach the
+same leaf and return identical predict_proba for every message, batched
+and one at a time.
+
+Latency is then measured per batch size (median µs per message of
+interleaved rounds):
+  - pipeline:     Pipeline.predict_proba(texts), TF-IDF included
+  - compact:      CompactTreeModel.predict_proba(texts), TF-IDF included
+  - sklearn tree: the fitted tree's predict_proba on pre-computed features
+  - row walk / level walk: CompactTreeModel.predict_proba_features on
+    pre-computed features, forced to one traversal (see
+    TREE_ROW_WALK_MAX_ROWS for the one used by default)
+
+Usage:
+    python3 benchmarks/tree_inference.py [--messages 2048] [--rounds 5]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from compact_model import load_compact_model, TREE_ROW_WALK_MAX_ROWS
+from intent_classifier import load_model, load_corpus, preprocess_texts
+from nlp_pipeline import generate_corpus
+
+MODEL_DIR = (CURRENT_DIR / '..' / 'models' / 'intent_model_decision_tree').resolve()
+BATCH_SIZES = (1, 8, 32, 128, 1024)
+
+
+def check_parity(pipeline, compact, texts):
+    """Leaves and probabilities of the compact tree against the pipeline's; raises on a mismatch"""
+    vectorizer, tree = pipeline.named_steps['tfidf'], pipeline.named_steps['clf']
+    expected_leaves = tree.apply(vectorizer.transform(texts))
+    expected = pipeline.predict_proba(texts)
+    features = compact.featurize(texts)
+    for name, walk_rows in (('level walk', 0), ('row walk', len(texts))):
+        compact.row_walk_max_rows = walk_rows
+        leaves = compact.apply_features(features)
+        assert (leaves == expected_leaves).all(), f"{name}: {int((leaves != expected_leaves).sum())} leaves differ"
+        assert np.array_equal(compact.predict_proba_features(features), expected), f"{name}: predict_proba differs"
+    compact.row_walk_max_rows = TREE_ROW_WALK_MAX_ROWS
+    singles = np.vstack([compact.predict_proba([text]) for text in texts])
+    assert np.array_equal(singles, expected), "single-message predict_proba differs"
+
+
+def time_batches(func, batches, n_messages: int) -> float:
+    """Mean µs per message of one pass over the batches"""
+    start = time.perf_counter()
+    for batch in batches:
+        func(batch)
+    return (time.perf_counter() - start) / n_messages * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decision tree inference latency')
+    parser.add_argument('--messages', type=int, default=2048)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    pipeline = load_model('decision_tree')
+    compact = load_compact_model(MODEL_DIR)
+    vectorizer, tree = pipeline.named_steps['tfidf'], pipeline.named_steps['clf']
+    texts = preprocess_texts([text for text, _ in generate_corpus(args.messages, 0.2, 0.5, args.seed)])
+
+    check_parity(pipeline, compact, texts + load_corpus()[0])
+    print(f"Parity: identical leaves and predict_proba on {len(texts)} synthetic messages and the "
+          f"training phrases (tree of {len(compact.feature)} nodes, depth {tree.get_depth()})\n")
+
+    def walk(rows):
+        def run(features):
+            compact.row_walk_max_rows = rows
+            return compact.predict_proba_features(features)
+        return run
+
+    print(f"{len(texts)} messages x {args.rounds} interleaved rounds (median µs per message)\n")
+    print(f"{'batch':>6} {'pipeline':>9} {'compact':>9} {'speedup':>8} {'sklearn tree':>13} "
+          f"{'row walk':>9} {'level walk':>11}")
+    for size in BATCH_SIZES:
+        text_batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        sparse_batches = [vectorizer.transform(batch) for batch in text_batches]
+        feature_batches = [compact.featurize(batch) for batch in text_batches]
+        variants = {
+            'pipeline': (pipeline.predict_proba, text_batches),
+            'compact': (compact.predict_proba, text_batches),
+            'sklearn tree': (tree.predict_proba, sparse_batches),
+            'row walk': (walk(size), feature_batches),
+            'level walk': (walk(0), feature_batches),
+        }
+        samples = {name: [] for name in variants}
+        for round_index in range(args.rounds):
+            # Alternate the order, so no variant always runs right after another
+            for name in (list(variants) if round_index % 2 == 0 else list(variants)[::-1]):
+                func, batches = variants[name]
+                samples[name].append(time_batches(func, batches, len(texts)))
+        compact.row_walk_max_rows = TREE_ROW_WALK_MAX_ROWS
+        medians = {name: statistics.median(values) for name, values in samples.items()}
+        print(f"{size:6} {medians['pipeline']:9.1f} {medians['compact']:9.1f} "
+              f"{medians['pipeline'] / medians['compact']:7.1f}x {medians['sklearn tree']:13.1f} "
+              f"{medians['row walk']:9.2f} {medians['level walk']:11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tutor gazetteer scaling benchmark
+
+Builds gazetteers with a growing number of synthetic tutors and measures
+per-message lookup latency for exact hits, fuzzy hits (one typo) and
+misses, plus build time and the cost of an incremental update.
+
+Usage:
+    python3 benchmarks/tutor_gazetteer.py [--sizes 100,1000,10000,50000]
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from tutor_gazetteer import TutorGazetteer
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'vel', 'dor', 'sa', 'ni', 'bru', 'qua', 'zel',
+             'mar', 'ti', 'gon', 'phe', 'lix', 'ya', 'ost', 'wen', 'dra', 'cel', 'ui', 'ber']
+
+
+def synthetic_name(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def synthetic_tutors(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {'tutor_id': tutor_id, 'name': synthetic_name(rng), 'surname': synthetic_name(rng)}
+        for tutor_id in range(1, count + 1)
+    ]
+
+
+def with_typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:]
+
+
+def lookup_latency_us(gazetteer, messages, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for message in messages:
+            gazetteer.resolve(message)
+        samples.append((time.perf_counter() - start) / len(messages) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tutor gazetteer scaling benchmark')
+    parser.add_argument('--sizes', default='100,1000,10000,50000')
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    rng = random.Random(7)
+
+    print(f"{'tutors':>8} {'build ms':>10} {'exact µs':>10} {'fuzzy µs':>10} "
+          f"{'miss µs':>10} {'update µs':>10} {'hit rate':>9}")
+
+    for size in sizes:
+        tutors = synthetic_tutors(size)
+        gazetteer = TutorGazetteer()
+
+        start = time.perf_counter()
+        gazetteer.sync(tutors)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        sample = [rng.choice(tutors) for _ in range(args.messages)]
+        exact = [f"book a lesson with {t['name'].lower()} {t['surname'].lower()} tomorrow" for t in sample]
+        fuzzy = [f"book a lesson with {t['name']} {with_typo(t['surname'].lower(), rng)}" for t in sample]
+        misses = ["show my bookings for next week please"] * args.messages
+
+        exact_us = lookup_latency_us(gazetteer, exact, args.repeats)
+        fuzzy_us = lookup_latency_us(gazetteer, fuzzy, args.repeats)
+        miss_us = lookup_latency_us(gazetteer, misses, args.repeats)
+        hits = 0
+        for message, tutor in zip(exact, sample):
+            match = gazetteer.resolve(message)
+            hits += match is not None and tutor['tutor_id'] in match['tutor_ids']
+
+        # Incremental update: rename tutors one at a time
+        updates = [dict(t, surname=synthetic_name(rng)) for t in rng.sample(tutors, min(100, size))]
+        start = time.perf_counter()
+        for row in updates:
+            gazetteer.upsert(row['tutor_id'], row['name'], row['surname'])
+        update_us = (time.perf_counter() - start) / len(updates) * 1e6
+
+        print(f"{size:8d} {build_ms:10.1f} {exact_us:10.1f} {fuzzy_us:10.1f} "
+              f"{miss_us:10.1f} {update_us:10.1f} {hits / len(exact):9.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Typo correction benchmark: exact dictionary vs. symmetric-delete index
+
+Builds misspelled variants of the training examples (random deletions,
+insertions, substitutions and transpositions) and reports, for both
+correction paths:
+  - intent accuracy of the serving model on clean and misspelled inputs
+  - per-message normalization latency
+
+Usage:
+    python3 benchmarks/typo_correction.py [--typo-rate 0.3] [--seed 42]
+"""
+
+import sys
+import time
+import random
+import string
+import argparse
+import statistics
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from intent_classifier import load_training_data, predict_intents
+from nlp_utils import TextNormalizer
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Apply one random edit to a word"""
+    i = rng.randrange(len(word))
+    operation = rng.choice(['delete', 'insert', 'substitute', 'transpose'])
+    if operation == 'delete':
+        return word[:i] + word[i + 1:]
+    if operation == 'insert':
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if operation == 'substitute':
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    if i == len(word) - 1:
+        i -= 1
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def build_misspelled_corpus(examples, typo_rate: float, seed: int):
+    """Misspell words of 4+ letters with probability typo_rate"""
+    rng = random.Random(seed)
+    corpus = []
+    for text, intent in examples:
+        words = [
+            misspell(word, rng) if len(word) >= 4 and word.isalpha() and rng.random() < typo_rate else word
+            for word in text.split()
+        ]
+        corpus.append((' '.join(words), intent))
+    return corpus
+
+
+def accuracy(model, corpus) -> float:
+    results = predict_intents(model, [text for text, _ in corpus], top_k=1)
+    correct = sum(result['intent'] == intent for result, (_, intent) in zip(results, corpus))
+    return correct / len(corpus)
+
+
+def normalize_latency_us(texts, repeats: int) -> dict:
+    """Per-message normalize() latency, first pass (cold token cache) and warm"""
+    TextNormalizer._token_cache = {}
+    start = time.perf_counter()
+    for text in texts:
+        TextNormalizer.normalize(text)
+    cold = (time.perf_counter() - start) / len(texts) * 1e6
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            TextNormalizer.normalize(text)
+        samples.append((time.perf_counter() - start) / len(texts) * 1e6)
+    return {'cold_us': cold, 'warm_us': statistics.median(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Typo correction benchmark')
+    parser.add_argument('--typo-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    model = DialogManager().intent_model
+    clean = load_training_data()
+    misspelled = build_misspelled_corpus(clean, args.typo_rate, args.seed)
+    texts = [text for text, _ in misspelled]
+
+    print(f"Corpus: {len(clean)} examples, typo rate {args.typo_rate:.0%} per word (4+ letters)\n")
+    print(f"{'path':12} {'clean acc':>10} {'typo acc':>10} {'cold µs/msg':>12} {'warm µs/msg':>12}")
+
+    # Build the index outside the timed region, it is a one-time startup cost
+    start = time.perf_counter()
+    TextNormalizer._load_spell_index()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    for label, fuzzy in (('dictionary', False), ('symspell', True)):
+        TextNormalizer.set_fuzzy_correction(fuzzy)
+        clean_acc = accuracy(model, clean)
+        typo_acc = accuracy(model, misspelled)
+        latency = normalize_latency_us(texts, args.repeats)
+        print(f"{label:12} {clean_acc:10.1%} {typo_acc:10.1%} "
+              f"{latency['cold_us']:12.1f} {latency['warm_us']:12.1f}")
+
+    TextNormalizer.set_fuzzy_correction(True)
+    print(f"\nSymSpell index: {len(TextNormalizer._spell_index.words)} words, "
+          f"{len(TextNormalizer._spell_index.deletes)} delete keys, built in {build_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Dialog Server - asyncio front end with dynamic micro-batching
+
+Speaks the same newline-delimited JSON protocol on the same socket as
+dialog_server.py, so the PHP client works with either. Concurrent
+process_message requests are queued and grouped into micro-batches:
+a batch is flushed when it reaches --max-batch-size or when its oldest
+request has waited --max-wait-ms, whichever comes first. Each batch goes
+through the TF-IDF vectorizer and classifier in one call
+(DialogManager.process_messages) and the results are fanned back out.
+
+Batch-size, queue-delay and per-stage latency histograms are included in
+the "stats" response; {"action": "metrics"} returns them in the Prometheus
+text format. Stage timings of a batch are recorded per message; requests
+with "debug": true skip batching, so their "timings" describe them alone.
+SIGUSR1 switches the request profiler on and off; while it is on, requests
+skip batching too, so each one can be captured on its own.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from dialog_manager import DialogManager
+from dialog_server import (DEFAULT_SOCKET_PATH, MAX_REQUEST_BYTES, LISTEN_BACKLOG,
+                           bind_socket, handle_request, process_message_args)
+from metrics import Histogram, LATENCY_BUCKETS_MS
+from session_store import create_session_store, DEFAULT_SESSION_TTL
+from model_registry import MODEL_POLL_SECONDS
+from request_profiler import RequestProfiler
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Queues process_message calls and runs them through the model in batches"""
+
+    def __init__(self, manager: DialogManager, max_batch_size: int = 32, max_wait: float = 0.005):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        self.manager = manager
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS, unit='requests')
+        self.queue_delay_histogram = Histogram(LATENCY_BUCKETS_MS, unit='ms')
+        # One worker thread: batches run one at a time, and every other manager
+        # call is routed through the same thread, so DialogManager needs no locking
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dialog-batch')
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, message: str, context, session_id) -> Dict[str, Any]:
+        """Queue one message and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((time.perf_counter(), (message, context, session_id), future))
+        return await future
+
+    async def run_in_worker(self, func, *args):
+        """Run a manager call on the batch thread (serialized with batches)"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _collect(self) -> List[Tuple[float, Tuple, asyncio.Future]]:
+        """Wait for the first request, then fill the batch until full or its deadline passes"""
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first[0] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Whatever is already queued joins for free
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self.batch_size_histogram.observe(len(batch))
+            for enqueued_at, _, _ in batch:
+                self.queue_delay_histogram.observe((started - enqueued_at) * 1000)
+
+            requests = [request for _, request, _ in batch]
+            outcomes = await self.run_in_worker(self._process, requests)
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _process(self, requests: List[Tuple]) -> List[Tuple[bool, Any]]:
+        """
+        Batch call; if it fails, retry one by one so a bad message only fails itself
+        Requests that completed before the failure already updated their session
+        and are not run again.
+        """
+        completed = []
+        try:
+            return [(True, result) for result in self.manager.process_messages(requests, completed)]
+        except Exception:
+            outcomes = [(True, result) for result in completed]
+            for message, context, session_id in requests[len(completed):]:
+                try:
+                    outcomes.append((True, self.manager.process_message(message, context, session_id)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            return outcomes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_delay': self.queue_delay_histogram.snapshot()
+        }
+
+    def prometheus(self) -> str:
+        text = (
+            self.batch_size_histogram.to_prometheus(
+                'agyrus_dialog_batch_size', 'Requests per micro-batch') +
+            self.queue_delay_histogram.to_prometheus(
+                'agyrus_dialog_queue_delay_ms', 'Time a request waited for its batch')
+        )
+        if self.manager.stage_histograms is not None:
+            text += self.manager.stage_histograms.to_prometheus(
+                'agyrus_dialog_stage_ms', 'Time per message spent in each processing stage')
+        return text
+
+
+async def dispatch(batcher: MicroBatcher, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Async counterpart of dialog_server.handle_request"""
+    action = request.get('action', 'process_message')
+
+    if action == 'process_message':
+        try:
+            message, context, session_id = process_message_args(request)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        profiler = batcher.manager.profiler
+        if request.get('debug') or (profiler is not None and profiler.enabled):
+            result = await batcher.run_in_worker(batcher.manager.process_message, message, context,
+                                                 session_id, bool(request.get('debug')))
+            return {'success': True, 'result': result}
+        return {'success': True, 'result': await batcher.submit(message, context, session_id)}
+
+    if action == 'metrics':
+        return {'success': True, 'result': batcher.prometheus()}
+
+    if action == 'learn':
+        # Model updates run off the batch thread, so batches keep flowing meanwhile
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, handle_request, batcher.manager, request)
+
+    response = await batcher.run_in_worker(handle_request, batcher.manager, request)
+    if action == 'stats' and response.get('success'):
+        response['result']['batching'] = batcher.stats()
+    return response
+
+
+async def handle_connection(batcher: MicroBatcher, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter):
+    """Reads newline-delimited JSON requests and writes one JSON line per response"""
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # Line longer than the stream limit
+                await _send(writer, {'success': False, 'error': 'Request too large'})
+                break
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('Request must be a JSON object')
+                response = await dispatch(batcher, request)
+            except (ValueError, json.JSONDecodeError) as e:
+                response = {'success': False, 'error': f"Invalid request: {e}"}
+            except Exception as e:
+                response = {'success': False, 'error': f"Internal error: {e}"}
+
+            await _send(writer, response)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _send(writer: asyncio.StreamWriter, response: Dict[str, Any]):
+    writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+    await writer.drain()
+
+
+async def serve_async(socket_path: str, manager: DialogManager, max_batch_size: int, max_wait: float):
+    """Serve until SIGINT/SIGTERM"""
+    batcher = MicroBatcher(manager, max_batch_size, max_wait)
+    batcher.start()
+
+    server = await asyncio.start_unix_server(
+        lambda r, w: handle_connection(batcher, r, w), sock=bind_socket(socket_path),
+        limit=MAX_REQUEST_BYTES, backlog=LISTEN_BACKLOG)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    loop.add_signal_handler(signal.SIGUSR1, manager.profiler.toggle)
+
+    print(f"Async dialog server listening on {socket_path} "
+          f"(max batch {max_batch_size}, max wait {max_wait * 1000:g} ms)", file=sys.stderr)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await batcher.stop()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH, cache_size: int = 0, cache_ttl: float = None,
+          session_backend: str = 'memory', session_db: str = None,
+          session_ttl: float = DEFAULT_SESSION_TTL, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+          online: bool = False, model_poll_interval: float = MODEL_POLL_SECONDS, timings: bool = True,
+          fast_path: str = 'exact', ensemble: bool = False):
+    """Load the dialog manager once and serve until interrupted"""
+    session_store = create_session_store(session_backend, session_db, session_ttl)
+    manager = DialogManager(cache_size=cache_size, cache_ttl=cache_ttl, session_store=session_store,
+                            online=online, timings=timings,
+                            fast_path=None if fast_path == 'off' else fast_path, ensemble=ensemble)
+    # Warm up so the first real request does not pay for lazy initialization
+    manager.process_messages([('hello', None, None), ('find math tutor', None, None)])
+    manager.reset_timings()
+    manager.profiler = RequestProfiler.from_env()
+    if model_poll_interval > 0:
+        # Loads and warms new versions in its own thread; batches keep running meanwhile
+        manager.model_watcher(model_poll_interval).start()
+
+    asyncio.run(serve_async(socket_path, manager, max_batch_size, max_wait_ms / 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve DialogManager over a Unix socket with micro-batching')
+    parser.add_argument('socket_path', nargs='?', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--max-batch-size', type=int, default=32,
+                        help='flush a batch once it holds this many messages')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='flush a batch once its oldest message waited this long')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='response cache entries (0 disables the cache)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help='response cache entry lifetime in seconds')
+    parser.add_argument('--session-backend', choices=['memory', 'sqlite'], default='memory',
+                        help='where per-session context lives (sqlite is shared between processes)')
+    parser.add_argument('--session-db', default=None,
+                        help='SQLite session store path (default: $AGYRUS_SESSION_DB or /tmp)')
+    parser.add_argument('--session-ttl', type=float, default=DEFAULT_SESSION_TTL,
+                        help='seconds of inactivity before a session is forgotten')
+    parser.add_argument('--online', action='store_true',
+                        help='serve the incrementally trainable model and accept "learn" requests')
+    parser.add_argument('--model-poll-interval', type=float, default=MODEL_POLL_SECONDS,
+                        help='seconds between checks for a newly promoted model (0 disables reloading)')
+    parser.add_argument('--no-timings', action='store_true',
+                        help='do not keep per-stage latency histograms (stats "stages")')
+    parser.add_argument('--fast-path', choices=['off', 'exact', 'keywords'], default='exact',
+                        help='answer training phrases (exact) and keyword rule matches (keywords) '
+                             'without the classifier')
+    parser.add_argument('--ensemble', action='store_true',
+                        help='serve the decision tree, logistic and KNN models as one early-exit ensemble')
+    args = parser.parse_args()
+
+    serve(args.socket_path, args.cache_size, args.cache_ttl,
+          args.session_backend, args.session_db, args.session_ttl,
+          args.max_batch_size, args.max_wait_ms, args.online, args.model_poll_interval,
+          not args.no_timings, args.fast_path, args.ensemble)
@@ -0,0 +1,732 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact intent model - pure NumPy inference without scikit-learn or pickle
+
+The fitted TF-IDF vocabulary, IDF weights and classifier arrays are stored
+as a small directory:
+
+    config.json             - vectorizer settings, stop words, classes
+    vocabulary.npy          - terms in feature order as a fixed-width byte array
+    vocabulary_slots.npy    - hash table of feature indices (see HashedVocabulary)
+    idf.npy                 - IDF weight per feature
+  logistic:
+    coef.npy                - coefficient matrix (n_classes x n_features)
+    intercept.npy           - intercept per class
+  knn:
+    train_data.npy, train_indices.npy, train_indptr.npy
+                            - training TF-IDF matrix in CSR form
+    train_norms.npy         - L2 norm of each training row
+    train_labels.npy        - class index of each training row
+    train_postings_data.npy, train_postings_rows.npy, train_postings_indptr.npy
+                            - the same matrix in column order (see knn_search.py;
+                              rebuilt at load time when missing)
+  decision_tree:
+    tree_feature.npy        - feature tested by each node (-1 for leaves)
+    tree_threshold.npy      - split threshold of each node
+    tree_left.npy, tree_right.npy
+                            - child node indices (-1 for leaves)
+    tree_proba.npy          - class distribution of each node (n_nodes x n_classes)
+
+Arrays are opened with mmap_mode='r': every process serving the same
+artifact maps the same page-cache pages instead of holding a private copy,
+and the vocabulary is looked up in a mapped hash table rather than through
+a per-process dict of Python strings.
+
+The artifact is written by intent_classifier.export_compact_model()
+"""
+
+import os
+import re
+import json
+import math
+import zlib
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from knn_search import PostingsIndex, HyperplaneLSH, csr_to_postings, gather_spans
+
+FORMAT_VERSION = 2
+# Format 1 kept the vocabulary as a list inside config.json
+SUPPORTED_FORMATS = (1, 2)
+# Terms per process whose lookup result is kept in a dict (the hot part of the vocabulary)
+LOOKUP_CACHE_SIZE = 4096
+# KNN distances this close count as tied: the postings and the full scan sum the same
+# products in different orders, so they may differ in the last bits
+KNN_TIE_TOLERANCE = 1e-9
+# Batches up to this many rows walk the tree row by row in plain Python, larger
+# ones level by level with NumPy (crossover of the shipped depth-10 tree, see
+# benchmarks/tree_inference.py)
+TREE_ROW_WALK_MAX_ROWS = 96
+# Training rows up to which a full scan is cheaper than the postings search
+# (fixed numpy overhead per query; see benchmarks/knn_search.py)
+KNN_SCAN_MAX_ROWS = 2000
+# Padded (queries x candidates) cells a batch is ranked in at once by the KNN search
+KNN_SEARCH_CHUNK_CELLS = 1 << 22
+
+
+def row_sums(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Sum of each CSR row segment along the last axis of values; empty rows sum to 0"""
+    sums = np.zeros(values.shape[:-1] + (len(indptr) - 1,))
+    nonempty = np.flatnonzero(np.diff(indptr) > 0)
+    if len(nonempty):
+        sums[..., nonempty] = np.add.reduceat(values, indptr[nonempty], axis=-1)
+    return sums
+
+
+class HashedVocabulary:
+    """
+    Term -> feature index lookup over two flat arrays, usable memory-mapped
+
+    terms holds the UTF-8 terms in feature order as a fixed-width byte array;
+    slots is an open-addressing table (crc32 of the term, linear probing,
+    at most half full) of feature indices, -1 marking empty slots. Scalars
+    are read through memoryviews, several times cheaper than indexing a
+    numpy array. Recently seen terms are kept in a small bounded dict, so
+    the common words of a chat cost a dict lookup while the full vocabulary
+    stays shared between processes.
+    """
+
+    def __init__(self, terms: np.ndarray, slots: np.ndarray, cache_size: int = LOOKUP_CACHE_SIZE):
+        self.terms = terms
+        self.slots = slots
+        self.width = terms.dtype.itemsize
+        self.cache_size = cache_size
+        self._cache = {}
+        self._mask = len(slots) - 1
+        self._slots = memoryview(slots)
+        self._bytes = memoryview(terms.view(np.uint8))
+
+    @staticmethod
+    def arrays(vocabulary: List[str]):
+        """(terms, slots) arrays for a vocabulary listed in feature order"""
+        encoded = [term.encode('utf-8') for term in vocabulary]
+        width = max((len(term) for term in encoded), default=1)
+        size = 8
+        while size < 2 * len(encoded):
+            size *= 2
+        slots = np.full(size, -1, dtype=np.int32)
+        for index, term in enumerate(encoded):
+            slot = zlib.crc32(term) & (size - 1)
+            while slots[slot] >= 0:
+                slot = (slot + 1) & (size - 1)
+            slots[slot] = index
+        return np.array(encoded, dtype=f'S{width}'), slots
+
+    @classmethod
+    def from_list(cls, vocabulary: List[str]) -> 'HashedVocabulary':
+        return cls(*cls.arrays(vocabulary))
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def get(self, term: str) -> int:
+        """Feature index of a term, -1 when it is not in the vocabulary"""
+        index = self._cache.get(term)
+        if index is None:
+            index = self._probe(term)
+            if len(self._cache) < self.cache_size:
+                self._cache[term] = index
+        return index
+
+    def _probe(self, term: str) -> int:
+        key = term.encode('utf-8')
+        width = self.width
+        if len(key) > width:
+            return -1
+        padded = key.ljust(width, b'\0')
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            index = self._slots[slot]
+            if index < 0:
+                return -1
+            start = index * width
+            if self._bytes[start:start + width] == padded:
+                return index
+            slot = (slot + 1) & self._mask
+
+
+class CompactTfidfVectorizer:
+    """Reproduces TfidfVectorizer.transform for word n-grams"""
+
+    def __init__(self, vocabulary: HashedVocabulary, idf: Optional[np.ndarray], config: Dict[str, Any]):
+        self.vocabulary = vocabulary
+        self.n_features = len(vocabulary)
+        self.idf = idf
+        self.lowercase = config.get('lowercase', True)
+        self.token_pattern = re.compile(config.get('token_pattern', r'(?u)\b\w\w+\b'))
+        self.stop_words = frozenset(config.get('stop_words') or ())
+        self.ngram_range = tuple(config.get('ngram_range', (1, 1)))
+        self.binary = config.get('binary', False)
+        self.sublinear_tf = config.get('sublinear_tf', False)
+        self.norm = config.get('norm', 'l2')
+
+    def analyze(self, text: str) -> List[str]:
+        """Split text into the word n-grams the vectorizer was fitted on"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        if self.stop_words:
+            tokens = [token for token in tokens if token not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        # Same n-gram order as sklearn: unigrams first, then bigrams, ...
+        ngrams = list(tokens) if min_n == 1 else []
+        min_n = max(min_n, 2)
+        for n in range(min_n, min(max_n + 1, len(tokens) + 1)):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(' '.join(tokens[i:i + n]))
+        return ngrams
+
+    def transform_sparse(self, texts: List[str]):
+        """
+        TF-IDF rows in CSR form: (data, indices, indptr), columns sorted within a row
+        Memory is proportional to the terms found, not to the vocabulary size.
+        """
+        data, indices, indptr = [], [], [0]
+        lookup = self.vocabulary.get
+        # Rows hold a handful of terms: plain floats beat numpy calls on tiny arrays,
+        # and summing in column order matches sklearn's normalization exactly
+        idf = memoryview(np.ascontiguousarray(self.idf)) if self.idf is not None else None
+
+        for text in texts:
+            counts = {}
+            for term in self.analyze(text):
+                index = lookup(term)
+                if index >= 0:
+                    counts[index] = counts.get(index, 0) + 1
+            columns = sorted(counts)
+            values = [1.0 if self.binary else float(counts[index]) for index in columns]
+            if self.sublinear_tf:
+                values = [math.log(value) + 1.0 for value in values]
+            if idf is not None:
+                values = [value * idf[index] for value, index in zip(values, columns)]
+            if self.norm in ('l2', 'l1'):
+                total = 0.0
+                for value in values:
+                    total += value * value if self.norm == 'l2' else abs(value)
+                norm = math.sqrt(total) if self.norm == 'l2' else total
+                if norm > 0.0:
+                    values = [value / norm for value in values]
+            indices.extend(columns)
+            data.extend(values)
+            indptr.append(len(indices))
+
+        return (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64),
+                np.array(indptr, dtype=np.int64))
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """Return a dense (n_texts x n_features) TF-IDF matrix"""
+        data, indices, indptr = self.transform_sparse(texts)
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float64)
+        matrix[np.repeat(np.arange(len(texts)), np.diff(indptr)), indices] = data
+        return matrix
+
+
+class CompactLogisticModel:
+    """
+    Drop-in replacement for the logistic Pipeline at serving time
+    Exposes classes_, predict_proba() and predict() like the sklearn model
+    """
+
+    def __init__(self, vectorizer: CompactTfidfVectorizer, coef: np.ndarray,
+                 intercept: np.ndarray, classes: List[str], multi_class: str = 'multinomial'):
+        self.vectorizer = vectorizer
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = np.array(classes)
+        self.multi_class = multi_class
+
+    def featurize(self, texts: List[str]):
+        """Sparse TF-IDF rows (data, indices, indptr), the input of the *_features methods"""
+        return self.vectorizer.transform_sparse(texts)
+
+    def decision_function(self, texts: List[str]) -> np.ndarray:
+        return self.decision_function_features(self.featurize(texts))
+
+    def decision_function_features(self, features) -> np.ndarray:
+        data, indices, indptr = features
+        n_rows = len(indptr) - 1
+        if n_rows == 1:
+            scores = (self.coef[:, indices] @ data + self.intercept)[np.newaxis]
+        else:
+            # Dense features over the columns present in the batch only, so neither the
+            # features nor the coefficients read grow with the vocabulary size
+            columns, local = np.unique(indices, return_inverse=True)
+            dense = np.zeros((n_rows, len(columns)))
+            dense[np.repeat(np.arange(n_rows), np.diff(indptr)), local] = data
+            scores = dense @ self.coef[:, columns].T + self.intercept
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return self.predict_proba_features(self.featurize(texts))
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        scores = self.decision_function_features(features)
+
+        if scores.ndim == 1:
+            # Binary problem: sigmoid of the single decision value
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.vstack([1.0 - positive, positive]).T
+
+        if self.multi_class == 'ovr':
+            probabilities = 1.0 / (1.0 + np.exp(-scores))
+            probabilities /= probabilities.sum(axis=1).reshape(-1, 1)
+            return probabilities
+
+        # Multinomial: numerically stable softmax
+        scores = scores - scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+
+class CompactKNNModel:
+    """
+    Drop-in replacement for the KNN Pipeline (cosine metric) at serving time
+
+    The training matrix stays in CSR form, so only its non-zeros are mapped.
+    Neighbors are searched through its postings (knn_search.PostingsIndex):
+    a batch of queries costs one sparse product over the training rows that
+    share a term with them, instead of a scan of the whole corpus. Where
+    that could pick other neighbors than sklearn's brute force search (a
+    tie at the k-th distance between rows of different classes, or fewer
+    than k rows sharing a term) the query is answered by the full scan, so
+    predictions are identical. Corpora of up to scan_max_rows rows are
+    always scanned. use_lsh() switches to approximate search.
+    """
+
+    def __init__(self, vectorizer: CompactTfidfVectorizer, data: np.ndarray, indices: np.ndarray,
+                 indptr: np.ndarray, norms: np.ndarray, labels: np.ndarray, classes: List[str],
+                 n_neighbors: int = 5, weights: str = 'uniform', postings=None):
+        """
+        Args:
+            postings: (data, rows, indptr) of the matrix in column order (computed when None)
+        """
+        self.vectorizer = vectorizer
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.norms = norms
+        self.labels = labels
+        self.classes_ = np.array(classes)
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        # Row starts of non-empty training rows (np.add.reduceat can't express empty segments)
+        self._nonempty = np.flatnonzero(np.diff(indptr) > 0)
+        if postings is None:
+            postings = csr_to_postings(data, indices, indptr, vectorizer.n_features)
+        self.postings = PostingsIndex(*postings, len(norms))
+        self.lsh = None
+        self.scan_max_rows = KNN_SCAN_MAX_ROWS
+        # Queries answered by the full scan so far (see kneighbors)
+        self.full_scans = 0
+
+    def use_lsh(self, n_bits: int = 16, n_tables: int = 16, seed: int = 0) -> 'CompactKNNModel':
+        """Search an approximate HyperplaneLSH index from now on (n_bits=0: exact search again)"""
+        self.lsh = (HyperplaneLSH(self.data, self.indices, self.indptr, self.vectorizer.n_features,
+                                  n_bits, n_tables, seed) if n_bits else None)
+        return self
+
+    def cosine_distances(self, features) -> np.ndarray:
+        """(n_texts x n_train) cosine distances of CSR query rows, like sklearn's cosine_distances"""
+        data, indices, indptr = features
+        similarities = np.zeros((len(indptr) - 1, len(self.norms)))
+        query = np.zeros(self.vectorizer.n_features)
+        if len(self._nonempty):
+            starts = self.indptr[self._nonempty]
+            # One query at a time keeps the temporaries at nnz floats
+            for row in range(len(indptr) - 1):
+                span = slice(indptr[row], indptr[row + 1])
+                query[indices[span]] = data[span]
+                similarities[row, self._nonempty] = np.add.reduceat(query[self.indices] * self.data, starts)
+                query[indices[span]] = 0.0
+        query_norms = np.sqrt(row_sums(data * data, indptr))
+        denominator = np.outer(query_norms, self.norms)
+        np.divide(similarities, denominator, out=similarities, where=denominator > 0)
+        return np.clip(1.0 - similarities, 0.0, 2.0)
+
+    def kneighbors_scan(self, features):
+        """kneighbors() by a full scan of the training matrix, exactly like sklearn's brute force search"""
+        distances = self.cosine_distances(features)
+        # Same selection as sklearn's brute force search, so ties resolve identically
+        nearest = np.argpartition(distances, self.n_neighbors - 1, axis=1)[:, :self.n_neighbors]
+        rows = np.arange(len(distances))[:, np.newaxis]
+        nearest = nearest[rows, np.argsort(distances[rows, nearest])]
+        return distances[rows, nearest], nearest
+
+    def kneighbors(self, features):
+        """(distances, training row indices) of the nearest neighbors, closest first"""
+        if self.lsh is not None:
+            return self._search(features, self.lsh)
+        if len(self.norms) <= self.scan_max_rows:
+            return self.kneighbors_scan(features)
+        return self._search(features, self.postings)
+
+    def _search(self, features, index):
+        data, indices, indptr = features
+        n_queries = len(indptr) - 1
+        k = self.n_neighbors
+        query_norms = np.sqrt(row_sums(data * data, indptr))
+        query_ptr, candidates, similarities = index.candidates(features)
+        counts = query_ptr[1:] - query_ptr[:-1]
+        queries = np.repeat(np.arange(n_queries), counts)
+        candidate_distances = np.clip(1.0 - similarities / (query_norms[queries] * self.norms[candidates]),
+                                      0.0, 2.0)
+
+        distances = np.empty((n_queries, k))
+        nearest = np.empty((n_queries, k), dtype=np.int64)
+        # Fewer than k candidates: the remaining neighbors are rows without a shared term
+        fallback = counts < k
+        for chunk in _rank_chunks(counts, fallback):
+            self._rank(chunk, query_ptr, candidates, candidate_distances, index is self.postings,
+                       distances, nearest, fallback)
+
+        fallback = np.flatnonzero(fallback)
+        if len(fallback):
+            fallback_features = _select_rows(features, fallback)
+            if index is self.postings:
+                self.full_scans += len(fallback)
+                distances[fallback], nearest[fallback] = self.kneighbors_scan(fallback_features)
+            else:
+                # Too few rows shared a bucket: search these exactly
+                distances[fallback], nearest[fallback] = self._search(fallback_features, self.postings)
+        return distances, nearest
+
+    def _rank(self, queries: np.ndarray, query_ptr: np.ndarray, candidates: np.ndarray,
+              candidate_distances: np.ndarray, check_ties: bool, distances: np.ndarray,
+              nearest: np.ndarray, fallback: np.ndarray):
+        """Nearest k candidates of the given queries (each with at least k), in place"""
+        k = self.n_neighbors
+        starts = query_ptr[queries]
+        counts = query_ptr[queries + 1] - starts
+        if len(queries) == 1:
+            # A single query's candidates are one contiguous span: no padding needed
+            padded = candidate_distances[starts[0]:starts[0] + counts[0]][np.newaxis]
+        else:
+            positions = gather_spans(starts, counts)
+            local = np.repeat(np.arange(len(queries)), counts)
+            padded = np.full((len(queries), int(counts.max())), np.inf)
+            padded[local, positions - np.repeat(starts, counts)] = candidate_distances[positions]
+
+        chunk_rows = np.arange(len(queries))[:, np.newaxis]
+        top = np.argpartition(padded, k - 1, axis=1)[:, :k]
+        top_distances = padded[chunk_rows, top]
+        if check_ties:
+            kth = top_distances[:, k - 1:]
+            # Rows tied with the k-th one but left out of the top k
+            outside = np.abs(padded - kth) <= KNN_TIE_TOLERANCE
+            outside[chunk_rows, top] = False
+            # Which tied row fills the last slots decides the vote only if their classes differ
+            for row in np.flatnonzero(outside.any(axis=1)):
+                span = slice(starts[row], starts[row] + counts[row])
+                tied = np.abs(candidate_distances[span] - kth[row, 0]) <= KNN_TIE_TOLERANCE
+                tied_labels = self.labels[candidates[span][tied]]
+                if (tied_labels != tied_labels[0]).any():
+                    fallback[queries[row]] = True
+        order = np.argsort(top_distances, axis=1, kind='stable')
+        top = top[chunk_rows, order]
+        distances[queries] = top_distances[chunk_rows, order]
+        nearest[queries] = candidates[starts[:, np.newaxis] + top]
+
+    def featurize(self, texts: List[str]):
+        """Sparse TF-IDF rows (data, indices, indptr), the input of predict_proba_features()"""
+        return self.vectorizer.transform_sparse(texts)
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return self.predict_proba_features(self.featurize(texts))
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        distances, nearest = self.kneighbors(features)
+        if self.weights == 'distance':
+            # Exact matches (distance 0) take all the weight, as in sklearn
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+        else:
+            weights = np.ones_like(distances)
+
+        probabilities = np.zeros((len(nearest), len(self.classes_)))
+        rows = np.arange(len(nearest))
+        for column in range(nearest.shape[1]):
+            probabilities[rows, self.labels[nearest[:, column]]] += weights[:, column]
+        totals = probabilities.sum(axis=1, keepdims=True)
+        totals[totals == 0.0] = 1.0
+        return probabilities / totals
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+
+class CompactTreeModel:
+    """
+    Drop-in replacement for the decision tree Pipeline at serving time
+
+    The fitted tree is flattened into node arrays (feature, threshold,
+    children, class distribution). A prediction only reads the TF-IDF
+    values of the features tested on its decision path: a single row is
+    walked in plain Python, a batch advances all its rows one level per
+    step, looking the tested features up in the sparse rows with one
+    searchsorted. Values are compared as float32, like sklearn's trees.
+    """
+
+    def __init__(self, vectorizer: CompactTfidfVectorizer, feature: np.ndarray, threshold: np.ndarray,
+                 left: np.ndarray, right: np.ndarray, proba: np.ndarray, classes: List[str]):
+        self.vectorizer = vectorizer
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.proba = proba
+        self.classes_ = np.array(classes)
+        self.row_walk_max_rows = TREE_ROW_WALK_MAX_ROWS
+        # Scalars read through memoryviews are several times cheaper than numpy indexing
+        self._nodes = tuple(memoryview(np.ascontiguousarray(array)) for array in (feature, threshold, left, right))
+
+    def featurize(self, texts: List[str]):
+        """Sparse TF-IDF rows (data, indices, indptr), the input of the *_features methods"""
+        return self.vectorizer.transform_sparse(texts)
+
+    def apply_features(self, features) -> np.ndarray:
+        """Leaf node index of each row, like sklearn's apply()"""
+        data, indices, indptr = features
+        n_rows = len(indptr) - 1
+        values = data.astype(np.float32)
+        if n_rows <= self.row_walk_max_rows:
+            feature, threshold, left, right = self._nodes
+            values, bounds = values.tolist(), indptr.tolist()
+            indices = indices.tolist()
+            leaves = np.empty(n_rows, dtype=np.int64)
+            for row in range(n_rows):
+                span = slice(bounds[row], bounds[row + 1])
+                row_values = dict(zip(indices[span], values[span]))
+                node = 0
+                while feature[node] >= 0:
+                    node = left[node] if row_values.get(feature[node], 0.0) <= threshold[node] else right[node]
+                leaves[row] = node
+            return leaves
+
+        # Columns are sorted within a row, so row * n_features + column is sorted overall
+        n_features = self.vectorizer.n_features
+        keys = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, np.diff(indptr)) + indices
+        # Sentinel past every key, standing for features absent from a row (value 0)
+        keys = np.append(keys, n_rows * n_features)
+        values = np.append(values, np.float32(0.0))
+        nodes = np.zeros(n_rows, dtype=np.int64)
+        active = np.arange(n_rows)
+        while True:
+            current = nodes[active]
+            tested = self.feature[current]
+            internal = tested >= 0
+            if not internal.all():
+                active, current, tested = active[internal], current[internal], tested[internal]
+                if not len(active):
+                    return nodes
+            wanted = active * n_features + tested
+            positions = np.searchsorted(keys, wanted)
+            positions[keys[positions] != wanted] = len(keys) - 1
+            nodes[active] = np.where(values[positions] <= self.threshold[current],
+                                     self.left[current], self.right[current])
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        return self.predict_proba_features(self.featurize(texts))
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        return self.proba[self.apply_features(features)]
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+
+def _rank_chunks(counts: np.ndarray, fallback: np.ndarray):
+    """
+    Batches of queries (indices) ranked together as (queries x candidates) matrices
+    padded with infinite distances. Grouping queries whose candidate counts are within
+    a factor 2 of each other bounds the padding; chunks hold at most
+    KNN_SEARCH_CHUNK_CELLS cells. Queries marked in fallback are left out
+    """
+    if len(counts) == 1:
+        # Interactive requests: skip the grouping overhead
+        return [] if fallback[0] else [np.zeros(1, dtype=np.int64)]
+    groups = np.ceil(np.log2(np.maximum(counts, 1))).astype(np.int64)
+    chunks = []
+    for group in np.unique(groups[~fallback]):
+        members = np.flatnonzero((groups == group) & ~fallback)
+        chunk_size = max(1, KNN_SEARCH_CHUNK_CELLS // int(counts[members].max()))
+        chunks.extend(members[first:first + chunk_size] for first in range(0, len(members), chunk_size))
+    return chunks
+
+
+def _select_rows(features, rows: np.ndarray):
+    """CSR (data, indices, indptr) of the given rows"""
+    data, indices, indptr = features
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    gather = gather_spans(starts, lengths)
+    return data[gather], indices[gather], np.concatenate(([0], np.cumsum(lengths)))
+
+
+def _save_array(path: Path, array: np.ndarray):
+    """
+    Write an .npy file under a new inode: processes that still map the old
+    file keep valid pages (truncating it in place would crash them with SIGBUS)
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _save_vectorizer(dirpath: Path, vocabulary: List[str], idf: Optional[np.ndarray]):
+    terms, slots = HashedVocabulary.arrays(vocabulary)
+    _save_array(dirpath / 'vocabulary.npy', terms)
+    _save_array(dirpath / 'vocabulary_slots.npy', slots)
+    if idf is not None:
+        _save_array(dirpath / 'idf.npy', np.asarray(idf, dtype=np.float64))
+
+
+def _write_config(dirpath: Path, config: Dict[str, Any]):
+    with open(dirpath / 'config.json', 'w', encoding='utf-8') as f:
+        json.dump({'format_version': FORMAT_VERSION, **config}, f, ensure_ascii=False)
+
+
+def save_compact_model(dirpath, vocabulary: List[str], idf: Optional[np.ndarray],
+                       vectorizer_config: Dict[str, Any], coef: np.ndarray,
+                       intercept: np.ndarray, classes: List[str], multi_class: str):
+    """Write the compact logistic artifact to dirpath"""
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+
+    _save_vectorizer(dirpath, vocabulary, idf)
+    _save_array(dirpath / 'coef.npy', np.asarray(coef, dtype=np.float64))
+    _save_array(dirpath / 'intercept.npy', np.asarray(intercept, dtype=np.float64))
+    _write_config(dirpath, {
+        'model': 'logistic',
+        'classes': [str(c) for c in classes],
+        'multi_class': multi_class,
+        'vectorizer': vectorizer_config
+    })
+
+
+def save_compact_knn_model(dirpath, vocabulary: List[str], idf: Optional[np.ndarray],
+                           vectorizer_config: Dict[str, Any], data: np.ndarray, indices: np.ndarray,
+                           indptr: np.ndarray, labels: np.ndarray, classes: List[str],
+                           n_neighbors: int, weights: str):
+    """Write the compact KNN artifact (training matrix in CSR form) to dirpath"""
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+
+    data = np.asarray(data, dtype=np.float64)
+    indptr = np.asarray(indptr, dtype=np.int64)
+
+    _save_vectorizer(dirpath, vocabulary, idf)
+    _save_array(dirpath / 'train_data.npy', data)
+    _save_array(dirpath / 'train_indices.npy', np.asarray(indices, dtype=np.int32))
+    _save_array(dirpath / 'train_indptr.npy', indptr)
+    _save_array(dirpath / 'train_norms.npy', np.sqrt(row_sums(data * data, indptr)))
+    _save_array(dirpath / 'train_labels.npy', np.asarray(labels, dtype=np.int32))
+    postings_data, postings_rows, postings_indptr = csr_to_postings(data, np.asarray(indices), indptr,
+                                                                    len(vocabulary))
+    _save_array(dirpath / 'train_postings_data.npy', postings_data)
+    _save_array(dirpath / 'train_postings_rows.npy', postings_rows)
+    _save_array(dirpath / 'train_postings_indptr.npy', postings_indptr)
+    _write_config(dirpath, {
+        'model': 'knn',
+        'classes': [str(c) for c in classes],
+        'n_neighbors': int(n_neighbors),
+        'weights': weights,
+        'metric': 'cosine',
+        'vectorizer': vectorizer_config
+    })
+
+
+def save_compact_tree_model(dirpath, vocabulary: List[str], idf: Optional[np.ndarray],
+                            vectorizer_config: Dict[str, Any], feature: np.ndarray, threshold: np.ndarray,
+                            left: np.ndarray, right: np.ndarray, proba: np.ndarray, classes: List[str]):
+    """Write the compact decision tree artifact (flat node arrays) to dirpath"""
+    dirpath = Path(dirpath)
+    dirpath.mkdir(parents=True, exist_ok=True)
+
+    left = np.asarray(left, dtype=np.int32)
+    _save_vectorizer(dirpath, vocabulary, idf)
+    # sklearn marks leaves with feature -2; any negative value means leaf here
+    _save_array(dirpath / 'tree_feature.npy', np.where(left < 0, -1, feature).astype(np.int32))
+    _save_array(dirpath / 'tree_threshold.npy', np.asarray(threshold, dtype=np.float64))
+    _save_array(dirpath / 'tree_left.npy', left)
+    _save_array(dirpath / 'tree_right.npy', np.asarray(right, dtype=np.int32))
+    _save_array(dirpath / 'tree_proba.npy', np.asarray(proba, dtype=np.float64))
+    _write_config(dirpath, {
+        'model': 'decision_tree',
+        'classes': [str(c) for c in classes],
+        'vectorizer': vectorizer_config
+    })
+
+
+def load_compact_model(dirpath, mmap: bool = True):
+    """
+    Load the compact artifact written by save_compact_model() / save_compact_knn_model() /
+    save_compact_tree_model()
+    mmap: map the arrays read-only (shared between processes) instead of reading them
+    """
+    dirpath = Path(dirpath)
+    with open(dirpath / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    if config.get('format_version') not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported compact model format: {config.get('format_version')}")
+
+    mmap_mode = 'r' if mmap else None
+
+    def array(name):
+        path = dirpath / f'{name}.npy'
+        if not path.exists():
+            return None
+        # Plain ndarray view of the mapping: np.memmap wraps every result and is far slower on tiny arrays
+        return np.asarray(np.load(path, mmap_mode=mmap_mode))
+
+    if 'vocabulary' in config:
+        vocabulary = HashedVocabulary.from_list(config['vocabulary'])
+    else:
+        vocabulary = HashedVocabulary(array('vocabulary'), array('vocabulary_slots'))
+    vectorizer = CompactTfidfVectorizer(vocabulary, array('idf'), config['vectorizer'])
+
+    if config.get('model', 'logistic') == 'knn':
+        postings = (array('train_postings_data'), array('train_postings_rows'), array('train_postings_indptr'))
+        return CompactKNNModel(
+            vectorizer, array('train_data'), array('train_indices'), array('train_indptr'),
+            array('train_norms'), array('train_labels'), config['classes'],
+            config.get('n_neighbors', 5), config.get('weights', 'uniform'),
+            postings if postings[0] is not None else None)
+
+    if config.get('model', 'logistic') == 'decision_tree':
+        return CompactTreeModel(
+            vectorizer, array('tree_feature'), array('tree_threshold'), array('tree_left'),
+            array('tree_right'), array('tree_proba'), config['classes'])
+
+    return CompactLogisticModel(
+        vectorizer,
+        array('coef'),
+        array('intercept'),
+        config['classes'],
+        config.get('multi_class', 'multinomial')
+    )
+
+
+if __name__ == '__main__':
+    import sys
+
+    model_dir = (Path(__file__).parent / '..' / 'models' / 'intent_model_logistic').resolve()
+    model = load_compact_model(model_dir)
+
+    texts = sys.argv[1:] or ["find math tutor", "show my bookings", "cancel booking", "hello"]
+    for text, probabilities in zip(texts, model.predict_proba(texts)):
+        best = int(np.argmax(probabilities))
+        print(f"{text!r} -> {model.classes_[best]} ({probabilities[best]:.2%})")
@@ -5,52 +5,271 @@ Dialog Manager - manages conversation context and state
 """
 
 import json
-import sys
-from typing import Dict, Any, Optional, List
+import time
+import argparse
+import threading
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
-from intent_classifier import load_model, predict_intent
-from entity_extractor import extract_entities_from_message
+from intent_classifier import load_model, predict_intents, preprocess_texts
+from entity_extractor import EntityExtractor
+from compact_model import load_compact_model
+from nlp_utils import MessageAnalysis, analyze_message
+from response_cache import ResponseCache
+from metrics import StageTimer, StageHistograms
+from fast_path import build_fast_path
+from ensemble import EnsembleModel, ENSEMBLE_MODELS
+from model_registry import ModelRegistry, ModelWatcher, ModelGroupWatcher, MODEL_POLL_SECONDS
+from session_store import SQLiteSessionStore, DEFAULT_SESSION_DB, session_context
+
+# Entities that describe one thing together: a turn setting any of them replaces the
+# whole group, so keys it did not set are not carried over from earlier turns
+ENTITY_GROUPS = (
+    ('tutor_name', 'tutor_id', 'tutor_ids'),
+    # "at 5pm" after "between 2 and 4pm" is no longer a range
+    ('time', 'time_end'),
+)
+
+
+def merge_context(context: Dict[str, Any], entities: Dict[str, Any]) -> Dict[str, Any]:
+    """Entities of this turn over the context of earlier ones"""
+    merged = dict(context)
+    for group in ENTITY_GROUPS:
+        if any(key in entities for key in group):
+            for key in group:
+                merged.pop(key, None)
+    merged.update(entities)
+    return merged
 
 
 class DialogManager:
     """Manages dialog flow and context"""
     
-    def __init__(self):
-        # Load intent classifier model
-        script_dir = Path(__file__).parent
-        model_path = (script_dir / '..' / 'models' / 'intent_model_logistic.pkl').resolve()
-        self.intent_model = load_model('logistic', str(model_path))
+    def __init__(self, cache_size: int = 0, cache_ttl: Optional[float] = None, session_store=None,
+                 online: bool = False, registry: Optional[ModelRegistry] = None, timings: bool = False,
+                 profiler=None, fast_path: Optional[str] = None, ensemble: bool = False):
+        """
+        Args:
+            cache_size: Max entries in the response cache (0 disables caching)
+            cache_ttl: Optional lifetime of cached entries in seconds
+            session_store: Optional store (see session_store.py) holding context per session id
+            online: Serve the incrementally trainable model (see learn())
+            registry: Model registry to load from (default: models/registry)
+            timings: Keep per-stage latency histograms of processed messages (see timing_stats())
+            profiler: RequestProfiler (request_profiler.py) capturing selected requests while enabled
+            fast_path: Answer training phrases without the classifier: 'exact' (same results
+                as the model) or 'keywords' (plus the keyword rules of fast_path.py)
+            ensemble: Serve the decision tree, logistic and KNN models as one early-exit,
+                weighted-vote ensemble (see ensemble.py)
+        """
+        self.registry = registry or ModelRegistry()
+        if ensemble:
+            if online:
+                raise ValueError("The ensemble cannot be combined with the online model")
+            self.model_type = 'ensemble'
+            loaded = {model_type: self._load(model_type) for model_type in ENSEMBLE_MODELS}
+            # Registry version per member (None: plain files); model_watcher() follows each
+            self.member_versions = {model_type: version for model_type, (_, version) in loaded.items()}
+            models = {model_type: model for model_type, (model, _) in loaded.items()}
+            self.intent_model, self.model_version = EnsembleModel(models), None
+        else:
+            self.model_type = 'online' if online else 'logistic'
+            self.intent_model, self.model_version = self._load(self.model_type)
+        
+        # Opt-in cache of (intent, entities) for frequent phrasings
+        self.response_cache = ResponseCache(cache_size, cache_ttl) if cache_size > 0 else None
+        if fast_path not in (None, 'exact', 'keywords'):
+            raise ValueError(f"Unknown fast path mode: {fast_path}")
+        # Rebuilt for every model swap, since it stores the model's predictions
+        self.fast_path = (build_fast_path(self.intent_model, keyword_rules=fast_path == 'keywords')
+                          if fast_path else None)
+        self.entity_extractor = EntityExtractor()
+        self.session_store = session_store
+        # None when disabled: the request path then only pays for "is None" checks
+        self.stage_histograms = StageHistograms() if timings else None
+        self.profiler = profiler
+        # Serializes model updates and swaps; predictions never take it
+        self._learn_lock = threading.Lock()
+    
+    def _load(self, model_type: str):
+        """(model, version): the active registry version first, otherwise the files written by train_models.py"""
+        active = self.registry.load_active(model_type)
+        if active is not None:
+            return active
+        return self._load_unversioned(model_type), None
+    
+    @staticmethod
+    def _load_unversioned(model_type: str):
+        """Model from the plain files in models/, preferring the sklearn-free compact artifact"""
+        if model_type == 'online':
+            from online_model import load_online_model
+            return load_online_model()
+        models_dir = (Path(__file__).parent / '..' / 'models').resolve()
+        compact_dir = models_dir / f'intent_model_{model_type}'
+        if (compact_dir / 'config.json').exists():
+            return load_compact_model(compact_dir)
+        return load_model(model_type, str(models_dir / f'intent_model_{model_type}.pkl'))
+    
+    def swap_model(self, model, version: Optional[str] = None):
+        """Serve another model from the next request on (in-flight requests finish on the old one)"""
+        if self.fast_path is not None:
+            self.fast_path = self.fast_path.rebuilt(model)
+        self.intent_model = model
+        self.model_version = version
+        if self.response_cache is not None:
+            # Cached intents came from the previous model
+            self.response_cache.clear()
+    
+    def model_watcher(self, interval: float = MODEL_POLL_SECONDS):
+        """
+        Watcher that swaps in versions promoted in the registry (call start() or check())
+        For the ensemble every member type is watched and the ensemble is
+        rebuilt around a newly promoted member.
+        """
+        if self.model_type == 'ensemble':
+            watchers = [
+                ModelWatcher(self.registry, model_type, partial(self._member_version, model_type),
+                             partial(self._swap_member, model_type), interval)
+                for model_type in self.member_versions
+            ]
+            return ModelGroupWatcher(watchers, interval)
+        return ModelWatcher(self.registry, self.model_type, lambda: self.model_version,
+                            self._swap_from_registry, interval)
+    
+    def _member_version(self, model_type: str) -> Optional[str]:
+        return self.member_versions[model_type]
+    
+    def _swap_member(self, model_type: str, model, version: str):
+        with self._learn_lock:
+            if version != self.member_versions[model_type]:
+                self.member_versions = {**self.member_versions, model_type: version}
+                self.swap_model(self.intent_model.replaced(model_type, model))
+    
+    def _swap_from_registry(self, model, version: str):
+        # Serialized with learn(), which also changes the active version
+        with self._learn_lock:
+            if version != self.model_version:
+                self.swap_model(model, version)
+    
+    def model_info(self) -> Dict[str, Any]:
+        if self.model_type == 'ensemble':
+            return {'type': self.model_type, 'version': None, 'versions': dict(self.member_versions)}
+        return {'type': self.model_type, 'version': self.model_version}
     
-    def process_message(self, user_message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    def process_message(self, user_message: str, context: Optional[Dict] = None,
+                        session_id: Optional[str] = None, debug: bool = False) -> Dict[str, Any]:
         """
         Process user message and return structured response
         
         Args:
             user_message: User's text input
             context: Optional context from previous conversation
+            session_id: Optional chat session id; its stored context is used
+                and updated when a session store is configured
+            debug: Add a "timings" field (ms per stage) to the result
         
         Returns:
             Dict with: intent, confidence, entities, context, missing_info, response, needs_clarification
         """
-        if context is None:
+        profiler = self.profiler
+        if profiler is not None and profiler.enabled:
+            # Stage timings go into the capture; the caller only sees them when asking for them
+            result = profiler.call(self._process_message, user_message, context, session_id, True)
+            if not debug:
+                del result['timings']
+            return result
+        return self._process_message(user_message, context, session_id, debug)
+    
+    def _process_message(self, user_message: str, context: Optional[Dict], session_id: Optional[str],
+                         debug: bool) -> Dict[str, Any]:
+        timer = StageTimer() if debug or self.stage_histograms is not None else None
+        
+        # Steps 1-2: Predict intent and extract entities (cached when enabled)
+        analysis = analyze_message(user_message)
+        if timer is not None:
+            timer.lap('analyze')
+        intent_result, entities = self._understand(analysis, timer)
+        result = self._respond(intent_result, entities, context, session_id, timer)
+        
+        if timer is not None:
+            timings = self._record_timings(timer.timings)
+            if debug:
+                result['timings'] = {stage: round(ms, 4) for stage, ms in timings.items()}
+        return result
+    
+    def process_messages(self, requests: List[Tuple[str, Optional[Dict], Optional[str]]],
+                         completed: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Process several messages at once (used by the micro-batching server)
+        
+        Args:
+            requests: (user_message, context, session_id) tuples
+            completed: Optional list each result is appended to as soon as it
+                is ready; if the batch fails, it holds the requests that
+                completed (and updated their session) before the failure
+        
+        Returns:
+            One process_message result per request, in order. All cache
+            misses are classified with a single model pass.
+        """
+        timer = StageTimer() if self.stage_histograms is not None else None
+        analyses = [analyze_message(message) for message, _, _ in requests]
+        if timer is not None:
+            timer.lap('analyze')
+        understood = self._understand_batch(analyses, timer)
+        results = completed if completed is not None else []
+        for (intent_result, entities), (_, context, session_id) in zip(understood, requests):
+            results.append(self._respond(intent_result, entities, context, session_id, timer))
+        if timer is not None and requests:
+            # Stages ran once for the whole batch: record the cost per message
+            self._record_timings({stage: ms / len(requests) for stage, ms in timer.timings.items()})
+        return results
+    
+    def timing_stats(self) -> Optional[Dict[str, Any]]:
+        """Latency histogram (ms) per stage, None when timings are disabled"""
+        return self.stage_histograms.snapshot() if self.stage_histograms is not None else None
+    
+    def reset_timings(self):
+        """Forget recorded stage timings and ensemble latencies (e.g. those of warm-up requests)"""
+        if self.stage_histograms is not None:
+            self.stage_histograms.reset()
+        if isinstance(self.intent_model, EnsembleModel):
+            self.intent_model.reset_stats()
+    
+    def _record_timings(self, timings: Dict[str, float]) -> Dict[str, float]:
+        timings['total'] = sum(timings.values())
+        if self.stage_histograms is not None:
+            self.stage_histograms.observe(timings)
+        return timings
+    
+    def _respond(self, intent_result: Dict[str, Any], entities: Dict[str, Any],
+                 context: Optional[Dict], session_id: Optional[str],
+                 timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Steps 3-5: merge context, check missing info and build the response"""
+        use_session = session_id is not None and self.session_store is not None
+        if use_session:
+            # Explicit context (legacy clients) still wins over the stored one, group by group
+            context = merge_context(self.session_store.get(session_id), context or {})
+        elif context is None:
             context = {}
         
-        # Step 1: Predict intent
-        intent_result = self._predict_intent(user_message)
         intent = intent_result['intent']
         confidence = intent_result['confidence']
         
-        # Step 2: Extract entities
-        entities = extract_entities_from_message(user_message)
-        
-        # Step 3: Merge with context
-        merged_entities = {**context, **entities}
+        # Step 3: Merge with context (groups replaced before the session is stored)
+        merged_entities = merge_context(context, entities)
+        if use_session:
+            self.session_store.put(session_id, session_context(merged_entities))
+        if timer is not None:
+            timer.lap('context')
         
         # Step 4: Determine what information is missing
         missing_info = self._check_missing_info(intent, merged_entities)
         
         # Step 5: Generate response
         response = self._generate_response(intent, merged_entities, missing_info)
+        if timer is not None:
+            timer.lap('response')
         
         return {
             'intent': intent,
@@ -62,15 +281,129 @@ class DialogManager:
             'needs_clarification': len(missing_info) > 0
         }
     
-    def _predict_intent(self, text: str) -> Dict[str, Any]:
-        """Predict intent using ML model"""
-        result = predict_intent(self.intent_model, text)
-        # Ensure consistent return format
+    def _understand(self, analysis: MessageAnalysis, timer: Optional[StageTimer] = None):
+        """
+        Predict intent and extract entities, consulting the response cache
+        
+        Only context-free results are cached; context merging happens per
+        request in process_message, so one user's context never leaks
+        into another user's cached result.
+        """
+        if self.response_cache is None:
+            intent_result = self._predict_intent(analysis, timer)
+            entities = self.entity_extractor.extract_all(analysis)
+            if timer is not None:
+                timer.lap('entities')
+            return intent_result, entities
+        return self._understand_batch([analysis], timer)[0]
+    
+    def _understand_batch(self, analyses: List[MessageAnalysis], timer: Optional[StageTimer] = None):
+        """_understand for several messages, classifying all cache misses together"""
+        entries = [None] * len(analyses)
+        keys = [None] * len(analyses)
+        pending = []
+        for i, analysis in enumerate(analyses):
+            if self.response_cache is not None:
+                keys[i] = self._cache_key(analysis)
+                entries[i] = self.response_cache.get(keys[i])
+            if entries[i] is None:
+                pending.append(i)
+        if timer is not None and self.response_cache is not None:
+            timer.lap('cache')
+        
+        if pending:
+            intent_results = self._predict_intents([analyses[i] for i in pending], timer)
+            for i, intent_result in zip(pending, intent_results):
+                entities = self.entity_extractor.extract_all(analyses[i])
+                entries[i] = (intent_result, {k: v for k, v in entities.items() if k != 'original_text'})
+                if self.response_cache is not None:
+                    self.response_cache.put(keys[i], entries[i])
+            if timer is not None:
+                timer.lap('entities')
+        
+        # Return copies so callers can't mutate the cached entries
+        return [
+            (dict(intent_result), {**entities, 'original_text': analysis.text})
+            for (intent_result, entities), analysis in zip(entries, analyses)
+        ]
+    
+    def _cache_key(self, analysis: MessageAnalysis):
+        """
+        Cache key: exactly what entity extraction reads. Subjects, actions and
+        dates come from the normalized text, with today's date because
+        relative dates like "tomorrow" resolve differently each day. Tutors
+        also depend on the capitalization of the original text, so the
+        resolved mention is part of the key.
+        """
+        tutor = self.entity_extractor.extract_tutor(analysis)
+        return (
+            analysis.normalized,
+            self.entity_extractor.date_parser.today().isoformat(),
+            tuple((key, tuple(value) if isinstance(value, list) else value) for key, value in sorted(tutor.items()))
+        )
+    
+    def learn(self, examples: List[Dict[str, str]], save: bool = False) -> Dict[str, Any]:
+        """
+        Absorb labeled examples ([{"text", "intent"}]) into the online model
+        
+        The update runs on a copy of the model, which then replaces the
+        current one in a single assignment: requests already running keep
+        the old model, later ones get the new one, nothing waits.
+        With save=True the model is published and promoted in the registry
+        (other processes pick it up through their watchers) and the
+        examples are appended to the examples log.
+        """
+        from online_model import OnlineIntentModel, parse_examples, append_examples_log
+        
+        if not isinstance(self.intent_model, OnlineIntentModel):
+            raise ValueError('Online learning is not enabled (start with online=True)')
+        raw_texts, labels = parse_examples(examples)
+        
+        with self._learn_lock:
+            start = time.perf_counter()
+            updated = self.intent_model.updated(preprocess_texts(raw_texts), labels)
+            self.swap_model(updated)
+            update_seconds = time.perf_counter() - start
+            if save:
+                # Version is set before promoting, so the watcher does not reload our own model
+                self.model_version = self.registry.publish(updated, 'online', {'examples_seen': updated.seen})
+                self.registry.promote('online', self.model_version)
+                append_examples_log(raw_texts, labels)
+            version = self.model_version
+        
         return {
-            'intent': str(result['intent']),
-            'confidence': float(result['confidence'])
+            'learned': len(labels),
+            'model_version': version,
+            'updates': updated.version,
+            'examples_seen': updated.seen,
+            'update_ms': update_seconds * 1000,
+            'saved': save
         }
     
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Hit/miss/eviction counters of the response cache, None when disabled"""
+        return self.response_cache.stats() if self.response_cache is not None else None
+    
+    def fast_path_stats(self) -> Optional[Dict[str, Any]]:
+        """Share of messages answered by the fast path and the time saved, None when disabled"""
+        return self.fast_path.stats() if self.fast_path is not None else None
+    
+    def ensemble_stats(self) -> Optional[Dict[str, Any]]:
+        """Early exit rate and per-model latency of the ensemble, None when not serving one"""
+        return self.intent_model.stats() if isinstance(self.intent_model, EnsembleModel) else None
+    
+    def _predict_intent(self, text, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Predict intent using ML model (text or MessageAnalysis)"""
+        return self._predict_intents([text], timer)[0]
+    
+    def _predict_intents(self, texts: List, timer: Optional[StageTimer] = None) -> List[Dict[str, Any]]:
+        """Predict intents for several texts with one model pass"""
+        return [
+            {'intent': result['intent'], 'confidence': result['confidence']}
+            for result in predict_intents(self.intent_model, texts, top_k=1, timer=timer,
+                                          fast_path=self.fast_path)
+        ]
+    
     def _check_missing_info(self, intent: str, entities: Dict) -> List[str]:
         """Check what information is missing for the intent"""
         missing = []
@@ -148,24 +481,35 @@ class DialogManager:
             return "How can I help you?"
 
 
-def process_user_message(message: str, context_json: str = None) -> str:
+def process_user_message(message: str, context_json: str = None, session_id: str = None,
+                         session_db: str = DEFAULT_SESSION_DB) -> str:
     """
     Main entry point for processing messages
+    With a session id, context is read from and written to the SQLite
+    session store, so separate processes share the conversation state.
     Returns JSON string
     """
-    context = json.loads(context_json) if context_json else {}
+    context = json.loads(context_json) if context_json else None
     
-    manager = DialogManager()
-    result = manager.process_message(message, context)
+    session_store = SQLiteSessionStore(session_db) if session_id else None
+    manager = DialogManager(session_store=session_store)
+    result = manager.process_message(message, context, session_id=session_id)
     
     return json.dumps(result, ensure_ascii=False)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process a chat message (no message: interactive mode)')
+    parser.add_argument('message', nargs='*', help='message text')
+    parser.add_argument('--context', default=None, help='context JSON from previous turns')
+    parser.add_argument('--session-id', default=None, help='chat session id (context kept server-side)')
+    parser.add_argument('--session-db', default=DEFAULT_SESSION_DB, help='SQLite session store path')
+    args = parser.parse_args()
+    
     # Command line interface
-    if len(sys.argv) > 1:
-        message = ' '.join(sys.argv[1:])
-        result = process_user_message(message)
+    if args.message:
+        message = ' '.join(args.message)
+        result = process_user_message(message, args.context, args.session_id, args.session_db)
         print(result)
     else:
         # Interactive test mode
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dialog Server - long-lived process serving DialogManager over a Unix socket
+
+The model, typo dictionary and regexes are loaded once at startup instead of
+once per chat message. Requests and responses are framed as one JSON object
+per line (newline-delimited JSON), e.g.:
+
+    {"action": "process_message", "message": "find math tutor", "session_id": "3f2a..."}
+    {"action": "process_message", "message": "find math tutor", "debug": true}   (adds "timings")
+    {"action": "reset_session", "session_id": "3f2a..."}
+    {"action": "predict_intent", "text": "show my bookings"}
+    {"action": "predict_intents", "texts": ["cancel booking", "hi"], "top_k": 2}
+    {"action": "load_courses", "courses": [{"course_id": 1, "course_name": "Mathematics"}]}
+    {"action": "load_tutors", "tutors": [{"tutor_id": 1, "name": "Walter", "surname": "Whitman"}]}
+    {"action": "load_tutors", "tutors": [...], "append": true, "more": true}   (chunked, see ChunkedTables)
+    {"action": "learn", "examples": [{"text": "who teaches maths", "intent": "find_tutor"}], "save": true}
+    {"action": "stats"}
+    {"action": "ping"}
+
+SIGUSR1 switches the request profiler (request_profiler.py) on and off.
+
+The socket is created with mode 0660 ($AGYRUS_DIALOG_SOCKET_MODE, octal);
+set $AGYRUS_DIALOG_SOCKET_GROUP to the web server's group so PHP can connect
+while other local users cannot. A socket left over from a previous run is
+replaced, but the server refuses to start if another one still answers on it.
+"""
+
+import os
+import grp
+import sys
+import json
+import stat
+import signal
+import socket
+import argparse
+import threading
+import socketserver
+from typing import Dict, Any, Optional, Tuple
+from dialog_manager import DialogManager
+from intent_classifier import predict_intent, predict_intents
+from entity_extractor import EntityExtractor, subject_table_from_courses
+from session_store import create_session_store, valid_session_id, DEFAULT_SESSION_TTL
+from model_registry import MODEL_POLL_SECONDS
+from request_profiler import RequestProfiler
+
+DEFAULT_SOCKET_PATH = os.environ.get('AGYRUS_DIALOG_SOCKET', '/tmp/agyrus_dialog.sock')
+
+# Socket permissions: owner and group only; the group is the web server's (PHP)
+SOCKET_MODE = int(os.environ.get('AGYRUS_DIALOG_SOCKET_MODE', '660'), 8)
+SOCKET_GROUP = os.environ.get('AGYRUS_DIALOG_SOCKET_GROUP') or None
+
+# Upper bound for a single request line, protects the server from runaway clients
+MAX_REQUEST_BYTES = 64 * 1024
+
+# Pending connections the kernel queues before resetting new ones (socketserver defaults to 5)
+LISTEN_BACKLOG = 128
+
+# Reference data actions and the key holding their rows
+TABLE_ACTIONS = {'load_courses': 'courses', 'load_tutors': 'tutors'}
+# Upper bound for the rows of one chunked table sync
+MAX_TABLE_ROWS = 500000
+
+
+class ChunkedTables:
+    """
+    Tables too large for one request line, sent as several load_courses/load_tutors chunks
+
+    The first chunk has no "append" flag (it replaces whatever an earlier,
+    unfinished sync left), the following ones have "append": true, and all
+    but the last have "more": true. Rows are applied only with the last
+    chunk, so the extractor never serves half a table. A request without
+    either flag carries the whole table, as before.
+    """
+
+    def __init__(self, max_rows: int = MAX_TABLE_ROWS):
+        self.max_rows = max_rows
+        self._pending = {}  # action -> rows received so far
+        self._lock = threading.Lock()
+
+    def complete(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        The request with the whole table, or None while more chunks are expected
+        Raises ValueError with a client-facing message
+        """
+        action = request.get('action')
+        key = TABLE_ACTIONS[action]
+        rows = request.get(key)
+        if not isinstance(rows, list):
+            raise ValueError(f"{key.capitalize()} must be a list")
+        append, more = bool(request.get('append')), bool(request.get('more'))
+
+        with self._lock:
+            if append:
+                if action not in self._pending:
+                    raise ValueError(f"No {action} sync in progress")
+                rows = self._pending.pop(action) + rows
+            else:
+                self._pending.pop(action, None)
+            if len(rows) > self.max_rows:
+                raise ValueError(f"More than {self.max_rows} {key}")
+            if more:
+                self._pending[action] = rows
+                return None
+        return {'action': action, key: rows} if append else request
+
+
+chunked_tables = ChunkedTables()
+
+
+def table_request(request: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """(whole-table request, None), or (None, response) for a pending chunk or an invalid one"""
+    try:
+        complete = chunked_tables.complete(request)
+    except ValueError as e:
+        return None, {'success': False, 'error': str(e)}
+    if complete is None:
+        return None, {'success': True, 'result': {'pending': True}}
+    return complete, None
+
+
+def process_message_args(request: Dict[str, Any]):
+    """
+    Validate a process_message request
+    Returns (message, context, session_id); raises ValueError with a client-facing message
+    """
+    message = request.get('message') or ''
+    if not message:
+        raise ValueError('Message is required')
+    context = request.get('context') or None
+    if context is not None and not isinstance(context, dict):
+        raise ValueError('Context must be an object')
+    session_id = request.get('session_id')
+    if session_id is not None and not valid_session_id(session_id):
+        raise ValueError('Invalid session_id')
+    return message, context, session_id
+
+
+def handle_request(manager: DialogManager, request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dispatch a single decoded request to the dialog manager
+    Returns the response dict (always JSON-serializable)
+    """
+    action = request.get('action', 'process_message')
+
+    if action == 'ping':
+        return {'success': True, 'result': 'pong'}
+
+    if action in TABLE_ACTIONS:
+        request, response = table_request(request)
+        if response is not None:
+            return response
+
+    if action == 'load_courses':
+        courses = request['courses']
+        rebuilt = EntityExtractor.load_subjects(subject_table_from_courses(courses))
+        if rebuilt and manager.response_cache is not None:
+            # Cached entities were extracted with the old keyword table
+            manager.response_cache.clear()
+        return {'success': True, 'result': {'rebuilt': rebuilt}}
+
+    if action == 'load_tutors':
+        tutors = request['tutors']
+        changes = EntityExtractor.load_tutors(tutors)
+        if any(changes.values()) and manager.response_cache is not None:
+            manager.response_cache.clear()
+        return {'success': True, 'result': changes}
+
+    if action == 'stats':
+        sessions = manager.session_store.stats() if manager.session_store is not None else None
+        profiler = manager.profiler.stats() if manager.profiler is not None else None
+        return {'success': True, 'result': {'response_cache': manager.cache_stats(), 'sessions': sessions,
+                                            'model': manager.model_info(), 'stages': manager.timing_stats(),
+                                            'profiler': profiler, 'fast_path': manager.fast_path_stats(),
+                                            'ensemble': manager.ensemble_stats()}}
+
+    if action == 'reset_session':
+        session_id = request.get('session_id')
+        if not valid_session_id(session_id):
+            return {'success': False, 'error': 'Invalid session_id'}
+        deleted = manager.session_store.delete(session_id) if manager.session_store is not None else False
+        return {'success': True, 'result': {'deleted': deleted}}
+
+    if action == 'process_message':
+        try:
+            message, context, session_id = process_message_args(request)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        return {'success': True, 'result': manager.process_message(message, context, session_id,
+                                                                    bool(request.get('debug')))}
+
+    if action == 'learn':
+        # Only available when serving the online model (--online)
+        try:
+            return {'success': True, 'result': manager.learn(request.get('examples'), bool(request.get('save')))}
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+
+    if action == 'predict_intent':
+        text = request.get('text') or ''
+        if not text:
+            return {'success': False, 'error': 'Text is required'}
+        result = predict_intent(manager.intent_model, text, fast_path=manager.fast_path)
+        return {
+            'success': True,
+            'result': {'intent': str(result['intent']), 'confidence': float(result['confidence'])}
+        }
+
+    if action == 'predict_intents':
+        texts = request.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return {'success': False, 'error': 'Texts must be a list of strings'}
+        top_k = request.get('top_k', 3)
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+            return {'success': False, 'error': 'top_k must be a positive integer'}
+        return {'success': True, 'result': predict_intents(manager.intent_model, texts, top_k,
+                                                           fast_path=manager.fast_path)}
+
+    return {'success': False, 'error': f"Unknown action: {action}"}
+
+
+def respond_line(manager: DialogManager, line: bytes, handler=handle_request) -> Dict[str, Any]:
+    """Decode one request line and dispatch it with handler; errors become error responses"""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        return handler(manager, request)
+    except (ValueError, json.JSONDecodeError) as e:
+        return {'success': False, 'error': f"Invalid request: {e}"}
+    except Exception as e:
+        return {'success': False, 'error': f"Internal error: {e}"}
+
+
+class DialogRequestHandler(socketserver.StreamRequestHandler):
+    """Reads newline-delimited JSON requests and writes one JSON line per response"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                break
+            if len(line) > MAX_REQUEST_BYTES:
+                self._send({'success': False, 'error': 'Request too large'})
+                break
+            line = line.strip()
+            if not line:
+                continue
+            self._send(respond_line(self.server.manager, line))
+
+    def _send(self, response: Dict[str, Any]):
+        data = json.dumps(response, ensure_ascii=False) + '\n'
+        self.wfile.write(data.encode('utf-8'))
+        self.wfile.flush()
+
+
+def remove_stale_socket(socket_path: str):
+    """
+    Remove a socket left over from a previous run
+    Raises RuntimeError if a server still answers on it or the path is not a socket
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{socket_path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        pass
+    else:
+        raise RuntimeError(f"A server is already listening on {socket_path}")
+    finally:
+        probe.close()
+    try:
+        os.unlink(socket_path)
+    except FileNotFoundError:
+        pass
+
+
+def secure_socket(socket_path: str, mode: int = SOCKET_MODE, group: Optional[str] = SOCKET_GROUP):
+    """Apply the socket mode and group (name or gid); call before listening"""
+    if group is not None:
+        gid = int(group) if group.isdigit() else grp.getgrnam(group).gr_gid
+        os.chown(socket_path, -1, gid)
+    os.chmod(socket_path, mode)
+
+
+def bind_socket(socket_path: str) -> socket.socket:
+    """Unix socket bound to socket_path with its permissions applied, not yet listening"""
+    remove_stale_socket(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(socket_path)
+        secure_socket(socket_path)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+class DialogServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server sharing one DialogManager between connections"""
+
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, socket_path: str, manager: DialogManager = None):
+        self.socket_path = socket_path
+        self.manager = manager if manager is not None else DialogManager()
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, DialogRequestHandler)
+
+    def server_bind(self):
+        super().server_bind()
+        # Before listen(): nobody outside the owner and group can connect
+        secure_socket(self.socket_path)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH, cache_size: int = 0, cache_ttl: float = None,
+          session_backend: str = 'memory', session_db: str = None,
+          session_ttl: float = DEFAULT_SESSION_TTL, online: bool = False,
+          model_poll_interval: float = MODEL_POLL_SECONDS, timings: bool = True,
+          fast_path: str = 'exact', ensemble: bool = False):
+    """Load the dialog manager once and serve until interrupted"""
+    session_store = create_session_store(session_backend, session_db, session_ttl)
+    manager = DialogManager(cache_size=cache_size, cache_ttl=cache_ttl, session_store=session_store,
+                            online=online, timings=timings,
+                            fast_path=None if fast_path == 'off' else fast_path, ensemble=ensemble)
+    # Warm up so the first real request does not pay for lazy initialization
+    manager.process_message('hello')
+    manager.reset_timings()
+    manager.profiler = RequestProfiler.from_env()
+    if model_poll_interval > 0:
+        # Newly promoted registry versions replace the model without a restart
+        manager.model_watcher(model_poll_interval).start()
+
+    server = DialogServer(socket_path, manager)
+
+    def _shutdown(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGUSR1, manager.profiler.toggle)
+
+    print(f"Dialog server listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve DialogManager over a Unix socket')
+    parser.add_argument('socket_path', nargs='?', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='response cache entries (0 disables the cache)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help='response cache entry lifetime in seconds')
+    parser.add_argument('--session-backend', choices=['memory', 'sqlite'], default='memory',
+                        help='where per-session context lives (sqlite is shared between processes)')
+    parser.add_argument('--session-db', default=None,
+                        help='SQLite session store path (default: $AGYRUS_SESSION_DB or /tmp)')
+    parser.add_argument('--session-ttl', type=float, default=DEFAULT_SESSION_TTL,
+                        help='seconds of inactivity before a session is forgotten')
+    parser.add_argument('--online', action='store_true',
+                        help='serve the incrementally trainable model and accept "learn" requests')
+    parser.add_argument('--model-poll-interval', type=float, default=MODEL_POLL_SECONDS,
+                        help='seconds between checks for a newly promoted model (0 disables reloading)')
+    parser.add_argument('--no-timings', action='store_true',
+                        help='do not keep per-stage latency histograms (stats "stages")')
+    parser.add_argument('--fast-path', choices=['off', 'exact', 'keywords'], default='exact',
+                        help='answer training phrases (exact) and keyword rule matches (keywords) '
+                             'without the classifier')
+    parser.add_argument('--ensemble', action='store_true',
+                        help='serve the decision tree, logistic and KNN models as one early-exit ensemble')
+    args = parser.parse_args()
+
+    serve(args.socket_path, args.cache_size, args.cache_ttl,
+          args.session_backend, args.session_db, args.session_ttl, args.online,
+          args.model_poll_interval, not args.no_timings, args.fast_path, args.ensemble)
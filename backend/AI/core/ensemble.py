@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Intent ensemble - decision tree, logistic and KNN models behind one model interface
+
+EnsembleModel holds several intent models trained on the same intents and
+answers like a single one (classes_, predict_proba), so predict_intents,
+the fast path and the servers use it unchanged.
+
+For every batch the first model (the cheapest, see ENSEMBLE_MODELS)
+classifies all texts. A text whose top probability reaches
+early_exit_confidence is answered by it alone. The others go to the
+remaining models, evaluated concurrently (one thread per model), and are
+answered by weighted vote: the weighted mean of every model's
+probabilities, the first model's included.
+
+Per-model calls, rows and time and the number of early exits are counted
+for stats().
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+# Evaluation order, cheapest first (µs per single message of the compact
+# models: decision tree ~21, logistic ~29, KNN ~150)
+ENSEMBLE_MODELS = ('decision_tree', 'logistic', 'knn')
+# Vote weights; other weightings are compared on the held-out split of
+# train_test_split.py by benchmarks/ensemble.py
+ENSEMBLE_WEIGHTS = {'decision_tree': 1.0, 'logistic': 1.0, 'knn': 1.0}
+# Top probability of the first model that answers a text without the others
+EARLY_EXIT_CONFIDENCE = 0.9
+
+
+class EnsembleModel:
+    """Early-exit, weighted-vote ensemble of intent models sharing their classes"""
+
+    def __init__(self, models: Dict[str, Any], weights: Optional[Dict[str, float]] = None,
+                 early_exit_confidence: float = EARLY_EXIT_CONFIDENCE, concurrent: Optional[bool] = None):
+        """
+        Args:
+            models: Model per name, in evaluation order (the first one decides early exits)
+            weights: Vote weight per name (default ENSEMBLE_WEIGHTS, 1.0 for other names)
+            early_exit_confidence: Top probability of the first model that skips the others
+                (above 1.0: never exit early)
+            concurrent: Evaluate the remaining models in parallel threads (default: when
+                there is more than one CPU; on one CPU the threads only add switching)
+        """
+        if not models:
+            raise ValueError("An ensemble needs at least one model")
+        self.models = dict(models)
+        self.names = list(self.models)
+        self.classes_ = np.asarray(self.models[self.names[0]].classes_)
+        for name, model in self.models.items():
+            if list(model.classes_) != list(self.classes_):
+                raise ValueError(f"Model {name} does not share the classes of {self.names[0]}")
+        weights = {**ENSEMBLE_WEIGHTS, **(weights or {})}
+        self.weights = {name: float(weights.get(name, 1.0)) for name in self.names}
+        self.early_exit_confidence = early_exit_confidence
+        self.concurrent = (os.cpu_count() or 1) > 1 if concurrent is None else concurrent
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self.reset_stats()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork(): a forked worker (prefork_server.py) starts its own pool
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=len(self.names) - 1,
+                                                    thread_name_prefix='ensemble')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, name: str, texts: List[str]) -> np.ndarray:
+        start = time.perf_counter()
+        # A copy: predict_proba overwrites the rows of the texts that go to the vote
+        probabilities = np.array(self.models[name].predict_proba(texts), dtype=np.float64)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.model_calls[name] += 1
+            self.model_rows[name] += len(texts)
+            self.model_seconds[name] += elapsed
+        return probabilities
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        first = self._run(self.names[0], texts)
+        pending = np.flatnonzero(first.max(axis=1) < self.early_exit_confidence)
+        with self._lock:
+            self.texts += len(texts)
+            self.early_exits += len(texts) - len(pending)
+        others = self.names[1:]
+        if not len(pending) or not others:
+            return first
+
+        pending_texts = [texts[i] for i in pending]
+        if self.concurrent and len(others) > 1:
+            pool = self._pool()
+            results = [future.result() for future in
+                       [pool.submit(self._run, name, pending_texts) for name in others]]
+        else:
+            results = [self._run(name, pending_texts) for name in others]
+
+        votes = self.weights[self.names[0]] * first[pending]
+        for name, probabilities in zip(others, results):
+            votes += self.weights[name] * probabilities
+        first[pending] = votes / sum(self.weights.values())
+        return first
+
+    def replaced(self, name: str, model) -> 'EnsembleModel':
+        """Same ensemble with one member swapped (e.g. a newly promoted version)"""
+        return EnsembleModel({**self.models, name: model}, self.weights,
+                             self.early_exit_confidence, self.concurrent)
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+    def reset_stats(self):
+        """Forget the counters (e.g. of warm-up requests)"""
+        with self._lock:
+            self.texts = 0
+            self.early_exits = 0
+            self.model_calls = {name: 0 for name in self.names}
+            self.model_rows = {name: 0 for name in self.names}
+            self.model_seconds = {name: 0.0 for name in self.names}
+
+    def stats(self) -> Dict[str, Any]:
+        """Early exit rate and latency per model"""
+        with self._lock:
+            return {
+                'texts': self.texts,
+                'early_exits': self.early_exits,
+                'early_exit_rate': self.early_exits / self.texts if self.texts else 0.0,
+                'early_exit_confidence': self.early_exit_confidence,
+                'concurrent': self.concurrent,
+                'models': {
+                    name: {
+                        'weight': self.weights[name],
+                        'calls': self.model_calls[name],
+                        'texts': self.model_rows[name],
+                        'ms_per_call': (self.model_seconds[name] * 1000 / self.model_calls[name]
+                                        if self.model_calls[name] else 0.0),
+                        'ms_per_text': (self.model_seconds[name] * 1000 / self.model_rows[name]
+                                        if self.model_rows[name] else 0.0)
+                    }
+                    for name in self.names
+                }
+            }
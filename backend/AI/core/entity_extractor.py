@@ -8,107 +8,300 @@ Extracts: tutor names, subjects, dates, times
 import re
 import sys
 import json
-from typing import Dict, List, Any, Optional
-from nlp_utils import DateTimeParser, TextNormalizer
+from typing import Dict, List, Any, Optional, Tuple, Union
+from nlp_utils import DateTimeParser, TextNormalizer, MessageAnalysis, analyze_message
+from tutor_gazetteer import TutorGazetteer
+
+
+class KeywordMatcher:
+    """
+    Whole-word keyword matcher compiled into a single regex
+    
+    All keywords of all labels are combined into one alternation (longest
+    first) bounded by \\b, so one scan finds every match and "eng" no longer
+    fires inside "length".
+    """
+    
+    def __init__(self, table: Dict[str, List[str]]):
+        self.table = {label: list(keywords) for label, keywords in table.items()}
+        self.fingerprint = self.make_fingerprint(table)
+        self.keyword_labels = {}
+        
+        for label, keywords in table.items():
+            for keyword in keywords:
+                key = ' '.join(keyword.lower().split())
+                # First label listing a keyword wins, like the old dict scan
+                self.keyword_labels.setdefault(key, label)
+        
+        if self.keyword_labels:
+            alternatives = sorted(self.keyword_labels, key=len, reverse=True)
+            # Multi-word keywords match any run of whitespace between words
+            body = '|'.join(r'\s+'.join(map(re.escape, k.split())) for k in alternatives)
+            self.pattern = re.compile(rf'\b(?:{body})\b', re.IGNORECASE)
+        else:
+            self.pattern = None
+    
+    @staticmethod
+    def make_fingerprint(table: Dict[str, List[str]]) -> Tuple:
+        """Hashable snapshot of a keyword table, used to skip needless rebuilds"""
+        return tuple((label, tuple(keywords)) for label, keywords in table.items())
+    
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """All matches in order of appearance: label, keyword, start, end"""
+        if self.pattern is None:
+            return []
+        matches = []
+        for match in self.pattern.finditer(text):
+            keyword = ' '.join(match.group(0).lower().split())
+            matches.append({
+                'label': self.keyword_labels[keyword],
+                'keyword': keyword,
+                'start': match.start(),
+                'end': match.end()
+            })
+        return matches
+    
+    def first(self, text: str) -> Optional[str]:
+        """Label of the leftmost match, or None"""
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(text)
+        if match is None:
+            return None
+        return self.keyword_labels[' '.join(match.group(0).lower().split())]
+
+
+# Built-in subjects/courses; never modified, so course tables rebuilt with
+# load_subjects() start from it again and deleted courses disappear
+DEFAULT_SUBJECTS = {
+    'math': ('math', 'mathematics', 'algebra', 'geometry'),
+    'english': ('english', 'eng'),
+    'physics': ('physics', 'phys'),
+    'chemistry': ('chemistry', 'chem'),
+    'biology': ('biology', 'bio'),
+    'history': ('history', 'hist'),
+    'programming': ('programming', 'code', 'coding', 'python', 'java', 'javascript'),
+    'literature': ('literature', 'lit'),
+    'russian': ('russian', 'rus'),
+    'spanish': ('spanish', 'spa'),
+    'french': ('french', 'fra'),
+    'german': ('german', 'ger')
+}
+
+
+def subject_table_from_courses(courses: List[Dict[str, Any]],
+                               base_table: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """
+    Build a subject keyword table from rows of the `course` table
+    
+    A course whose name is already a known keyword (e.g. "Mathematics")
+    extends that subject; other courses become new subjects keyed by their
+    lowercase name (e.g. "computer science"). base_table defaults to
+    DEFAULT_SUBJECTS, not the table currently loaded.
+    """
+    table = {label: list(keywords) for label, keywords in (base_table or DEFAULT_SUBJECTS).items()}
+    known = {keyword: label for label, keywords in table.items() for keyword in keywords}
+    
+    for course in courses:
+        name = ' '.join(str(course.get('course_name', '')).lower().split())
+        if not name:
+            continue
+        label = known.get(name)
+        if label is None:
+            table[name] = [name]
+            known[name] = name
+        elif name not in table[label]:
+            table[label].append(name)
+            known[name] = label
+    
+    return table
 
 
 class EntityExtractor:
     """Extract entities from user messages"""
     
-    # Common subjects/courses
-    SUBJECTS = {
-        'math': ['math', 'mathematics', 'algebra', 'geometry'],
-        'english': ['english', 'eng'],
-        'physics': ['physics', 'phys'],
-        'chemistry': ['chemistry', 'chem'],
-        'biology': ['biology', 'bio'],
-        'history': ['history', 'hist'],
-        'programming': ['programming', 'code', 'coding', 'python', 'java', 'javascript'],
-        'literature': ['literature', 'lit'],
-        'russian': ['russian', 'rus'],
-        'spanish': ['spanish', 'spa'],
-        'french': ['french', 'fra'],
-        'german': ['german', 'ger']
+    # Current subjects/courses (replaced by load_subjects)
+    SUBJECTS = {label: list(keywords) for label, keywords in DEFAULT_SUBJECTS.items()}
+    
+    # Action keywords, checked in priority order (book > cancel > view).
+    # Matched as whole words, so inflected forms are listed
+    ACTIONS = {
+        'book': ['book', 'books', 'booked', 'booking', 'bookings', 'rebook', 'rebooked', 'rebooking',
+                 'reserve', 'reserves', 'reserved', 'reserving', 'reservation', 'reservations',
+                 'schedule', 'schedules', 'scheduled', 'scheduling',
+                 'reschedule', 'reschedules', 'rescheduled', 'rescheduling',
+                 'appoint', 'appointed', 'appointment', 'appointments'],
+        'cancel': ['cancel', 'cancels', 'cancelled', 'canceled', 'cancelling', 'canceling',
+                   'cancellation', 'cancellations', 'remove', 'removes', 'removed', 'removing',
+                   'delete', 'deletes', 'deleted', 'deleting', 'abort', 'aborts', 'aborted', 'aborting'],
+        'view': ['show', 'shows', 'showed', 'shown', 'showing', 'view', 'views', 'viewed', 'viewing',
+                 'display', 'displays', 'displayed', 'displaying', 'list', 'lists', 'listed', 'listing']
     }
     
+    # Pattern for names: Capitalized words (2-15 chars)
+    # Example: "John Smith", "Maria", "Ivan Petrov"
+    NAME_PATTERN = re.compile(r'\b([A-Z][a-z]{1,14}(?:\s+[A-Z][a-z]{1,14})?)\b')
+    
+    # Filter out common false positives
+    NAME_EXCLUDE_WORDS = {'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday',
+                          'January', 'February', 'March', 'April', 'May', 'June', 'July',
+                          'August', 'September', 'October', 'November', 'December',
+                          'Find', 'Search', 'Show', 'Book', 'Cancel', 'View', 'Display', 'Looking',
+                          'Need', 'Want'}
+    
+    # Compiled matchers shared by all instances
+    _subject_matcher = None
+    _action_matcher = None
+    
+    # Tutor names from the tutor table; empty until load_tutors() is called
+    tutor_gazetteer = TutorGazetteer()
+    
+    @classmethod
+    def _get_subject_matcher(cls) -> KeywordMatcher:
+        if cls._subject_matcher is None:
+            cls._subject_matcher = KeywordMatcher(cls.SUBJECTS)
+        return cls._subject_matcher
+    
+    @classmethod
+    def _get_action_matcher(cls) -> KeywordMatcher:
+        if cls._action_matcher is None:
+            cls._action_matcher = KeywordMatcher(cls.ACTIONS)
+        return cls._action_matcher
+    
+    @classmethod
+    def load_subjects(cls, table: Dict[str, List[str]]) -> bool:
+        """
+        Replace the subject keyword table (e.g. built from the course table)
+        The matcher is only recompiled when the table actually changed.
+        Returns True if it was rebuilt.
+        """
+        if cls._get_subject_matcher().fingerprint == KeywordMatcher.make_fingerprint(table):
+            return False
+        cls.SUBJECTS = {label: list(keywords) for label, keywords in table.items()}
+        cls._subject_matcher = KeywordMatcher(cls.SUBJECTS)
+        # Course names are valid words, not typos to correct
+        TextNormalizer.set_known_words('subjects', [k for keywords in cls.SUBJECTS.values() for k in keywords])
+        return True
+    
+    @classmethod
+    def load_tutors(cls, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Sync the tutor gazetteer with rows of the tutor table (tutor_id, name, surname)"""
+        changes = cls.tutor_gazetteer.sync(rows)
+        # Tutor names are valid words, not typos to correct ("walter" -> "later")
+        TextNormalizer.set_known_words('tutors', [f"{name} {surname}" for name, surname in
+                                                  cls.tutor_gazetteer.tutors.values()])
+        return changes
+    
     def __init__(self):
         self.date_parser = DateTimeParser()
         self.normalizer = TextNormalizer()
     
-    def extract_subject(self, text: str) -> Optional[str]:
-        """Extract subject/course from text"""
-        text_lower = text.lower()
-        
-        for subject, keywords in self.SUBJECTS.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return subject
+    @staticmethod
+    def _find_in_tokens(matcher: KeywordMatcher, message: Union[str, MessageAnalysis]) -> List[Dict[str, Any]]:
+        """
+        Keyword matches over the typo-corrected tokens ("maths" -> "math"),
+        with start/end mapped back to the original text
+        """
+        analysis = message if isinstance(message, MessageAnalysis) else analyze_message(message)
+        matches = matcher.find_all(analysis.normalized)
+        for match in matches:
+            match['start'], match['end'] = analysis.text_span(match['start'], match['end'])
+        return matches
+    
+    def extract_subject(self, message: Union[str, MessageAnalysis]) -> Optional[str]:
+        """Extract subject/course from text (leftmost match)"""
+        spans = self.extract_subject_spans(message)
+        return spans[0]['label'] if spans else None
+    
+    def extract_subject_spans(self, message: Union[str, MessageAnalysis]) -> List[Dict[str, Any]]:
+        """All subject mentions with their character spans"""
+        return self._find_in_tokens(self._get_subject_matcher(), message)
+    
+    def extract_tutor(self, message: Union[str, MessageAnalysis]) -> Dict[str, Any]:
+        """
+        Resolve a tutor mention against the gazetteer
+        Returns dict with tutor_name and tutor_id (unique match) or
+        tutor_ids (ambiguous, e.g. a first name shared by several tutors)
+        """
+        if not len(self.tutor_gazetteer):
+            text = message.text if isinstance(message, MessageAnalysis) else message
+            return {'tutor_name': self.extract_tutor_name(text)}
         
-        return None
+        match = self.tutor_gazetteer.resolve(message)
+        if match is None:
+            return {}
+        if len(match['tutor_ids']) == 1:
+            return {'tutor_name': match['alias'], 'tutor_id': match['tutor_ids'][0]}
+        return {'tutor_name': match['alias'], 'tutor_ids': match['tutor_ids']}
     
     def extract_tutor_name(self, text: str) -> Optional[str]:
         """
         Extract tutor name from text
-        Looks for capitalized words that might be names
+        Uses the tutor gazetteer when loaded, otherwise looks for
+        capitalized words that might be names
         """
-        # Pattern for names: Capitalized words (2-15 chars)
-        # Example: "John Smith", "Maria", "Ivan Petrov"
-        name_pattern = r'\b([A-Z][a-z]{1,14}(?:\s+[A-Z][a-z]{1,14})?)\b'
-        
-        matches = re.findall(name_pattern, text)
-        
-        # Filter out common false positives
-        exclude_words = {'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday',
-                        'January', 'February', 'March', 'April', 'May', 'June', 'July', 
-                        'August', 'September', 'October', 'November', 'December',
-                        'Find', 'Search', 'Show', 'Book', 'Cancel', 'View', 'Display', 'Looking',
-                        'Need', 'Want'}
+        if len(self.tutor_gazetteer):
+            match = self.tutor_gazetteer.resolve(text)
+            return match['alias'] if match else None
         
-        for match in matches:
-            if match not in exclude_words:
+        for match in self.NAME_PATTERN.findall(text):
+            if match not in self.NAME_EXCLUDE_WORDS:
                 return match
         
         return None
     
-    def extract_action_type(self, text: str) -> Optional[str]:
+    def extract_action_type(self, message: Union[str, MessageAnalysis]) -> Optional[str]:
         """Detect specific action keywords"""
-        text_lower = text.lower()
-        
-        # Booking keywords
-        if any(word in text_lower for word in ['book', 'reserve', 'schedule', 'appoint']):
-            return 'book'
-        
-        # Cancel keywords
-        if any(word in text_lower for word in ['cancel', 'remove', 'delete', 'abort']):
-            return 'cancel'
-        
-        # Show/view keywords
-        if any(word in text_lower for word in ['show', 'view', 'display', 'list']):
-            return 'view'
-        
-        return None
+        return self._first_action(self.extract_action_spans(message))
+    
+    def _first_action(self, action_spans: List[Dict[str, Any]]) -> Optional[str]:
+        """Highest priority action among the matches"""
+        found = {match['label'] for match in action_spans}
+        return next((action for action in self.ACTIONS if action in found), None)
     
-    def extract_all(self, text: str) -> Dict[str, Any]:
-        """Extract all entities from text"""
-        normalized = self.normalizer.normalize(text)
+    def extract_action_spans(self, message: Union[str, MessageAnalysis]) -> List[Dict[str, Any]]:
+        """All action keyword mentions with their character spans"""
+        return self._find_in_tokens(self._get_action_matcher(), message)
+    
+    def extract_all(self, message: Union[str, MessageAnalysis]) -> Dict[str, Any]:
+        """
+        Extract all entities from a message
+        Accepts raw text or a MessageAnalysis; subject/action spans (in the
+        original text) and the parsed date/time are stored in analysis.spans
+        for later stages. Subjects, actions, tutors and the date/time are
+        read from the shared, typo-corrected tokens ("tommorow" -> "tomorrow");
+        tutor names keep the capitalization of the original text.
+        """
+        analysis = message if isinstance(message, MessageAnalysis) else analyze_message(message)
+        
+        subject_spans = self.extract_subject_spans(analysis)
+        action_spans = self.extract_action_spans(analysis)
+        date_time = self.date_parser.parse_lowered(analysis.normalized)
+        analysis.spans.update(subject=subject_spans, action=action_spans, date_time=date_time)
         
         entities = {
-            'subject': self.extract_subject(text),
-            'tutor_name': self.extract_tutor_name(text),
-            'date': self.date_parser.parse_date(text),
-            'time': self.date_parser.parse_time(text),
-            'action': self.extract_action_type(text),
-            'original_text': text
+            'subject': subject_spans[0]['label'] if subject_spans else None,
+            **self.extract_tutor(analysis),
+            'date': date_time['date'],
+            'time': date_time['time'],
+            'time_end': date_time['time_end'],
+            'action': self._first_action(action_spans),
+            'original_text': analysis.text
         }
         
         # Remove None values for cleaner output
         return {k: v for k, v in entities.items() if v is not None}
 
 
-def extract_entities_from_message(text: str) -> Dict[str, Any]:
-    """Main function to extract entities"""
-    extractor = EntityExtractor()
-    return extractor.extract_all(text)
+_default_extractor = None
+
+
+def extract_entities_from_message(message: Union[str, MessageAnalysis]) -> Dict[str, Any]:
+    """Main function to extract entities (reuses one extractor instance)"""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = EntityExtractor()
+    return _default_extractor.extract_all(message)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Intent fast path - exact-match index and keyword rules ahead of the classifier
+
+Many messages are, after preprocess_text, literally one of the training
+examples ("show my bookings", "cancel booking"). FastPathIndex maps every
+normalized training example to the model's own prediction for it, so a
+hit skips TF-IDF and the classifier and returns the same intent and
+confidence the model would. When the index is built the model is run on
+the whole corpus: examples it misclassifies, and texts labeled with more
+than one intent, are left out.
+
+Optionally, high-precision keyword rules (KEYWORD_RULES) answer short
+messages the index does not know. A rule is only enabled when it matches
+enough training examples and every one of them carries the rule's
+intent. Its confidence is the model's mean confidence on those examples.
+
+Hits, misses and the classifier time spent on misses are counted, so
+stats() reports the share of traffic served by the fast path and an
+estimate of the time it saved.
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+from intent_classifier import load_corpus, predict_intents
+
+# Stored per exact-match entry; a hit answers top_k up to this many
+STORED_TOP_K = 3
+# Training examples a keyword rule must match before it is enabled
+MIN_RULE_SUPPORT = 3
+
+# Applied to messages of at most max_words words, matched on whole words of the
+# preprocessed text; all of `all` must occur and none of `none`
+KEYWORD_RULES = [
+    {'intent': 'cancel_booking', 'all': ['cancel'],
+     'none': ['how', 'what', 'did', 'tutor', 'teacher', 'find', 'show'], 'max_words': 6},
+    {'intent': 'view_bookings', 'all': ['my', 'bookings'], 'none': ['cancel', 'remove', 'delete'],
+     'max_words': 5},
+    {'intent': 'view_bookings', 'all': ['my', 'schedule'], 'none': ['cancel', 'remove', 'delete'],
+     'max_words': 5},
+    {'intent': 'search_tutor', 'all': ['find', 'tutor'], 'none': ['cancel', 'my'], 'max_words': 6},
+    {'intent': 'general', 'all': ['thank'], 'none': [], 'max_words': 4},
+]
+
+
+class FastPathIndex:
+    """Exact-match and keyword lookup of intents, built from the training corpus and a model"""
+
+    def __init__(self, model, texts: Sequence[str], labels: Sequence[str], rules: Optional[List[Dict]] = None):
+        """
+        Args:
+            model: Intent model the index answers for
+            texts: Preprocessed training examples (see load_corpus)
+            labels: Intent of each example
+            rules: Keyword rules in the KEYWORD_RULES format (None: no rules)
+        """
+        self.texts = list(texts)
+        self.labels = list(labels)
+        self.rules = rules or []
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.keyword_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+        start = time.perf_counter()
+        labels_of = {}
+        for text, label in zip(self.texts, self.labels):
+            labels_of.setdefault(text, set()).add(label)
+        unique = list(labels_of)
+        predictions = dict(zip(unique, predict_intents(model, unique, top_k=STORED_TOP_K)))
+
+        self.exact = {}
+        conflicts, disagreements = [], []
+        for text, text_labels in labels_of.items():
+            prediction = predictions[text]
+            if len(text_labels) > 1:
+                conflicts.append(text)
+            elif prediction['intent'] not in text_labels:
+                disagreements.append({'text': text, 'label': next(iter(text_labels)),
+                                      'model': prediction['intent']})
+            else:
+                self.exact[text] = prediction
+
+        self.keyword_rules = []
+        rule_reports = []
+        for rule in self.rules:
+            report = self._check_rule(rule, predictions)
+            rule_reports.append(report)
+            if report['enabled']:
+                self.keyword_rules.append((frozenset(rule['all']), frozenset(rule['none']), rule['max_words'],
+                                           {'intent': rule['intent'], 'confidence': report['confidence'],
+                                            'top_intents': [{'intent': rule['intent'],
+                                                             'confidence': report['confidence']}]}))
+
+        agreeing = sum(predictions[text]['intent'] == label for text, label in zip(self.texts, self.labels))
+        self.report = {
+            'examples': len(self.texts),
+            'unique_texts': len(unique),
+            'entries': len(self.exact),
+            'label_conflicts': conflicts,
+            'model_disagreements': disagreements,
+            'model_agreement': agreeing / len(self.texts) if self.texts else 1.0,
+            'rules': rule_reports,
+            'build_ms': (time.perf_counter() - start) * 1000
+        }
+
+    def _check_rule(self, rule: Dict, predictions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Precision of a keyword rule on the training corpus; enabled only when it never misfires"""
+        required, excluded = frozenset(rule['all']), frozenset(rule['none'])
+        matched = correct = model_agrees = 0
+        confidences = []
+        for text, label in zip(self.texts, self.labels):
+            words = text.split()
+            if len(words) > rule['max_words'] or not required.issubset(words) or not excluded.isdisjoint(words):
+                continue
+            matched += 1
+            correct += label == rule['intent']
+            prediction = predictions[text]
+            if prediction['intent'] == rule['intent']:
+                model_agrees += 1
+                confidences.append(prediction['confidence'])
+        precision = correct / matched if matched else 0.0
+        return {
+            'intent': rule['intent'],
+            'all': list(rule['all']),
+            'matched': matched,
+            'precision': precision,
+            'model_agreement': model_agrees / matched if matched else 0.0,
+            'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+            'enabled': matched >= MIN_RULE_SUPPORT and precision == 1.0 and bool(confidences)
+        }
+
+    def rebuilt(self, model) -> 'FastPathIndex':
+        """Index of the same corpus and rules for another model (e.g. after a model swap); counters carry over"""
+        index = FastPathIndex(model, self.texts, self.labels, self.rules)
+        with self._lock:
+            index.exact_hits, index.keyword_hits = self.exact_hits, self.keyword_hits
+            index.misses, index.miss_seconds = self.misses, self.miss_seconds
+        return index
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """Prediction for a preprocessed text, or None when the classifier has to run"""
+        result = self.exact.get(text)
+        if result is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return result
+        if self.keyword_rules:
+            words = text.split()
+            for required, excluded, max_words, rule_result in self.keyword_rules:
+                if len(words) <= max_words and required.issubset(words) and excluded.isdisjoint(words):
+                    with self._lock:
+                        self.keyword_hits += 1
+                    return rule_result
+        return None
+
+    def record_misses(self, count: int, seconds: float):
+        """Texts that went to the classifier and the time it took for them"""
+        with self._lock:
+            self.misses += count
+            self.miss_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Share of lookups answered without the classifier and the estimated time saved"""
+        with self._lock:
+            hits = self.exact_hits + self.keyword_hits
+            lookups = hits + self.misses
+            miss_ms = self.miss_seconds * 1000 / self.misses if self.misses else 0.0
+            return {
+                'entries': len(self.exact),
+                'keyword_rules': len(self.keyword_rules),
+                'exact_hits': self.exact_hits,
+                'keyword_hits': self.keyword_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'classifier_ms_per_miss': miss_ms,
+                # Classifier time the hits would have cost at the average miss cost
+                'estimated_saved_ms': hits * miss_ms
+            }
+
+
+def build_fast_path(model, keyword_rules: bool = False, data_dir=None) -> FastPathIndex:
+    """FastPathIndex over the training corpus, with KEYWORD_RULES when keyword_rules is set"""
+    texts, labels = load_corpus(data_dir)
+    return FastPathIndex(model, texts, labels, KEYWORD_RULES if keyword_rules else None)
+
+
+if __name__ == '__main__':
+    import json
+    import argparse
+    from intent_classifier import load_model
+
+    parser = argparse.ArgumentParser(description='Build the intent fast path and print its agreement report')
+    parser.add_argument('model_type', nargs='?', default='logistic')
+    args = parser.parse_args()
+
+    index = build_fast_path(load_model(args.model_type), keyword_rules=True)
+    print(json.dumps(index.report, indent=2))
@@ -7,25 +7,25 @@ Classifies user messages into intents based on chatbot.js functionality
 
 import pickle
 import re
+import time
 import json
 import os
+import numpy as np
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.pipeline import Pipeline
-from nlp_utils import TextNormalizer
-
-def load_training_data():
+from nlp_utils import TextNormalizer, MessageAnalysis
+from compact_model import save_compact_model, save_compact_knn_model, save_compact_tree_model, load_compact_model
+
+def load_training_data(data_dir=None):
     """Load training data from JSON files"""
-    script_dir = Path(__file__).parent
-    data_dir = (script_dir / '..' / 'training_data').resolve()
+    if data_dir is None:
+        script_dir = Path(__file__).parent
+        data_dir = (script_dir / '..' / 'training_data').resolve()
+    data_dir = Path(data_dir)
     
     training_data = []
     
     # Load all JSON files from training_data directory (excluding typo_corrections.json)
-    for json_file in data_dir.glob('*.json'):
+    for json_file in sorted(data_dir.glob('*.json')):
         if json_file.name == 'typo_corrections.json':
             continue  # Skip typo corrections file
             
@@ -40,102 +40,140 @@ def load_training_data():
     return training_data
 
 def preprocess_text(text):
-    """Preprocess text for classification"""
+    """Preprocess text (or a MessageAnalysis) for classification"""
+    if isinstance(text, MessageAnalysis):
+        return text.classifier_text
+    
     # Use TextNormalizer for better preprocessing including typo correction
     text = TextNormalizer.normalize(text)
     text = re.sub(r'[^\w\s]', ' ', text)
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def train_logistic_regression():
-    """Train Logistic Regression model"""
-    training_data = load_training_data()
-    texts = [preprocess_text(text) for text, _ in training_data]
+def preprocess_texts(texts):
+    """Preprocess many texts, normalizing each distinct text only once"""
+    processed = {}
+    return [
+        processed[text] if text in processed else processed.setdefault(text, preprocess_text(text))
+        for text in texts
+    ]
+
+def load_corpus(data_dir=None):
+    """Load and preprocess the training corpus once; returns (texts, labels)"""
+    training_data = load_training_data(data_dir)
+    texts = preprocess_texts([text for text, _ in training_data])
     labels = [label for _, label in training_data]
+    return texts, labels
+
+# scikit-learn is imported inside the training functions only: serving code
+# (DialogManager, compact model) never needs it, and importing it costs
+# far more than everything else at startup.
+
+MODEL_TYPES = ('logistic', 'decision_tree', 'knn')
+# Model types with an sklearn-free compact format (see compact_model.py)
+COMPACT_MODEL_TYPES = ('logistic', 'knn', 'decision_tree')
+
+# Vectorizer ('tfidf') and classifier ('clf') parameters of each model type
+MODEL_PARAMS = {
+    'logistic': {
+        'tfidf': {'ngram_range': (1, 3), 'max_features': 500, 'min_df': 1, 'stop_words': 'english'},
+        'clf': {'random_state': 42, 'max_iter': 1000, 'C': 1.0, 'class_weight': 'balanced'}
+    },
+    'decision_tree': {
+        'tfidf': {'ngram_range': (1, 2), 'max_features': 300, 'min_df': 2, 'stop_words': 'english'},
+        'clf': {'random_state': 42, 'max_depth': 10, 'min_samples_split': 5, 'min_samples_leaf': 2}
+    },
+    'knn': {
+        'tfidf': {'ngram_range': (1, 2), 'max_features': 200, 'min_df': 1, 'stop_words': 'english'},
+        'clf': {'n_neighbors': 5, 'weights': 'distance', 'metric': 'cosine'}
+    }
+}
+
+def build_classifier(model_type, params=None):
+    """Unfitted classifier of a model type (MODEL_PARAMS defaults, overridden by params)"""
+    if model_type == 'logistic':
+        from sklearn.linear_model import LogisticRegression as classifier
+    elif model_type == 'decision_tree':
+        from sklearn.tree import DecisionTreeClassifier as classifier
+    elif model_type == 'knn':
+        from sklearn.neighbors import KNeighborsClassifier as classifier
+    else:
+        raise ValueError("Model type must be 'logistic', 'decision_tree', or 'knn'")
+    return classifier(**{**MODEL_PARAMS[model_type]['clf'], **(params or {})})
+
+def build_pipeline(model_type, tfidf_params=None, clf_params=None):
+    """Unfitted TF-IDF + classifier Pipeline of a model type"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
     
-    model = Pipeline([
-        ('tfidf', TfidfVectorizer(
-            ngram_range=(1, 3),
-            max_features=500,
-            min_df=1,
-            stop_words='english'
-        )),
-        ('clf', LogisticRegression(
-            random_state=42,
-            max_iter=1000,
-            C=1.0,
-            class_weight='balanced'
-        ))
+    clf = build_classifier(model_type, clf_params)
+    return Pipeline([
+        ('tfidf', TfidfVectorizer(**{**MODEL_PARAMS[model_type]['tfidf'], **(tfidf_params or {})})),
+        ('clf', clf)
     ])
+
+def train_model(model_type='logistic', texts=None, labels=None, tfidf_params=None, clf_params=None):
+    """
+    Train the intent classifier with specified model type
+    texts/labels: already preprocessed corpus (see load_corpus); loaded when omitted
+    tfidf_params/clf_params: overrides of MODEL_PARAMS (e.g. from a hyperparameter search)
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError("Model type must be 'logistic', 'decision_tree', or 'knn'")
+    if texts is None or labels is None:
+        texts, labels = load_corpus()
     
+    model = build_pipeline(model_type, tfidf_params, clf_params)
     model.fit(texts, labels)
     return model
 
-def train_decision_tree():
+def train_logistic_regression(texts=None, labels=None):
+    """Train Logistic Regression model"""
+    return train_model('logistic', texts, labels)
+
+def train_decision_tree(texts=None, labels=None):
     """Train Decision Tree model"""
-    training_data = load_training_data()
-    texts = [preprocess_text(text) for text, _ in training_data]
-    labels = [label for _, label in training_data]
-    
-    model = Pipeline([
-        ('tfidf', TfidfVectorizer(
-            ngram_range=(1, 2),
-            max_features=300,
-            min_df=2,
-            stop_words='english'
-        )),
-        ('clf', DecisionTreeClassifier(
-            random_state=42,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2
-        ))
-    ])
-    
-    model.fit(texts, labels)
-    return model
+    return train_model('decision_tree', texts, labels)
 
-def train_knn():
+def train_knn(texts=None, labels=None):
     """Train K-Nearest Neighbors model"""
-    training_data = load_training_data()
-    texts = [preprocess_text(text) for text, _ in training_data]
-    labels = [label for _, label in training_data]
-    
-    model = Pipeline([
-        ('tfidf', TfidfVectorizer(
-            ngram_range=(1, 2),
-            max_features=200,
-            min_df=1,
-            stop_words='english'
-        )),
-        ('clf', KNeighborsClassifier(
-            n_neighbors=5,
-            weights='distance',
-            metric='cosine'
-        ))
-    ])
-    
-    model.fit(texts, labels)
-    return model
-
-def train_model(model_type='logistic'):
-    """Train the intent classifier with specified model type"""
-    if model_type == 'logistic':
-        return train_logistic_regression()
-    elif model_type == 'decision_tree':
-        return train_decision_tree()
-    elif model_type == 'knn':
-        return train_knn()
-    else:
-        raise ValueError("Model type must be 'logistic', 'decision_tree', or 'knn'")
+    return train_model('knn', texts, labels)
 
 def save_model(model, model_type='logistic', filepath=None):
-    """Save trained model to file"""
+    """
+    Save trained model to file
+    Written to a temporary file and renamed, so readers never see a partial pickle
+    """
     if filepath is None:
         filename = f'intent_model_{model_type}.pkl'
         filepath = (Path(__file__).parent / '..' / 'models' / filename).resolve()
-    with open(filepath, 'wb') as f:
-        pickle.dump(model, f)
+    filepath = Path(filepath)
+    tmp_path = filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(tmp_path, filepath)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def tuned_params_path(model_type, models_dir=None):
+    """Where the winning hyperparameters of a model type are stored (next to its pickle)"""
+    if models_dir is None:
+        models_dir = (Path(__file__).parent / '..' / 'models').resolve()
+    return Path(models_dir) / f'intent_model_{model_type}.params.json'
+
+def load_tuned_params(model_type, models_dir=None):
+    """(tfidf_params, clf_params) saved by a hyperparameter search, or (None, None)"""
+    path = tuned_params_path(model_type, models_dir)
+    if not path.exists():
+        return None, None
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    tfidf_params = dict(saved['tfidf'])
+    if 'ngram_range' in tfidf_params:
+        tfidf_params['ngram_range'] = tuple(tfidf_params['ngram_range'])
+    return tfidf_params, dict(saved['clf'])
 
 def load_model(model_type='logistic', filepath=None):
     """Load trained model from file"""
@@ -145,28 +183,229 @@ def load_model(model_type='logistic', filepath=None):
     with open(filepath, 'rb') as f:
         return pickle.load(f)
 
-def predict_intent(model, text):
+def export_compact_model(model, dirpath=None):
+    """
+    Export a fitted logistic, KNN or decision tree Pipeline to the sklearn-free compact format
+    (vocabulary, IDF, vectorizer config and the classifier arrays)
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    
+    vectorizer = model.named_steps['tfidf']
+    clf = model.named_steps['clf']
+    if isinstance(clf, LogisticRegression):
+        model_type = 'logistic'
+    elif isinstance(clf, KNeighborsClassifier) and clf.metric == 'cosine':
+        model_type = 'knn'
+    elif isinstance(clf, DecisionTreeClassifier) and clf.n_outputs_ == 1:
+        model_type = 'decision_tree'
+    else:
+        raise ValueError("Only logistic, cosine KNN and decision tree models can be exported to the compact format")
+    if dirpath is None:
+        dirpath = (Path(__file__).parent / '..' / 'models' / f'intent_model_{model_type}').resolve()
+    
+    # Features are indexed alphabetically, so a list is enough to rebuild the lookup
+    vocabulary = [None] * len(vectorizer.vocabulary_)
+    for term, index in vectorizer.vocabulary_.items():
+        vocabulary[index] = term
+    
+    stop_words = vectorizer.get_stop_words()
+    vectorizer_config = {
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'stop_words': sorted(stop_words) if stop_words else [],
+        'ngram_range': list(vectorizer.ngram_range),
+        'binary': vectorizer.binary,
+        'sublinear_tf': vectorizer.sublinear_tf,
+        'norm': vectorizer.norm
+    }
+    idf = vectorizer.idf_ if vectorizer.use_idf else None
+    
+    if model_type == 'knn':
+        # Fitted training matrix (CSR) and encoded labels, as the classifier searches them
+        train = clf._fit_X.tocsr()
+        save_compact_knn_model(dirpath, vocabulary, idf, vectorizer_config, train.data, train.indices,
+                               train.indptr, clf._y, list(clf.classes_), clf.n_neighbors, clf.weights)
+        return dirpath
+    
+    if model_type == 'decision_tree':
+        # Node class distributions, normalized the way predict_proba normalizes the leaf values
+        tree = clf.tree_
+        proba = tree.value[:, 0, :].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        save_compact_tree_model(dirpath, vocabulary, idf, vectorizer_config, tree.feature, tree.threshold,
+                                tree.children_left, tree.children_right, proba / normalizer,
+                                list(clf.classes_))
+        return dirpath
+    
+    # Resolve sklearn's 'auto' the same way predict_proba does
+    multi_class = getattr(clf, 'multi_class', 'auto')
+    if multi_class in ('ovr', 'warn') or (
+            multi_class == 'auto' and (len(clf.classes_) == 2 or clf.solver == 'liblinear')):
+        multi_class = 'ovr'
+    else:
+        multi_class = 'multinomial'
+    
+    save_compact_model(
+        dirpath,
+        vocabulary,
+        idf,
+        vectorizer_config,
+        clf.coef_,
+        clf.intercept_,
+        list(clf.classes_),
+        multi_class
+    )
+    return dirpath
+
+def verify_compact_model(model, compact_model, texts=None, atol=1e-12):
+    """
+    Check that the compact model reproduces the pipeline's predict_proba
+    Returns the max absolute difference, raises AssertionError on mismatch
+    """
+    if texts is None:
+        texts = [preprocess_text(text) for text, _ in load_training_data()]
+    
+    expected = model.predict_proba(texts)
+    actual = compact_model.predict_proba(texts)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    
+    assert list(model.classes_) == list(compact_model.classes_), "Class order differs"
+    assert max_diff <= atol, f"predict_proba differs by {max_diff:.3e}"
+    assert (expected.argmax(axis=1) == actual.argmax(axis=1)).all(), "Predicted labels differ"
+    return max_diff
+
+def model_stages(model):
+    """
+    predict_proba split into (vectorize, classify), so both halves can be timed
+    Works for sklearn pipelines and models with featurize()/predict_proba_features();
+    anything else is classified in one step.
+    """
+    if hasattr(model, 'steps'):
+        transforms = [step for _, step in model.steps[:-1]]
+        
+        def vectorize(texts):
+            for step in transforms:
+                texts = step.transform(texts)
+            return texts
+        
+        return vectorize, model.steps[-1][1].predict_proba
+    if hasattr(model, 'featurize'):
+        return model.featurize, model.predict_proba_features
+    return (lambda texts: texts), model.predict_proba
+
+def predict_intents(model, texts, top_k=3, timer=None, fast_path=None):
+    """
+    Predict intents for a batch of texts in a single predict_proba pass
+    
+    Items may be raw strings or MessageAnalysis objects (already
+    normalized, so preprocessing is not repeated).
+    The whole list is featurized once and the label is taken from the
+    argmax over model.classes_, so predict() is never run separately.
+    With a StageTimer (metrics.py) the intent.normalize, intent.vectorize
+    and intent.classify stages (and intent.fast_path) are lapped on it.
+    With a FastPathIndex (fast_path.py) texts it knows are answered from
+    it and only the rest reach the model (a hit lists at most
+    STORED_TOP_K top_intents).
+    Returns one dict per text with: intent, confidence, top_intents
+    Raises ValueError unless top_k is an int of at least 1
+    """
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+        raise ValueError(f"top_k must be a positive integer, got {top_k!r}")
+    if not texts:
+        return []
+    
+    processed_texts = [preprocess_text(text) for text in texts]
+    if timer is not None:
+        timer.lap('intent.normalize')
+    if fast_path is None:
+        return _classify(model, processed_texts, top_k, timer)
+    
+    results, pending = [], []
+    for i, text in enumerate(processed_texts):
+        hit = fast_path.lookup(text)
+        if hit is None:
+            pending.append(i)
+        else:
+            # Copied: index entries are shared by every caller
+            hit = {**hit, 'top_intents': hit['top_intents'][:top_k]}
+        results.append(hit)
+    if timer is not None:
+        timer.lap('intent.fast_path')
+    if pending:
+        start = time.perf_counter()
+        classified = _classify(model, [processed_texts[i] for i in pending], top_k, timer)
+        fast_path.record_misses(len(pending), time.perf_counter() - start)
+        for i, result in zip(pending, classified):
+            results[i] = result
+    return results
+
+def _classify(model, processed_texts, top_k, timer):
+    """Model part of predict_intents, for preprocessed texts"""
+    if timer is None:
+        probabilities = model.predict_proba(processed_texts)
+    else:
+        vectorize, classify = model_stages(model)
+        features = vectorize(processed_texts)
+        timer.lap('intent.vectorize')
+        probabilities = classify(features)
+    classes = model.classes_
+    
+    results = []
+    for row in probabilities:
+        # Stable sort keeps argmax tie-breaking identical to model.predict()
+        ranked = np.argsort(-row, kind='stable')[:top_k]
+        best = ranked[0]
+        results.append({
+            'intent': str(classes[best]),
+            'confidence': float(row[best]),
+            'top_intents': [
+                {'intent': str(classes[i]), 'confidence': float(row[i])}
+                for i in ranked
+            ]
+        })
+    if timer is not None:
+        timer.lap('intent.classify')
+    
+    return results
+
+def predict_intent(model, text, timer=None, fast_path=None):
     """Predict intent for given text"""
-    processed_text = preprocess_text(text)
-    intent = model.predict([processed_text])[0]
-    probabilities = model.predict_proba([processed_text])[0]
-    confidence = max(probabilities)
+    result = predict_intents(model, [text], top_k=1, timer=timer, fast_path=fast_path)[0]
     
     return {
-        'intent': intent,
-        'confidence': float(confidence)
+        'intent': result['intent'],
+        'confidence': result['confidence']
     }
 
 if __name__ == '__main__':
     import os
     import sys
     
+    # Export the saved models to the compact serving format
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        for model_type in sys.argv[2:] or COMPACT_MODEL_TYPES:
+            model = load_model(model_type)
+            export_dir = export_compact_model(model)
+            compact_model = load_compact_model(export_dir)
+            max_diff = verify_compact_model(model, compact_model)
+            print(f"Compact {model_type} model written to {export_dir}")
+            print(f"Parity check passed (max predict_proba difference: {max_diff:.2e})")
+        sys.exit(0)
+    
     # Parse command line arguments
     model_type = 'logistic'  # Default model
     if len(sys.argv) > 1 and sys.argv[1] in ['logistic', 'decision_tree', 'knn']:
         model_type = sys.argv[1]
         sys.argv.pop(1)  # Remove model type from args
     
+    # Machine-readable output for API callers
+    json_output = '--json' in sys.argv
+    if json_output:
+        sys.argv.remove('--json')
+    
     # Get script directory
     script_dir = Path(__file__).parent
     model_filename = f'intent_model_{model_type}.pkl'
@@ -174,18 +413,27 @@ if __name__ == '__main__':
     
     # Check if model exists
     if not os.path.exists(model_path):
-        print(f"Training new {model_type} model...")
+        print(f"Training new {model_type} model...", file=sys.stderr if json_output else sys.stdout)
         model = train_model(model_type)
         save_model(model, model_type, model_path)
-        print(f"Model saved to {model_path}")
+        print(f"Model saved to {model_path}", file=sys.stderr if json_output else sys.stdout)
     else:
-        print(f"Loading existing {model_type} model...")
+        if not json_output:
+            print(f"Loading existing {model_type} model...")
         model = load_model(model_type, model_path)
     
     # If text provided as argument, classify it
     if len(sys.argv) > 1:
         text = ' '.join(sys.argv[1:])
         result = predict_intent(model, text)
+        if json_output:
+            print(json.dumps({
+                'model': model_type,
+                'text': text,
+                'intent': str(result['intent']),
+                'confidence': result['confidence']
+            }, ensure_ascii=False))
+            sys.exit(0)
         print(f"Model: {model_type}")
         print(f"Text: {text}")
         print(f"Intent: {result['intent']}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KNN search - batched sparse cosine top-k over a CSR training matrix
+
+PostingsIndex keeps the training matrix a second time in column order
+(postings: feature -> training rows and values, i.e. CSC). The dot
+products of the query rows with the training matrix are a sparse product:
+the postings of every query term are gathered, multiplied by the query
+value and summed per training row. Only training rows sharing a term with
+the query are touched, so the cost follows the length of the postings
+read rather than the size of the corpus.
+
+HyperplaneLSH is an optional approximate index for large corpora: every
+training row gets n_tables signatures of n_bits random-hyperplane signs
+(SimHash). A query only re-ranks the rows sharing a bucket with it in at
+least one table.
+
+Both return candidates as (query_ptr, rows, similarities) in CSR layout;
+CompactKNNModel (compact_model.py) turns them into distances and picks
+the nearest of a whole batch with one argpartition along the rows of a
+(queries x candidates) matrix.
+"""
+
+import numpy as np
+
+# A batch reading at least n_queries * n_train / DENSE_ACCUMULATE_RATIO postings sums
+# them with one bincount over every (query, training row) pair; fewer are grouped by sorting
+DENSE_ACCUMULATE_RATIO = 1
+# Training non-zeros projected at a time while hashing the corpus
+LSH_CHUNK_NNZ = 1 << 16
+
+
+def gather_spans(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Indices of the concatenated ranges [start, start + length)"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(total, dtype=np.int64) + np.repeat(starts - offsets, lengths)
+
+
+def csr_to_postings(data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, n_features: int):
+    """(postings_data, postings_rows, postings_indptr): the CSR matrix in column order, rows ascending"""
+    order = np.argsort(indices, kind='stable')
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    postings_indptr = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_features), out=postings_indptr[1:])
+    return np.asarray(data)[order], rows[order], postings_indptr
+
+
+class PostingsIndex:
+    """Exact candidates: every training row sharing at least one term with the query"""
+
+    def __init__(self, postings_data: np.ndarray, postings_rows: np.ndarray, postings_indptr: np.ndarray,
+                 n_train: int):
+        self.data = postings_data
+        self.rows = postings_rows
+        self.indptr = postings_indptr
+        self.n_train = n_train
+
+    def candidates(self, features):
+        """(query_ptr, rows, similarities): dot products of each query with the rows it shares terms with"""
+        data, indices, indptr = features
+        n_queries = len(indptr) - 1
+        starts = self.indptr[indices]
+        lengths = self.indptr[indices + 1] - starts
+        gather = gather_spans(starts, lengths)
+        # One key per (query, training row) product, for the whole batch at once
+        term_queries = np.repeat(np.arange(n_queries, dtype=np.int64), np.diff(indptr))
+        keys = np.repeat(term_queries, lengths) * self.n_train + self.rows[gather]
+        # Same operand order as the full scan (query value x training value)
+        products = np.repeat(data, lengths) * self.data[gather]
+        # Both sum each (query, row) pair's products in query term order
+        if len(keys) * DENSE_ACCUMULATE_RATIO >= n_queries * self.n_train:
+            sums = np.bincount(keys, weights=products, minlength=n_queries * self.n_train)
+            keys = np.flatnonzero(sums)
+            similarities = sums[keys]
+        elif len(keys):
+            order = np.argsort(keys, kind='stable')
+            keys, products = keys[order], products[order]
+            first = np.concatenate(([True], keys[1:] != keys[:-1]))
+            # bincount adds each pair's products one after another, like the dense path
+            similarities = np.bincount(np.cumsum(first) - 1, weights=products)
+            keys = keys[first]
+        else:
+            similarities = products
+        query_ptr = np.searchsorted(keys, np.arange(n_queries + 1, dtype=np.int64) * self.n_train)
+        return query_ptr.astype(np.int64), keys % self.n_train, similarities
+
+
+class HyperplaneLSH:
+    """
+    Approximate candidates from random-hyperplane signatures
+
+    Two rows at angle θ share a signature of one table with probability
+    (1 - θ/π)^n_bits; more tables raise the recall, more bits shrink the
+    buckets. Rows without any known term are never candidates (they are at
+    distance 1 from everything).
+    """
+
+    def __init__(self, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, n_features: int,
+                 n_bits: int = 16, n_tables: int = 16, seed: int = 0):
+        if not 1 <= n_bits <= 62:
+            raise ValueError("n_bits must be between 1 and 62")
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self.train_data, self.train_indices, self.train_indptr = data, indices, indptr
+        self.n_features = n_features
+        # ±1 hyperplane components (int8 keeps the matrix at one byte per feature and bit)
+        rng = np.random.default_rng(seed)
+        self.planes = rng.integers(0, 2, size=(n_features, n_tables * n_bits), dtype=np.int8) * 2 - 1
+        self._weights = np.int64(1) << np.arange(n_bits, dtype=np.int64)
+
+        signatures = np.zeros((len(indptr) - 1, n_tables), dtype=np.int64)
+        nonempty = np.flatnonzero(np.diff(indptr) > 0)
+        # Rows are hashed in chunks of about LSH_CHUNK_NNZ non-zeros
+        bounds = np.searchsorted(indptr[nonempty], np.arange(0, indptr[-1], LSH_CHUNK_NNZ))
+        bounds = np.unique(np.concatenate((bounds, [len(nonempty)])))
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            chunk = nonempty[first:last]
+            lo, hi = indptr[chunk[0]], indptr[chunk[-1] + 1]
+            projected = np.asarray(data[lo:hi], dtype=np.float32)[:, np.newaxis] * self.planes[indices[lo:hi]]
+            sums = np.add.reduceat(projected, indptr[chunk] - lo, axis=0)
+            signatures[chunk] = self._signatures(sums)
+
+        # Per table: row ids sorted by signature, so a bucket is one searchsorted range
+        self.tables = []
+        for table in range(n_tables):
+            rows = nonempty[np.argsort(signatures[nonempty, table], kind='stable')]
+            self.tables.append((signatures[rows, table], rows.astype(np.int64)))
+
+    def _signatures(self, projections: np.ndarray) -> np.ndarray:
+        bits = (projections > 0).reshape(len(projections), self.n_tables, self.n_bits)
+        return bits.astype(np.int64) @ self._weights
+
+    def candidates(self, features):
+        """(query_ptr, rows, similarities) for the rows sharing a bucket with each query"""
+        data, indices, indptr = features
+        n_queries = len(indptr) - 1
+        projected = np.asarray(data, dtype=np.float32)[:, np.newaxis] * self.planes[indices]
+        sums = np.zeros((n_queries, self.n_tables * self.n_bits), dtype=np.float32)
+        nonempty = np.flatnonzero(np.diff(indptr) > 0)
+        if len(nonempty):
+            sums[nonempty] = np.add.reduceat(projected, indptr[nonempty], axis=0)
+        signatures = self._signatures(sums)
+
+        query_ptr = [0]
+        all_rows, all_similarities = [], []
+        query = np.zeros(self.n_features)
+        for q in range(n_queries):
+            if indptr[q] == indptr[q + 1]:
+                query_ptr.append(query_ptr[-1])
+                continue
+            buckets = []
+            for (keys, rows), signature in zip(self.tables, signatures[q]):
+                lo, hi = np.searchsorted(keys, signature), np.searchsorted(keys, signature, side='right')
+                buckets.append(rows[lo:hi])
+            rows = np.unique(np.concatenate(buckets))
+            # Exact dot products of the candidates, through the CSR rows
+            span = slice(indptr[q], indptr[q + 1])
+            query[indices[span]] = data[span]
+            starts = self.train_indptr[rows]
+            lengths = self.train_indptr[rows + 1] - starts
+            gather = gather_spans(starts, lengths)
+            products = query[self.train_indices[gather]] * self.train_data[gather]
+            query[indices[span]] = 0.0
+            similarities = np.add.reduceat(products, np.cumsum(lengths) - lengths) if len(rows) else np.zeros(0)
+            # Rows sharing a bucket but no term have similarity 0, like rows outside every bucket
+            keep = similarities > 0
+            all_rows.append(rows[keep])
+            all_similarities.append(similarities[keep])
+            query_ptr.append(query_ptr[-1] + int(keep.sum()))
+
+        if not all_rows:
+            return np.asarray(query_ptr, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return (np.asarray(query_ptr, dtype=np.int64), np.concatenate(all_rows),
+                np.concatenate(all_similarities))
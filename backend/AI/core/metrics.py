@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metrics - fixed-bucket histograms for the serving layers
+
+Exported as JSON (stats action) or in the Prometheus text format.
+StageTimer and StageHistograms break a request down into named stages.
+"""
+
+import bisect
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Sequence
+
+# Upper bounds, in milliseconds, suitable for per-request latencies
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Finer bounds for single pipeline stages, most of which take microseconds
+STAGE_BUCKETS_MS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 100)
+
+
+class Histogram:
+    """Thread-safe histogram with fixed upper bounds (plus an implicit +Inf bucket)"""
+
+    def __init__(self, buckets: Sequence[float], unit: str = '', lock=None):
+        """lock: shared with other histograms so several can be updated under one acquisition"""
+        self.bounds = sorted(float(b) for b in buckets)
+        self.unit = unit
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = lock or threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile: upper bound of the bucket holding it (0.0 when empty)"""
+        with self._lock:
+            return self._quantile_locked(q)
+
+    def _quantile_locked(self, q: float) -> float:
+        if self._count == 0:
+            return 0.0
+        rank = q * self._count
+        seen = 0
+        for bound, count in zip(self.bounds, self._counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative bucket counts plus count, sum, mean and p50/p90/p99 estimates"""
+        with self._lock:
+            cumulative = []
+            seen = 0
+            for bound, count in zip(self.bounds, self._counts):
+                seen += count
+                cumulative.append({'le': bound, 'count': seen})
+            cumulative.append({'le': '+Inf', 'count': self._count})
+            return {
+                'unit': self.unit,
+                'count': self._count,
+                'sum': self._sum,
+                'mean': self._sum / self._count if self._count else 0.0,
+                'p50': self._quantile_locked(0.5),
+                'p90': self._quantile_locked(0.9),
+                'p99': self._quantile_locked(0.99),
+                'buckets': cumulative
+            }
+
+    def to_prometheus(self, name: str, help_text: str = '') -> str:
+        """Prometheus text exposition of this histogram"""
+        return '\n'.join(prometheus_header(name, help_text) + self.prometheus_samples(name)) + '\n'
+
+    def prometheus_samples(self, name: str, labels: str = '') -> List[str]:
+        """Bucket, sum and count lines; labels (e.g. 'stage="vectorize"') are added to each"""
+        snapshot = self.snapshot()
+        prefix = f"{labels}," if labels else ''
+        suffix = f"{{{labels}}}" if labels else ''
+        lines = [f'{name}_bucket{{{prefix}le="{bucket["le"]}"}} {bucket["count"]}'
+                 for bucket in snapshot['buckets']]
+        lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+        lines.append(f"{name}_count{suffix} {snapshot['count']}")
+        return lines
+
+
+def prometheus_header(name: str, help_text: str = '') -> List[str]:
+    lines = [f"# HELP {name} {help_text}"] if help_text else []
+    return lines + [f"# TYPE {name} histogram"]
+
+
+class StageTimer:
+    """
+    Wall-clock milliseconds per stage of one request
+    lap(stage) charges the time since the previous lap (or since creation)
+    to stage; a stage lapped several times accumulates. Laps only store a
+    timestamp, durations are worked out when timings is read.
+    """
+
+    __slots__ = ('marks',)
+
+    def __init__(self):
+        self.marks = [('', perf_counter())]
+
+    def lap(self, stage: str):
+        self.marks.append((stage, perf_counter()))
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        timings = {}
+        previous = self.marks[0][1]
+        for stage, at in self.marks[1:]:
+            timings[stage] = timings.get(stage, 0.0) + (at - previous) * 1000
+            previous = at
+        return timings
+
+
+class StageHistograms:
+    """One latency histogram (ms) per stage name, created on first use"""
+
+    def __init__(self, buckets: Sequence[float] = STAGE_BUCKETS_MS):
+        self.bounds = sorted(float(b) for b in buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        # One lock for all stages: a request's timings are recorded in a single acquisition
+        self._lock = threading.Lock()
+
+    def observe(self, timings: Dict[str, float]):
+        bounds = self.bounds
+        with self._lock:
+            for stage, ms in timings.items():
+                histogram = self._histograms.get(stage)
+                if histogram is None:
+                    histogram = self._histograms[stage] = Histogram(bounds, unit='ms', lock=self._lock)
+                histogram._counts[bisect.bisect_left(bounds, ms)] += 1
+                histogram._sum += ms
+                histogram._count += 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {stage: histogram.snapshot() for stage, histogram in list(self._histograms.items())}
+
+    def to_prometheus(self, name: str, help_text: str = '') -> str:
+        """One histogram family, labelled by stage"""
+        lines = prometheus_header(name, help_text)
+        for stage, histogram in list(self._histograms.items()):
+            lines.extend(histogram.prometheus_samples(name, f'stage="{stage}"'))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Model Registry - content-hashed model versions with an atomic manifest
+
+Layout under models/registry/ (or $AGYRUS_MODEL_REGISTRY):
+
+    manifest.json                   - active version and history per model type
+    <model_type>/<version>/
+        model.pkl                   - the fitted model
+        compact/                    - compact export (logistic and knn, served without sklearn)
+        meta.json                   - written last; a version without it is incomplete
+
+A version is the SHA-256 prefix of its model.pkl bytes: the id names
+exactly one artifact and republishing identical bytes is a no-op. (Two
+fits on the same data still differ, since sklearn pickles contain
+hash-seed dependent details, so every training run gets its own version.)
+
+Versions are built in a temporary directory and renamed into place; the
+manifest is replaced with os.replace under a file lock. Readers therefore
+see either the old or the new state, never a partial one. Promotion and
+rollback only rewrite the manifest.
+
+Running processes use ModelWatcher: one stat() of the manifest per poll
+(mtime, size, inode), and only when it changed is the manifest read. A new active
+version is loaded and warmed up in the background while the old model
+keeps serving, then handed over in one assignment. ModelGroupWatcher does
+the same for several types at once (the members of an ensemble).
+
+Usage:
+    python3 model_registry.py list [model_type]
+    python3 model_registry.py publish <model_type> <model.pkl> [--promote]
+    python3 model_registry.py promote <model_type> <version>
+    python3 model_registry.py rollback <model_type>
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import pickle
+import shutil
+import hashlib
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from intent_classifier import COMPACT_MODEL_TYPES, export_compact_model, predict_intents
+from compact_model import load_compact_model
+
+DEFAULT_REGISTRY_DIR = Path(os.environ.get(
+    'AGYRUS_MODEL_REGISTRY', (Path(__file__).parent / '..' / 'models' / 'registry').resolve()))
+
+# Hex digits of the SHA-256 used as version id
+VERSION_LENGTH = 16
+# Previously active versions remembered per model type (rollback depth)
+HISTORY_SIZE = 20
+# Seconds between manifest checks of a ModelWatcher
+MODEL_POLL_SECONDS = 2.0
+# Predictions run on a freshly loaded model before it starts serving
+WARMUP_TEXTS = ['hello', 'find a math tutor', 'show my bookings', 'cancel my booking on friday']
+
+
+class ModelRegistry:
+    """Publishes, promotes and loads versioned models"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or DEFAULT_REGISTRY_DIR)
+        self.manifest_path = self.root / 'manifest.json'
+
+    def version_dir(self, model_type: str, version: str) -> Path:
+        return self.root / model_type / version
+
+    def read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'models': {}}
+
+    def active_version(self, model_type: str) -> Optional[str]:
+        return self.read_manifest()['models'].get(model_type, {}).get('active')
+
+    def versions(self, model_type: str) -> List[Dict[str, Any]]:
+        """Metadata of every complete version of a model type, oldest first"""
+        found = []
+        for meta_path in (self.root / model_type).glob('*/meta.json'):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                found.append(json.load(f))
+        return sorted(found, key=lambda meta: meta['created_at'])
+
+    def publish(self, model, model_type: str, meta: Optional[Dict[str, Any]] = None) -> str:
+        """Store a fitted model as a new version (not activated); returns the version id"""
+        type_dir = self.root / model_type
+        type_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix='.publish.', dir=type_dir))
+        try:
+            data = pickle.dumps(model)
+            with open(tmp_dir / 'model.pkl', 'wb') as f:
+                f.write(data)
+            digest = hashlib.sha256(data).hexdigest()
+            version = digest[:VERSION_LENGTH]
+
+            target = type_dir / version
+            if (target / 'meta.json').exists():
+                return version
+            if model_type in COMPACT_MODEL_TYPES:
+                export_compact_model(model, tmp_dir / 'compact')
+            with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+                json.dump({
+                    'model_type': model_type,
+                    'version': version,
+                    'sha256': digest,
+                    'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    **(meta or {})
+                }, f, indent=2)
+            os.chmod(tmp_dir, 0o755)
+            # Leftover of an interrupted publish (no meta.json) is replaced
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(tmp_dir, target)
+            return version
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def promote(self, model_type: str, version: str):
+        """Make a published version the active one"""
+        if not (self.version_dir(model_type, version) / 'meta.json').exists():
+            raise ValueError(f"Unknown {model_type} version: {version}")
+
+        def change(entry):
+            if entry.get('active') == version:
+                return
+            if entry.get('active'):
+                entry['history'] = (entry.get('history', []) + [entry['active']])[-HISTORY_SIZE:]
+            entry['active'] = version
+
+        self._update(model_type, change)
+
+    def rollback(self, model_type: str) -> str:
+        """Re-activate the previously active version; returns it"""
+        def change(entry):
+            history = entry.get('history', [])
+            if not history:
+                raise ValueError(f"No previous {model_type} version to roll back to")
+            entry['active'] = history.pop()
+
+        return self._update(model_type, change)['active']
+
+    def _update(self, model_type: str, change: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Read-modify-write of the manifest, serialized across processes"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.manifest.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self.read_manifest()
+            entry = manifest['models'].setdefault(model_type, {})
+            change(entry)
+            entry['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+            tmp_path = self.manifest_path.with_name(f".manifest.json.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+            return entry
+
+    def load(self, model_type: str, version: str):
+        """Load one version, preferring the sklearn-free compact export"""
+        path = self.version_dir(model_type, version)
+        if (path / 'compact' / 'config.json').exists():
+            return load_compact_model(path / 'compact')
+        with open(path / 'model.pkl', 'rb') as f:
+            return pickle.load(f)
+
+    def load_active(self, model_type: str) -> Optional[Tuple[Any, str]]:
+        """(model, version) of the active version, or None when nothing is promoted"""
+        version = self.active_version(model_type)
+        if version is None:
+            return None
+        return self.load(model_type, version), version
+
+
+def warm_up_model(model):
+    """Run a few predictions so lazy state is built before the model serves"""
+    predict_intents(model, WARMUP_TEXTS)
+
+
+class ModelWatcher:
+    """
+    Follows the active version of one model type in the registry
+
+    check() is cheap when nothing changed (one stat). When another version
+    becomes active it is loaded and warmed up, then passed to on_swap;
+    until then the caller keeps serving its current model.
+    """
+
+    def __init__(self, registry: ModelRegistry, model_type: str,
+                 current_version: Callable[[], Optional[str]],
+                 on_swap: Callable[[Any, str], None], interval: float = MODEL_POLL_SECONDS):
+        """
+        Args:
+            current_version: Returns the version being served (None: not from the registry)
+            on_swap: Called with (model, version) once the new model is warm
+        """
+        self.registry = registry
+        self.model_type = model_type
+        self.current_version = current_version
+        self.on_swap = on_swap
+        self.interval = interval
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            stat = self.registry.manifest_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def check(self) -> bool:
+        """Swap in a newly activated version; returns True when a swap happened"""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+
+        version = self.registry.active_version(self.model_type)
+        if version is None or version == self.current_version():
+            return False
+        model = self.registry.load(self.model_type, version)
+        warm_up_model(model)
+        self.on_swap(model, version)
+        return True
+
+    def start(self) -> 'ModelWatcher':
+        """Poll in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the current model; retry on the next manifest change
+                print(f"Model reload failed: {e}", file=sys.stderr)
+
+
+class ModelGroupWatcher:
+    """
+    ModelWatcher for several model types at once (e.g. the members of an
+    ensemble), with the same check/start/stop interface
+    """
+
+    def __init__(self, watchers: List[ModelWatcher], interval: float = MODEL_POLL_SECONDS):
+        self.watchers = list(watchers)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self) -> bool:
+        """Swap in newly activated versions of every type; returns True when any swap happened"""
+        swapped = [watcher.check() for watcher in self.watchers]
+        return any(swapped)
+
+    def start(self) -> 'ModelGroupWatcher':
+        """Poll in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for watcher in self.watchers:
+                try:
+                    watcher.check()
+                except Exception as e:
+                    # Keep serving the current model; retry on the next manifest change
+                    print(f"Model reload failed ({watcher.model_type}): {e}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage versioned intent models')
+    parser.add_argument('--registry', default=None, help='registry directory (default: models/registry)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_parser = commands.add_parser('list', help='show versions and the active one')
+    list_parser.add_argument('model_type', nargs='?')
+    publish_parser = commands.add_parser('publish', help='add a pickled model as a new version')
+    publish_parser.add_argument('model_type')
+    publish_parser.add_argument('path')
+    publish_parser.add_argument('--promote', action='store_true', help='also make it active')
+    promote_parser = commands.add_parser('promote', help='activate a version')
+    promote_parser.add_argument('model_type')
+    promote_parser.add_argument('version')
+    rollback_parser = commands.add_parser('rollback', help='re-activate the previous version')
+    rollback_parser.add_argument('model_type')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == 'list':
+            manifest = registry.read_manifest()['models']
+            model_types = [args.model_type] if args.model_type else sorted(
+                path.name for path in registry.root.glob('*') if path.is_dir())
+            for model_type in model_types:
+                active = manifest.get(model_type, {}).get('active')
+                print(model_type)
+                for meta in registry.versions(model_type):
+                    marker = '*' if meta['version'] == active else ' '
+                    print(f"  {marker} {meta['version']}  {meta['created_at']}")
+        elif args.command == 'publish':
+            with open(args.path, 'rb') as f:
+                version = registry.publish(pickle.load(f), args.model_type, {'source': str(args.path)})
+            if args.promote:
+                registry.promote(args.model_type, version)
+            print(version)
+        elif args.command == 'promote':
+            registry.promote(args.model_type, args.version)
+            print(f"{args.model_type}: {args.version} active")
+        else:
+            print(f"{args.model_type}: {registry.rollback(args.model_type)} active")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -6,21 +6,31 @@ NLP utilities for date/time parsing and text processing
 
 import re
 import json
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from difflib import get_close_matches
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from collections import Counter
+from typing import Callable, Optional, Dict, Any, List, Set, Tuple
 from pathlib import Path
 
 
 class DateTimeParser:
-    """Parse natural language dates and times"""
+    """
+    Parse natural language dates and times
+    
+    The message is lowercased and tokenized once; the date and time regexes
+    (compiled once, with word boundaries, so "sat" inside "satisfied" no
+    longer counts as Saturday) are only tried, anchored, at tokens that can
+    start a date or time expression. The clock is injectable (a callable returning a
+    datetime) so results are reproducible and can be cached per day.
+    """
     
     # Days of week mapping
     WEEKDAYS = {
         'monday': 0, 'mon': 0,
-        'tuesday': 1, 'tue': 1,
+        'tuesday': 1, 'tue': 1, 'tues': 1,
         'wednesday': 2, 'wed': 2,
-        'thursday': 3, 'thu': 3,
+        'thursday': 3, 'thu': 3, 'thurs': 3,
         'friday': 4, 'fri': 4,
         'saturday': 5, 'sat': 5,
         'sunday': 6, 'sun': 6
@@ -34,109 +44,390 @@ class DateTimeParser:
         'day after tomorrow': 2
     }
     
+    MONTHS = {
+        'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+        'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7,
+        'august': 8, 'aug': 8, 'september': 9, 'sep': 9, 'sept': 9,
+        'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+    }
+    
+    NUMBER_WORDS = {
+        'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+        'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10
+    }
+    
+    # Morning/afternoon/evening keywords
+    TIME_KEYWORDS = {
+        'morning': '09:00',
+        'noon': '12:00',
+        'afternoon': '14:00',
+        'evening': '18:00',
+        'tonight': '20:00',
+        'night': '20:00'
+    }
+    
+    # Lower value wins when several expressions are present
+    DATE_PRIORITY = {kind: rank for rank, kind in enumerate(
+        ('iso', 'dmy', 'month_day', 'day_month', 'in_n', 'relative', 'weekday', 'next_week'))}
+    TIME_PRIORITY = {kind: rank for rank, kind in enumerate(('range', 'clock', 'hour', 'keyword'))}
+    
+    _TOKEN_PATTERN = re.compile(r'[a-z]+|\d+')
+    
     @staticmethod
-    def parse_date(text: str) -> Optional[str]:
+    def _alternation(words) -> str:
+        return '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    
+    @classmethod
+    def _compile(cls):
+        months = cls._alternation(cls.MONTHS)
+        weekdays = cls._alternation(cls.WEEKDAYS)
+        relative = cls._alternation(cls.RELATIVE_DATES).replace(r'\ ', r'\s+')
+        numbers = cls._alternation(cls.NUMBER_WORDS)
+        
+        # Tokens at which a date / time expression can start (digits always can)
+        cls._date_triggers = frozenset(cls.MONTHS) | frozenset(cls.WEEKDAYS) | frozenset(
+            phrase.split()[0] for phrase in cls.RELATIVE_DATES) | {'in', 'next', 'this', 'on'}
+        cls._time_triggers = frozenset(cls.TIME_KEYWORDS) | {'at', 'between', 'from'}
+        
+        cls._date_pattern = re.compile(
+            r'\b(?:'
+            r'(?P<iso>(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2}))'
+            r'|(?P<dmy>(?P<dmy_d>\d{1,2})[./](?P<dmy_m>\d{1,2})[./](?P<dmy_y>\d{4}))'
+            rf'|(?P<month_day>(?P<md_month>{months})\.?\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<md_year>\d{{4}}))?)'
+            rf'|(?P<day_month>(?P<dm_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_month>{months})(?:,?\s+(?P<dm_year>\d{{4}}))?)'
+            rf'|(?P<in_n>in\s+(?P<in_count>\d{{1,3}}|{numbers})\s+(?P<in_unit>days?|weeks?))'
+            rf'|(?P<relative>{relative})'
+            rf'|(?P<weekday>(?:(?P<wd_mod>next|this|on)\s+)?(?P<wd_name>{weekdays}))'
+            r'|(?P<next_week>next\s+week)'
+            r')\b'
+        )
+        
+        hour = r'\d{1,2}(?:[:.]\d{2})?'
+        meridiem = r'[ap]\.?m\.?'
+        keywords = cls._alternation(cls.TIME_KEYWORDS)
+        cls._time_pattern = re.compile(
+            r'\b(?:'
+            rf'(?P<range>(?:between|from)\s+(?P<r_start>{hour})\s*(?P<r_start_mer>{meridiem})?'
+            rf'\s+(?:and|to|-)\s+(?P<r_end>{hour})\s*(?P<r_end_mer>{meridiem})?)'
+            rf'|(?P<clock>(?P<c_hour>\d{{1,2}})[:.](?P<c_min>\d{{2}})(?!\d|[./]\d)\s*(?P<c_mer>{meridiem})?)'
+            rf'|(?P<hour>(?:at\s+(?P<h_at>\d{{1,2}})(?!\d|[:./]\d)\s*(?P<h_at_mer>{meridiem})?)'
+            rf'|(?P<h_num>\d{{1,2}})\s*(?P<h_mer>{meridiem}))'
+            rf'|(?P<keyword>{keywords})'
+            r')(?!\w)'
+        )
+    
+    def __init__(self, clock: Optional[Callable[[], datetime]] = None):
+        self.clock = clock or datetime.now
+        if not hasattr(DateTimeParser, '_date_pattern'):
+            DateTimeParser._compile()
+    
+    def today(self) -> date:
+        """Current date according to the parser's clock"""
+        return self.clock().date()
+    
+    def parse(self, text: str) -> Dict[str, Optional[str]]:
+        """
+        Parse date and time in one pass
+        Returns dict with: date (YYYY-MM-DD), time (HH:MM), time_end (HH:MM, ranges only)
+        """
+        return self.parse_lowered(text.lower())
+    
+    def parse_lowered(self, text: str) -> Dict[str, Optional[str]]:
+        """parse() for text that is already lowercased (e.g. MessageAnalysis.lower)"""
+        tokens = self._tokenize(text)
+        date_value, date_span = self._parse_date(text, tokens)
+        start_time, end_time = self._parse_time(text, tokens, date_span)
+        return {'date': date_value, 'time': start_time, 'time_end': end_time}
+    
+    def parse_date(self, text: str) -> Optional[str]:
         """
         Parse date from natural language text
         Returns date in YYYY-MM-DD format or None
         """
-        text_lower = text.lower()
-        today = datetime.now()
-        
-        # Check for explicit date format (YYYY-MM-DD, DD.MM.YYYY, DD/MM/YYYY)
-        date_patterns = [
-            r'(\d{4})-(\d{2})-(\d{2})',  # 2025-10-15
-            r'(\d{2})\.(\d{2})\.(\d{4})',  # 15.10.2025
-            r'(\d{2})/(\d{2})/(\d{4})',  # 15/10/2025
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
+        text = text.lower()
+        return self._parse_date(text, self._tokenize(text))[0]
+    
+    def parse_time(self, text: str) -> Optional[str]:
+        """
+        Parse time from natural language text
+        Returns time in HH:MM format (start of a range) or None
+        """
+        return self.parse(text)['time']
+    
+    def parsed_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of the date and time expressions parse() resolves"""
+        lowered = text.lower()
+        tokens = self._tokenize(lowered)
+        _, date_span = self._parse_date(lowered, tokens)
+        _, time_span = self._best_time(lowered, tokens, date_span)
+        return [span for span in (date_span, time_span) if span]
+    
+    def _tokenize(self, text: str):
+        """(token, start offset) pairs of lowercased text"""
+        return [(match.group(), match.start()) for match in self._TOKEN_PATTERN.finditer(text)]
+    
+    @staticmethod
+    def _scan(pattern, text: str, tokens, triggers):
+        """
+        Non-overlapping matches of pattern, tried only at trigger tokens
+        (equivalent to finditer, without testing every character position)
+        """
+        position = 0
+        for token, start in tokens:
+            if start < position or not (token in triggers or token.isdigit()):
+                continue
+            match = pattern.match(text, start)
             if match:
-                if '-' in pattern:
-                    year, month, day = match.groups()
-                else:
-                    day, month, year = match.groups()
-                try:
-                    date_obj = datetime(int(year), int(month), int(day))
-                    return date_obj.strftime('%Y-%m-%d')
-                except ValueError:
-                    continue
-        
-        # Check for relative dates
-        for keyword, delta in DateTimeParser.RELATIVE_DATES.items():
-            if keyword in text_lower:
-                target_date = today + timedelta(days=delta)
-                return target_date.strftime('%Y-%m-%d')
-        
-        # Check for weekdays
-        for day_name, day_num in DateTimeParser.WEEKDAYS.items():
-            if day_name in text_lower:
-                # Find next occurrence of this weekday
-                current_weekday = today.weekday()
-                days_ahead = day_num - current_weekday
-                if days_ahead <= 0:  # Target day already passed this week
-                    days_ahead += 7
-                target_date = today + timedelta(days=days_ahead)
-                return target_date.strftime('%Y-%m-%d')
-        
-        # Check for "next week", "this week"
-        if 'next week' in text_lower:
-            target_date = today + timedelta(days=7)
-            return target_date.strftime('%Y-%m-%d')
+                position = match.end()
+                yield match
+    
+    def _parse_date(self, text: str, tokens):
+        """
+        Best date match by priority in lowercased text
+        Returns (YYYY-MM-DD or None, span or None)
+        """
+        best = None
+        for match in self._scan(self._date_pattern, text, tokens, self._date_triggers):
+            value = self._resolve_date(match)
+            if value is None:
+                continue
+            rank = self.DATE_PRIORITY[match.lastgroup]
+            if best is None or rank < best[0]:
+                best = (rank, value, match.span())
+        if best is None:
+            return None, None
+        return best[1].strftime('%Y-%m-%d'), best[2]
+    
+    def _resolve_date(self, match) -> Optional[date]:
+        kind = match.lastgroup
+        today = self.today()
+        try:
+            if kind == 'iso':
+                return date(int(match['iso_y']), int(match['iso_m']), int(match['iso_d']))
+            if kind == 'dmy':
+                return date(int(match['dmy_y']), int(match['dmy_m']), int(match['dmy_d']))
+            if kind in ('month_day', 'day_month'):
+                prefix = 'md' if kind == 'month_day' else 'dm'
+                month = self.MONTHS[match[f'{prefix}_month']]
+                day = int(match[f'{prefix}_day'])
+                year = match[f'{prefix}_year']
+                if year:
+                    return date(int(year), month, day)
+                candidate = date(today.year, month, day)
+                # Without a year, assume the next occurrence of that date
+                return candidate if candidate >= today else date(today.year + 1, month, day)
+        except ValueError:
+            return None
         
+        if kind == 'in_n':
+            count = match['in_count']
+            count = int(count) if count.isdigit() else self.NUMBER_WORDS[count]
+            days = count * 7 if match['in_unit'].startswith('week') else count
+            return today + timedelta(days=days)
+        if kind == 'relative':
+            keyword = ' '.join(match['relative'].split())
+            return today + timedelta(days=self.RELATIVE_DATES[keyword])
+        if kind == 'weekday':
+            day_num = self.WEEKDAYS[match['wd_name']]
+            if match['wd_mod'] == 'next':
+                # "next friday" means friday of the following week
+                start_of_next_week = today + timedelta(days=7 - today.weekday())
+                return start_of_next_week + timedelta(days=day_num)
+            # Find next occurrence of this weekday
+            days_ahead = day_num - today.weekday()
+            if days_ahead <= 0:  # Target day already passed this week
+                days_ahead += 7
+            return today + timedelta(days=days_ahead)
+        if kind == 'next_week':
+            return today + timedelta(days=7)
         return None
     
-    @staticmethod
-    def parse_time(text: str) -> Optional[str]:
+    def _parse_time(self, text: str, tokens, skip_span=None):
         """
-        Parse time from natural language text
-        Returns time in HH:MM format or None
+        Best time match by priority in lowercased text, ignoring matches
+        inside skip_span (the date)
         """
-        text_lower = text.lower()
-        
-        # Pattern for HH:MM or HH.MM
-        time_pattern = r'(\d{1,2})[:.](\d{2})'
-        match = re.search(time_pattern, text)
-        if match:
-            hour, minute = match.groups()
-            hour = int(hour)
-            minute = int(minute)
-            if 0 <= hour < 24 and 0 <= minute < 60:
-                return f"{hour:02d}:{minute:02d}"
-        
-        # Pattern for "at 3", "at 3pm"
-        hour_pattern = r'(?:at)\s+(\d{1,2})'
-        match = re.search(hour_pattern, text_lower)
-        if match:
-            hour = int(match.group(1))
-            # Check for am/pm
-            if 'pm' in text_lower and hour < 12:
+        return self._best_time(text, tokens, skip_span)[0]
+    
+    def _best_time(self, text: str, tokens, skip_span=None):
+        """_parse_time() plus the span of the match: ((start, end), span or None)"""
+        best = None
+        for match in self._scan(self._time_pattern, text, tokens, self._time_triggers):
+            if skip_span and match.start() < skip_span[1] and match.end() > skip_span[0]:
+                continue
+            value = self._resolve_time(match)
+            if value is None:
+                continue
+            rank = self.TIME_PRIORITY[match.lastgroup]
+            if best is None or rank < best[0]:
+                best = (rank, value, match.span())
+        return (best[1], best[2]) if best else ((None, None), None)
+    
+    @staticmethod
+    def _to_24h(hour: int, meridiem: Optional[str]) -> int:
+        if meridiem:
+            meridiem = meridiem[0]
+            if meridiem == 'p' and hour < 12:
                 hour += 12
-            elif 'am' in text_lower and hour == 12:
+            elif meridiem == 'a' and hour == 12:
                 hour = 0
-            if 0 <= hour < 24:
-                return f"{hour:02d}:00"
-        
-        # Morning/afternoon/evening keywords
-        time_keywords = {
-            'morning': '09:00',
-            'afternoon': '14:00',
-            'evening': '18:00',
-            'night': '20:00'
-        }
-        
-        for keyword, time_val in time_keywords.items():
-            if keyword in text_lower:
-                return time_val
-        
+        return hour
+    
+    @staticmethod
+    def _split_clock(value: str):
+        hour, _, minute = value.replace('.', ':').partition(':')
+        return int(hour), int(minute or 0)
+    
+    @staticmethod
+    def _format_time(hour: int, minute: int) -> Optional[str]:
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            return f"{hour:02d}:{minute:02d}"
         return None
+    
+    def _resolve_time(self, match):
+        """Returns (start, end) HH:MM strings or None"""
+        kind = match.lastgroup
+        if kind == 'range':
+            start_hour, start_min = self._split_clock(match['r_start'])
+            end_hour, end_min = self._split_clock(match['r_end'])
+            end_mer = match['r_end_mer']
+            # "between 2 and 4pm": the end's am/pm carries over to the start
+            start_mer = match['r_start_mer'] or (end_mer if start_hour <= end_hour else None)
+            start = self._format_time(self._to_24h(start_hour, start_mer), start_min)
+            end = self._format_time(self._to_24h(end_hour, end_mer), end_min)
+            return (start, end) if start and end else None
+        if kind == 'clock':
+            hour = self._to_24h(int(match['c_hour']), match['c_mer'])
+            start = self._format_time(hour, int(match['c_min']))
+        elif kind == 'hour':
+            if match['h_at'] is not None:
+                hour = self._to_24h(int(match['h_at']), match['h_at_mer'])
+            else:
+                hour = self._to_24h(int(match['h_num']), match['h_mer'])
+            start = self._format_time(hour, 0)
+        else:
+            start = self.TIME_KEYWORDS[match['keyword']]
+        return (start, None) if start else None
+
+
+class SymSpellIndex:
+    """
+    Symmetric-delete spelling index (SymSpell-style)
+    
+    Every vocabulary word is indexed under all strings obtained by deleting
+    up to max_edit_distance characters. A misspelled token is looked up by
+    generating its own deletes, so candidates are found with a few dict
+    lookups instead of comparing against the whole vocabulary.
+    """
+    
+    def __init__(self, max_edit_distance: int = 2):
+        self.max_edit_distance = max_edit_distance
+        self.words = {}    # word -> frequency
+        self.deletes = {}  # delete variant -> list of words
+    
+    @staticmethod
+    def _edits(word: str, max_distance: int) -> Set[str]:
+        """All strings reachable from word with up to max_distance deletions"""
+        result = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for candidate in frontier:
+                if len(candidate) <= 1:
+                    continue
+                for i in range(len(candidate)):
+                    next_frontier.add(candidate[:i] + candidate[i + 1:])
+            next_frontier -= result
+            result |= next_frontier
+            frontier = next_frontier
+        return result
+    
+    def add_word(self, word: str, frequency: int = 1):
+        """Add a correctly spelled word to the index"""
+        if word in self.words:
+            self.words[word] += frequency
+            return
+        self.words[word] = frequency
+        for variant in self._edits(word, self.max_edit_distance):
+            self.deletes.setdefault(variant, []).append(word)
+    
+    def remove_word(self, word: str):
+        """Remove a word and its delete variants from the index"""
+        if self.words.pop(word, None) is None:
+            return
+        for variant in self._edits(word, self.max_edit_distance):
+            words = self.deletes.get(variant)
+            if words is None:
+                continue
+            if word in words:
+                words.remove(word)
+            if not words:
+                del self.deletes[variant]
+    
+    @staticmethod
+    def distance(a: str, b: str, max_distance: int) -> int:
+        """Optimal string alignment distance, or max_distance + 1 if larger"""
+        if abs(len(a) - len(b)) > max_distance:
+            return max_distance + 1
+        previous2 = None
+        previous = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                    current[j] = min(current[j], previous2[j - 2] + 1)
+            if min(current) > max_distance:
+                return max_distance + 1
+            previous2, previous = previous, current
+        return previous[-1]
+    
+    def lookup(self, token: str, max_distance: Optional[int] = None,
+               allowed=None) -> Optional[str]:
+        """
+        Return the closest vocabulary word within max_distance, or None
+        Ties are broken by higher frequency, then alphabetically.
+        If allowed is given (any container), only words in it are considered.
+        """
+        if max_distance is None:
+            max_distance = self.max_edit_distance
+        max_distance = min(max_distance, self.max_edit_distance)
+        if token in self.words and (allowed is None or token in allowed):
+            return token
+        
+        best = None
+        best_key = None
+        seen = set()
+        for variant in self._edits(token, max_distance):
+            for word in self.deletes.get(variant, ()):
+                if word in seen or (allowed is not None and word not in allowed):
+                    continue
+                seen.add(word)
+                dist = self.distance(token, word, max_distance)
+                if dist > max_distance:
+                    continue
+                key = (dist, -self.words[word], word)
+                if best_key is None or key < best_key:
+                    best, best_key = word, key
+        return best
 
 
 class TextNormalizer:
     """Normalize and clean text"""
     
     _typo_corrections = None
+    _spell_index = None
+    _english_words = None
+    _extra_words = {}   # source (e.g. 'tutors') -> set of words; see set_known_words
+    _token_cache = {}
+    
+    # Fuzzy correction on top of the exact typo dictionary (set False to disable)
+    fuzzy_correction = True
+    # Per-token correction cache size; cleared when full
+    TOKEN_CACHE_SIZE = 10000
+    # Punctuation around a token, kept while the word inside is corrected ("(maths)," -> "(math),")
+    _AFFIX_PATTERN = re.compile(r'(\W*)(.*?)(\W*)', re.DOTALL)
     
     @classmethod
     def _load_typo_corrections(cls):
@@ -153,29 +444,124 @@ class TextNormalizer:
                 cls._typo_corrections = {}
         return cls._typo_corrections
     
+    @classmethod
+    def _load_spell_index(cls) -> SymSpellIndex:
+        """Build the spelling index once from training vocabulary + typo targets"""
+        if cls._spell_index is None:
+            word_counts = Counter()
+            data_dir = (Path(__file__).parent / '..' / 'training_data').resolve()
+            for json_file in data_dir.glob('*.json'):
+                if json_file.name == 'typo_corrections.json':
+                    continue
+                try:
+                    with open(json_file, 'r', encoding='utf-8') as f:
+                        examples = json.load(f).get('examples', [])
+                except (OSError, json.JSONDecodeError):
+                    continue
+                for example in examples:
+                    word_counts.update(re.findall(r'[a-z]+', example.lower()))
+            
+            for target in cls._load_typo_corrections().values():
+                word_counts.update(re.findall(r'[a-z]+', target.lower()))
+            
+            index = SymSpellIndex(max_edit_distance=2)
+            for word, count in word_counts.items():
+                index.add_word(word, count)
+            cls._spell_index = index
+        return cls._spell_index
+    
+    @classmethod
+    def _load_english_words(cls) -> Set[str]:
+        """General English word list; these words are never corrected"""
+        if cls._english_words is None:
+            word_file = (Path(__file__).parent / '..' / 'training_data' / 'english_words.txt').resolve()
+            try:
+                with open(word_file, 'r', encoding='utf-8') as f:
+                    cls._english_words = {line.strip() for line in f if line.strip()}
+            except OSError:
+                cls._english_words = set()
+        return cls._english_words
+    
+    @classmethod
+    def is_known_word(cls, word: str) -> bool:
+        """Whether a lowercase token is a correctly spelled word (vocabulary, English, names)"""
+        return (word in cls._load_spell_index().words or word in cls._load_english_words()
+                or any(word in words for words in cls._extra_words.values()))
+    
+    @classmethod
+    def set_known_words(cls, source: str, texts: List[str]):
+        """
+        Replace the known words of one source (e.g. tutor or course names)
+        Every word of texts is kept as is instead of being corrected.
+        """
+        words = {word for text in texts for word in re.findall(r'[a-z]+', str(text).lower())}
+        if cls._extra_words.get(source) != words:
+            cls._extra_words = {**cls._extra_words, source: words}
+            cls._token_cache = {}
+
+    @classmethod
+    def correct_token(cls, word: str) -> str:
+        """Correct a single lowercase token (exact dictionary first, then fuzzy)"""
+        cached = cls._token_cache.get(word)
+        if cached is not None:
+            return cached
+        
+        typo_corrections = cls._load_typo_corrections()
+        if word in typo_corrections:
+            corrected = typo_corrections[word]
+        elif cls.fuzzy_correction and len(word) >= 4 and word.isalpha() and not cls.is_known_word(word):
+            # Short words are too ambiguous; allow 2 edits only for longer words
+            max_distance = 1 if len(word) <= 5 else 2
+            corrected = cls._load_spell_index().lookup(word, max_distance) or word
+        else:
+            corrected = word
+        
+        if len(cls._token_cache) >= cls.TOKEN_CACHE_SIZE:
+            cls._token_cache.clear()
+        cls._token_cache[word] = corrected
+        return corrected
+    
+    @classmethod
+    def correct_raw_token(cls, token: str) -> str:
+        """
+        Correct a token as written; capitalized tokens (likely names, "Walter")
+        only get the exact typo dictionary, never fuzzy correction
+        """
+        if token[:1].isalnum() and token[-1:].isalnum():
+            prefix, word, suffix = '', token.lower(), ''
+        else:
+            prefix, word, suffix = cls._AFFIX_PATTERN.fullmatch(token.lower()).groups()
+            if not word:
+                return token.lower()
+        if token[len(prefix):len(prefix) + 1].isupper():
+            return prefix + cls._load_typo_corrections().get(word, word) + suffix
+        return prefix + cls.correct_token(word) + suffix
+    
     @classmethod
     def fix_typos(cls, text: str) -> str:
         """Fix common typos in text"""
-        typo_corrections = cls._load_typo_corrections()
-        words = text.split()
         corrected_words = []
         
-        for word in words:
-            # Check for exact match in typo corrections dictionary
-            if word.lower() in typo_corrections:
-                corrected_words.append(typo_corrections[word.lower()])
-            else:
-                corrected_words.append(word)
+        for word in text.split():
+            corrected = cls.correct_raw_token(word)
+            # Keep the original spelling when nothing was corrected
+            corrected_words.append(word if corrected == word.lower() else corrected)
         
         return ' '.join(corrected_words)
     
+    @classmethod
+    def set_fuzzy_correction(cls, enabled: bool):
+        """Toggle fuzzy correction and drop cached token results"""
+        cls.fuzzy_correction = enabled
+        cls._token_cache = {}
+    
     @staticmethod
     def normalize(text: str) -> str:
         """Normalize text for processing"""
+        # Fix common typos (before lowercasing: capitalized names are kept)
+        text = TextNormalizer.fix_typos(text)
         # Convert to lowercase
         text = text.lower()
-        # Fix common typos
-        text = TextNormalizer.fix_typos(text)
         # Remove extra whitespace
         text = re.sub(r'\s+', ' ', text).strip()
         return text
@@ -187,14 +573,97 @@ class TextNormalizer:
         return match.group(1) if match else None
 
 
+@dataclass
+class MessageAnalysis:
+    """
+    Everything derived from one message, computed once and shared by the
+    intent classifier, the entity extractor and the dialog manager
+    """
+    text: str                                   # original message
+    lower: str                                  # lowercased message
+    raw_tokens: List[str]                       # whitespace tokens (lowercased)
+    token_offsets: List[Tuple[int, int]]        # (start, end) of each token in text
+    tokens: List[str]                           # typo-corrected tokens
+    normalized: str                             # == TextNormalizer.normalize(text)
+    normalized_offsets: List[Tuple[int, int]]   # (start, end) of each token in normalized
+    classifier_text: str                        # normalized, punctuation stripped
+    spans: Dict[str, Any] = field(default_factory=dict)  # filled by extractors
+    
+    def text_span(self, start: int, end: int) -> Tuple[int, int]:
+        """
+        Span of text behind normalized[start:end]. Within a token corrected
+        by the typo dictionary, the characters the correction kept map back
+        one to one and the rest widens to the original spelling (a match on
+        "math" in "(math)," covers "Maths" of "(Maths),").
+        """
+        starts = [token_start for token_start, _ in self.normalized_offsets]
+        first = bisect_right(starts, start) - 1
+        last = bisect_right(starts, end - 1) - 1
+        return self._text_offset(first, start, True), self._text_offset(last, end, False)
+    
+    def _text_offset(self, index: int, offset: int, is_start: bool) -> int:
+        text_start, text_end = self.token_offsets[index]
+        raw, corrected = self.raw_tokens[index], self.tokens[index]
+        # Lowercasing may change the length of a few characters ("İ")
+        if len(raw) != text_end - text_start:
+            return text_start if is_start else text_end
+        kept_prefix = 0
+        while kept_prefix < min(len(raw), len(corrected)) and raw[kept_prefix] == corrected[kept_prefix]:
+            kept_prefix += 1
+        kept_suffix = 0
+        while (kept_suffix < min(len(raw), len(corrected)) - kept_prefix
+               and raw[-1 - kept_suffix] == corrected[-1 - kept_suffix]):
+            kept_suffix += 1
+        
+        offset -= self.normalized_offsets[index][0]
+        from_end = len(corrected) - offset
+        by_prefix = text_start + offset if offset <= kept_prefix else None
+        by_suffix = text_end - from_end if from_end <= kept_suffix else None
+        if is_start:
+            return next((o for o in (by_prefix, by_suffix) if o is not None), text_start)
+        return next((o for o in (by_suffix, by_prefix) if o is not None), text_end)
+
+
+_TOKEN_SPAN_PATTERN = re.compile(r'\S+')
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def analyze_message(text: str) -> MessageAnalysis:
+    """Lowercase, tokenize and typo-correct a message once"""
+    lower = text.lower()
+    offsets = [match.span() for match in _TOKEN_SPAN_PATTERN.finditer(text)]
+    raw_tokens = [text[start:end].lower() for start, end in offsets]
+    tokens = [TextNormalizer.correct_raw_token(text[start:end]) for start, end in offsets]
+    normalized = ' '.join(tokens)
+    normalized_offsets = []
+    position = 0
+    for token in tokens:
+        normalized_offsets.append((position, position + len(token)))
+        position += len(token) + 1
+    classifier_text = _WHITESPACE_PATTERN.sub(' ', _PUNCTUATION_PATTERN.sub(' ', normalized)).strip()
+    
+    return MessageAnalysis(
+        text=text,
+        lower=lower,
+        raw_tokens=raw_tokens,
+        token_offsets=offsets,
+        tokens=tokens,
+        normalized=normalized,
+        normalized_offsets=normalized_offsets,
+        classifier_text=classifier_text
+    )
+
+
 def extract_entities(text: str) -> Dict[str, Any]:
     """
     Extract all entities from text
     Returns dict with found entities
     """
+    parsed = DateTimeParser().parse(text)
     entities = {
-        'date': DateTimeParser.parse_date(text),
-        'time': DateTimeParser.parse_time(text),
+        'date': parsed['date'],
+        'time': parsed['time'],
         'original_text': text
     }
     
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Online intent model - incremental learning without a full retrain
+
+HashingVectorizer features need no fitted vocabulary, so new examples never
+invalidate the feature space, and SGDClassifier (logistic loss) absorbs
+them with partial_fit. Each update works on a copy of the model and returns
+it; the caller swaps the reference in one assignment, so predictions that
+are already running keep using the previous model untouched.
+
+Updates mix the new batch with a replay sample of earlier examples, which
+keeps small batches from pulling the model too far towards the newest data.
+"""
+
+import os
+import copy
+import json
+import random
+import pickle
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from intent_classifier import load_corpus, save_model
+
+DEFAULT_ONLINE_MODEL_PATH = (Path(__file__).parent / '..' / 'models' / 'intent_model_online.pkl').resolve()
+# Accepted examples, kept so they can be merged into training_data/ later
+DEFAULT_EXAMPLES_LOG = (Path(__file__).parent / '..' / 'models' / 'online_examples.jsonl').resolve()
+
+
+class OnlineIntentModel:
+    """HashingVectorizer + SGDClassifier with copy-on-write partial_fit updates"""
+
+    def __init__(self, n_features: int = 2 ** 16, ngram_range=(1, 2), alpha: float = 1e-4,
+                 epochs: int = 3, replay_size: int = 5000, replay_ratio: float = 2.0,
+                 random_state: int = 42):
+        """
+        Args:
+            n_features: Hashing space size (coefficients are n_classes x n_features)
+            ngram_range: Word n-grams hashed into the feature space
+            alpha: SGD regularization strength
+            epochs: Passes over each update batch (new examples + replay sample)
+            replay_size: Earlier examples kept (reservoir sample) for replay
+            replay_ratio: Replayed examples per new example in an update
+        """
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, ngram_range=ngram_range, alternate_sign=False,
+            norm='l2', stop_words='english')
+        self.classifier = SGDClassifier(loss='log_loss', alpha=alpha, random_state=random_state)
+        self.epochs = epochs
+        self.replay_size = replay_size
+        self.replay_ratio = replay_ratio
+        self.replay = []   # reservoir of (preprocessed text, label)
+        self.seen = 0      # examples absorbed so far
+        self.version = 0   # number of updates applied
+        self._rng = random.Random(random_state)
+
+    @property
+    def classes_(self):
+        return self.classifier.classes_
+
+    def featurize(self, texts: Sequence[str]):
+        return self.vectorizer.transform(texts)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        return self.predict_proba_features(self.featurize(texts))
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        return self.classifier.predict_proba(features)
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(texts), axis=1)]
+
+    def fit(self, texts: List[str], labels: List[str]) -> 'OnlineIntentModel':
+        """Initial full fit on preprocessed texts (fixes the set of intents)"""
+        self.classifier.fit(self.vectorizer.transform(texts), labels)
+        self.replay = []
+        self.seen = 0
+        self._remember(texts, labels)
+        return self
+
+    def updated(self, texts: List[str], labels: List[str]) -> 'OnlineIntentModel':
+        """
+        Copy of this model with the new preprocessed examples absorbed
+        The current model is not modified, so it can keep serving meanwhile.
+        """
+        unknown = sorted(set(labels) - set(self.classes_))
+        if unknown:
+            raise ValueError(f"Unknown intent(s): {', '.join(unknown)} (retrain to add intents)")
+
+        model = copy.deepcopy(self)
+        replay_count = min(len(model.replay), int(len(texts) * model.replay_ratio))
+        batch = list(zip(texts, labels)) + model._rng.sample(model.replay, replay_count)
+        for _ in range(model.epochs):
+            model._rng.shuffle(batch)
+            model.classifier.partial_fit(
+                model.vectorizer.transform([text for text, _ in batch]),
+                [label for _, label in batch])
+        model._remember(texts, labels)
+        model.version += 1
+        return model
+
+    def _remember(self, texts: List[str], labels: List[str]):
+        """Reservoir sampling keeps a uniform sample of everything seen"""
+        for example in zip(texts, labels):
+            self.seen += 1
+            if len(self.replay) < self.replay_size:
+                self.replay.append(example)
+            else:
+                slot = self._rng.randrange(self.seen)
+                if slot < self.replay_size:
+                    self.replay[slot] = example
+
+
+def train_online_model(data_dir=None, **params) -> OnlineIntentModel:
+    """Bootstrap an online model from the training corpus"""
+    texts, labels = load_corpus(data_dir)
+    return OnlineIntentModel(**params).fit(texts, labels)
+
+
+def load_online_model(path=None, train_if_missing: bool = True) -> Optional[OnlineIntentModel]:
+    """Load the saved online model, bootstrapping it from the corpus if there is none"""
+    path = Path(path or DEFAULT_ONLINE_MODEL_PATH)
+    if path.exists():
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    if not train_if_missing:
+        return None
+    model = train_online_model()
+    save_model(model, 'online', path)
+    return model
+
+
+def parse_examples(examples: Any):
+    """Validate [{"text": ..., "intent": ...}] and return (raw texts, labels)"""
+    if not isinstance(examples, list) or not examples:
+        raise ValueError('Examples must be a non-empty list')
+    texts, labels = [], []
+    for example in examples:
+        if not isinstance(example, dict) or not isinstance(example.get('text'), str) \
+                or not isinstance(example.get('intent'), str) or not example['text'].strip():
+            raise ValueError('Each example needs a non-empty "text" and an "intent"')
+        texts.append(example['text'])
+        labels.append(example['intent'])
+    return texts, labels
+
+
+def append_examples_log(texts: List[str], labels: List[str], path=None):
+    """Append accepted examples as JSON lines (one {"text", "intent"} per line)"""
+    path = Path(path or DEFAULT_EXAMPLES_LOG)
+    with open(path, 'a', encoding='utf-8') as f:
+        for text, label in zip(texts, labels):
+            f.write(json.dumps({'text': text, 'intent': label}, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prefork Dialog Server - N worker processes sharing one loaded model
+
+The parent process loads DialogManager (intent model, typo dictionary,
+compiled regexes, gazetteer), runs warm-up predictions so every lazy
+structure is built, freezes the GC so those objects are not dirtied by
+collections, then binds the socket and forks the workers. Model pages are
+shared copy-on-write; each worker only owns what it allocates per request.
+
+All workers block in accept() on the same listening socket and the kernel
+hands each new connection to one idle worker. A worker exits after
+--max-requests requests (plus a random jitter, so workers do not recycle
+together) once its current connection is done; the parent forks a fresh
+copy from the warm parent image. SIGTERM/SIGINT stop the pool gracefully,
+SIGHUP recycles all workers, SIGUSR1 toggles the request profiler in every
+worker (and in the parent, so replacement workers inherit the setting).
+
+Same newline-delimited JSON protocol as dialog_server.py. load_courses and
+load_tutors are written to --state-dir and picked up by every worker
+before its next request, so reference data stays consistent across the pool.
+Chunked tables must be sent over one connection (one worker collects them).
+
+The parent also watches the model registry: a newly promoted version is
+loaded and warmed up in the parent while the workers keep serving the old
+one, then the workers are recycled and fork from the updated image.
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import errno
+import random
+import signal
+import socket
+import argparse
+from pathlib import Path
+from typing import Any, Dict
+from dialog_manager import DialogManager
+from dialog_server import (DEFAULT_SOCKET_PATH, MAX_REQUEST_BYTES, LISTEN_BACKLOG, TABLE_ACTIONS,
+                           bind_socket, handle_request, respond_line, table_request)
+from session_store import create_session_store, DEFAULT_SESSION_TTL
+from model_registry import MODEL_POLL_SECONDS
+from request_profiler import RequestProfiler
+
+# Messages exercising every lazy path: typo index, date/time parser, subjects, tutors
+WARMUP_MESSAGES = [
+    'hello',
+    'find a math tutor',
+    'I want to book an english lesson tomorrow at 3pm',
+    'show my bookings for next week',
+    'cancel my booking on friday',
+    'serch for a phisics teacher',
+    'book with Walter Whitman on 20.10.2026 at 14:30',
+    'between 2 and 4pm on monday',
+]
+
+# Reference data actions replicated to every worker through the state directory
+SHARED_ACTIONS = tuple(TABLE_ACTIONS)
+
+# How often an idle worker wakes up to check for shutdown
+ACCEPT_POLL_SECONDS = 1.0
+# Drop connections that stay silent this long, so a stuck client can't pin a worker
+IDLE_TIMEOUT_SECONDS = 30.0
+# Minimum seconds between respawns of crashing workers
+RESPAWN_BACKOFF_SECONDS = 1.0
+# How often the parent reaps exited workers (and so the longest respawn delay)
+SUPERVISE_POLL_SECONDS = 0.2
+
+
+def warm_up(manager: DialogManager):
+    """Build every lazily initialized structure before forking"""
+    requests = [(message, None, None) for message in WARMUP_MESSAGES]
+    manager.process_messages(requests)
+    for message in WARMUP_MESSAGES:
+        manager.process_message(message)
+    if manager.response_cache is not None:
+        manager.response_cache.clear()
+    manager.reset_timings()
+
+
+class SharedReferenceData:
+    """Latest load_courses / load_tutors payloads, stored as files in a state directory"""
+
+    def __init__(self, state_dir: str):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._applied = {}  # action -> mtime_ns of the file last applied
+
+    def _path(self, action: str) -> Path:
+        return self.state_dir / f"{action}.json"
+
+    def publish(self, action: str, request: Dict[str, Any]):
+        """Atomically replace the stored payload of an action"""
+        path = self._path(action)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(request, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._applied[action] = path.stat().st_mtime_ns
+
+    def refresh(self, manager: DialogManager):
+        """Apply payloads published by other workers since the last check"""
+        for action in SHARED_ACTIONS:
+            path = self._path(action)
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if self._applied.get(action) == mtime:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    request = json.load(f)
+            except (OSError, ValueError):
+                continue
+            handle_request(manager, request)
+            self._applied[action] = mtime
+
+
+class Worker:
+    """Accept loop of one forked worker"""
+
+    def __init__(self, listener: socket.socket, manager: DialogManager,
+                 reference: SharedReferenceData, max_requests: int):
+        self.listener = listener
+        self.manager = manager
+        self.reference = reference
+        self.max_requests = max_requests
+        self.handled = 0
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGHUP, self._stop)
+        # Ctrl-C reaches the whole process group; let the parent coordinate shutdown
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # The parent's handler would forward to the siblings; toggle this worker only
+        signal.signal(signal.SIGUSR1, self.manager.profiler.toggle)
+        self.listener.settimeout(ACCEPT_POLL_SECONDS)
+
+        while not self.stopping and not self._exhausted():
+            try:
+                conn, _ = self.listener.accept()
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.ECONNABORTED):
+                    continue
+                raise
+            with conn:
+                conn.settimeout(IDLE_TIMEOUT_SECONDS)
+                try:
+                    self._serve_connection(conn)
+                except (socket.timeout, ConnectionError):
+                    pass
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _exhausted(self) -> bool:
+        return self.max_requests > 0 and self.handled >= self.max_requests
+
+    def _serve_connection(self, conn: socket.socket):
+        with conn.makefile('rb') as rfile:
+            while True:
+                line = rfile.readline(MAX_REQUEST_BYTES + 1)
+                if not line:
+                    break
+                if len(line) > MAX_REQUEST_BYTES:
+                    self._send(conn, {'success': False, 'error': 'Request too large'})
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+
+                self.reference.refresh(self.manager)
+                self._send(conn, respond_line(self.manager, line, self._handle))
+                self.handled += 1
+
+    def _handle(self, manager: DialogManager, request: Dict[str, Any]) -> Dict[str, Any]:
+        action = request.get('action')
+        if action in SHARED_ACTIONS:
+            # Chunks of a table arrive on one connection, so on this worker;
+            # only the whole table is applied and published
+            request, response = table_request(request)
+            if response is not None:
+                return response
+        response = handle_request(manager, request)
+        if action in SHARED_ACTIONS and response.get('success'):
+            self.reference.publish(action, request)
+        if action == 'stats' and response.get('success'):
+            response['result']['worker'] = {
+                'pid': os.getpid(),
+                'requests': self.handled,
+                'max_requests': self.max_requests
+            }
+        return response
+
+    @staticmethod
+    def _send(conn: socket.socket, response: Dict[str, Any]):
+        conn.sendall((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+class PreforkServer:
+    """Parent process: owns the listening socket and keeps N workers alive"""
+
+    def __init__(self, socket_path: str, manager: DialogManager, workers: int,
+                 max_requests: int = 10000, max_requests_jitter: int = 1000, state_dir: str = None,
+                 model_poll_interval: float = MODEL_POLL_SECONDS):
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        self.socket_path = socket_path
+        self.manager = manager
+        self.model_watcher = manager.model_watcher(model_poll_interval) if model_poll_interval > 0 else None
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.reference = SharedReferenceData(state_dir or f"{socket_path}.state")
+        self.children = {}  # pid -> spawn time
+        self.stopping = False
+        self.listener = None
+
+    def serve(self):
+        # Reference data published before a restart
+        self.reference.refresh(self.manager)
+
+        self.listener = bind_socket(self.socket_path)
+        self.listener.listen(LISTEN_BACKLOG)
+
+        # Everything loaded so far is shared; keep the GC from touching (and copying) it
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._shutdown)
+        signal.signal(signal.SIGINT, self._shutdown)
+        signal.signal(signal.SIGHUP, self._recycle_all)
+        signal.signal(signal.SIGUSR1, self._toggle_profiler)
+
+        for _ in range(self.workers):
+            self._spawn()
+        print(f"Prefork dialog server listening on {self.socket_path} "
+              f"({self.workers} workers, recycle after {self.max_requests} requests)", file=sys.stderr)
+
+        try:
+            self._supervise()
+        finally:
+            self.listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _spawn(self):
+        max_requests = self.max_requests
+        if max_requests > 0 and self.max_requests_jitter > 0:
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                Worker(self.listener, self.manager, self.reference, max_requests).run()
+            except Exception as e:
+                print(f"Worker {os.getpid()} crashed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def _supervise(self):
+        next_model_check = time.monotonic()
+        while self.children:
+            self._reap()
+            if self.model_watcher is not None and not self.stopping and time.monotonic() >= next_model_check:
+                next_model_check = time.monotonic() + self.model_watcher.interval
+                self._check_model()
+            time.sleep(SUPERVISE_POLL_SECONDS)
+
+    def _reap(self):
+        """Collect exited workers and replace them"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            spawned_at = self.children.pop(pid, None)
+            if spawned_at is None or self.stopping:
+                continue
+            # A worker dying right after start is a crash loop; don't fork-bomb
+            if os.waitstatus_to_exitcode(status) != 0:
+                elapsed = time.monotonic() - spawned_at
+                if elapsed < RESPAWN_BACKOFF_SECONDS:
+                    time.sleep(RESPAWN_BACKOFF_SECONDS - elapsed)
+            self._spawn()
+
+    def _check_model(self):
+        """Load a newly promoted model in the parent, then recycle the workers onto it"""
+        try:
+            swapped = self.model_watcher.check()
+        except Exception as e:
+            print(f"Model reload failed, keeping version {self.manager.model_version}: {e}", file=sys.stderr)
+            return
+        if swapped:
+            # The new model becomes part of the shared image the workers fork from
+            gc.collect()
+            gc.freeze()
+            print(f"Model {self.manager.model_info()} loaded, recycling workers", file=sys.stderr)
+            self._signal_children(signal.SIGTERM)
+
+    def _signal_children(self, signum: int):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _shutdown(self, signum, frame):
+        self.stopping = True
+        self._signal_children(signal.SIGTERM)
+
+    def _recycle_all(self, signum, frame):
+        # Workers finish their current connection and are replaced one by one
+        self._signal_children(signal.SIGTERM)
+
+    def _toggle_profiler(self, signum, frame):
+        self.manager.profiler.toggle()
+        self._signal_children(signal.SIGUSR1)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET_PATH, workers: int = None, max_requests: int = 10000,
+          max_requests_jitter: int = 1000, cache_size: int = 0, cache_ttl: float = None,
+          session_backend: str = 'sqlite', session_db: str = None,
+          session_ttl: float = DEFAULT_SESSION_TTL, state_dir: str = None, online: bool = False,
+          model_poll_interval: float = MODEL_POLL_SECONDS, timings: bool = True,
+          fast_path: str = 'exact', ensemble: bool = False):
+    """Load the dialog manager once, warm it up and serve with a pool of forked workers"""
+    workers = workers or os.cpu_count() or 1
+    if session_backend == 'memory' and workers > 1:
+        print("Warning: memory sessions are per worker; use --session-backend sqlite "
+              "to share context across the pool", file=sys.stderr)
+
+    session_store = create_session_store(session_backend, session_db, session_ttl)
+    manager = DialogManager(cache_size=cache_size, cache_ttl=cache_ttl, session_store=session_store,
+                            online=online, timings=timings,
+                            fast_path=None if fast_path == 'off' else fast_path, ensemble=ensemble)
+    warm_up(manager)
+    manager.profiler = RequestProfiler.from_env()
+
+    PreforkServer(socket_path, manager, workers, max_requests, max_requests_jitter, state_dir,
+                  model_poll_interval).serve()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve DialogManager with a pool of pre-forked workers')
+    parser.add_argument('socket_path', nargs='?', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--max-requests', type=int, default=10000,
+                        help='recycle a worker after this many requests (0 disables recycling)')
+    parser.add_argument('--max-requests-jitter', type=int, default=1000,
+                        help='random extra requests per worker, so workers do not recycle together')
+    parser.add_argument('--state-dir', default=None,
+                        help='where load_courses/load_tutors payloads are shared (default: <socket>.state)')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='response cache entries per worker (0 disables the cache)')
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help='response cache entry lifetime in seconds')
+    parser.add_argument('--session-backend', choices=['memory', 'sqlite'], default='sqlite',
+                        help='where per-session context lives (sqlite is shared by all workers)')
+    parser.add_argument('--session-db', default=None,
+                        help='SQLite session store path (default: $AGYRUS_SESSION_DB or /tmp)')
+    parser.add_argument('--session-ttl', type=float, default=DEFAULT_SESSION_TTL,
+                        help='seconds of inactivity before a session is forgotten')
+    parser.add_argument('--online', action='store_true',
+                        help='serve the online model; "learn" with save=true reaches all workers via the registry')
+    parser.add_argument('--model-poll-interval', type=float, default=MODEL_POLL_SECONDS,
+                        help='seconds between checks for a newly promoted model (0 disables reloading)')
+    parser.add_argument('--no-timings', action='store_true',
+                        help='do not keep per-stage latency histograms (stats "stages", per worker)')
+    parser.add_argument('--fast-path', choices=['off', 'exact', 'keywords'], default='exact',
+                        help='answer training phrases (exact) and keyword rule matches (keywords) '
+                             'without the classifier')
+    parser.add_argument('--ensemble', action='store_true',
+                        help='serve the decision tree, logistic and KNN models as one early-exit ensemble')
+    args = parser.parse_args()
+
+    serve(args.socket_path, args.workers, args.max_requests, args.max_requests_jitter,
+          args.cache_size, args.cache_ttl, args.session_backend, args.session_db,
+          args.session_ttl, args.state_dir, args.online, args.model_poll_interval, not args.no_timings,
+          args.fast_path, args.ensemble)
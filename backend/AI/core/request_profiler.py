@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request profiler - on-demand cProfile captures of process_message
+
+Off by default; while off, DialogManager only checks one attribute per
+request. Once enabled (AGYRUS_PROFILE at startup, or SIGUSR1 to toggle a
+running server) it captures:
+  - every Nth request (every=N), and/or
+  - any request slower than slow_ms. Slow requests can only be caught if
+    they were being profiled already, so with slow_ms set every request
+    runs under cProfile (roughly 2x slower) and only the slow ones are
+    kept. The threshold applies to the profiled run.
+
+Each capture is written to the profile directory as <name>.prof (pstats
+format: python3 -m pstats, snakeviz) and <name>.json with the redacted
+message, latency, intent, stage timings and the top functions. Only the
+newest `keep` captures are kept. One request is profiled at a time.
+
+    AGYRUS_PROFILE="every=100,slow_ms=10,keep=200"   AGYRUS_PROFILE_DIR=/tmp/agyrus-profiles
+
+Usage:
+    python3 request_profiler.py [--dir DIR] [--show NAME]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import itertools
+import threading
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from nlp_utils import TextNormalizer, DateTimeParser
+
+DEFAULT_PROFILE_DIR = os.environ.get('AGYRUS_PROFILE_DIR', '/tmp/agyrus-profiles')
+# Used when the profiler is switched on without a configuration (e.g. by signal)
+DEFAULT_EVERY_N = 100
+DEFAULT_SLOW_MS = 10.0
+DEFAULT_KEEP = 100
+# Functions listed in the .json summary of a capture
+SUMMARY_FUNCTIONS = 25
+
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+')
+URL_PATTERN = re.compile(r'(?:https?://|www\.)', re.IGNORECASE)
+# Digit groups joined by single spaces, dashes or dots ("555-123-4567",
+# "4111 1111 1111 1111") are masked as one run: kept only when the whole run
+# lies inside a date or time DateTimeParser resolved
+DIGIT_RUN_PATTERN = re.compile(r'\d+(?:[ .-]\d+)*')
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+# Short words date/time phrases are built from, which the training vocabulary may lack
+CONNECTOR_WORDS = {'at', 'on', 'in', 'by', 'from', 'to', 'and', 'or', 'between', 'until', 'before',
+                   'after', 'the', 'a', 'an', 'of', 'for', 'with', 'me', 'my', 'i', 'please'}
+
+_known_words = None
+
+
+def known_words():
+    """Words that may appear unredacted: training vocabulary, entity and date/time keywords"""
+    global _known_words
+    if _known_words is None:
+        from entity_extractor import EntityExtractor
+        words = set(TextNormalizer._load_spell_index().words) | CONNECTOR_WORDS
+        for table in (DateTimeParser.WEEKDAYS, DateTimeParser.RELATIVE_DATES, DateTimeParser.MONTHS,
+                      DateTimeParser.NUMBER_WORDS, DateTimeParser.TIME_KEYWORDS):
+            for phrase in table:
+                words.update(phrase.split())
+        for table in (EntityExtractor.SUBJECTS, EntityExtractor.ACTIONS):
+            for keywords in table.values():
+                words.update(keywords)
+        _known_words = frozenset(words)
+    return _known_words
+
+
+def redact_message(text: str) -> str:
+    """
+    Message with personal data masked but its shape kept
+    Unknown words become x/X of the same length and case (so "Ivan" stays a
+    capitalized name), digits become # unless they belong to a parsed date or
+    time, emails and URLs a placeholder.
+    """
+    words = known_words()
+    # Offsets of the lowercased text must match the original ones
+    spans = DateTimeParser().parsed_spans(text) if len(text.lower()) == len(text) else []
+
+    def mask_digits(match):
+        if any(start <= match.start() and match.end() <= end for start, end in spans):
+            return match.group()
+        return ''.join('#' if c.isdigit() else c for c in match.group())
+
+    def mask(match):
+        word = match.group()
+        if word.lower() in words:
+            return word
+        return ''.join('X' if c.isupper() else 'x' for c in word)
+
+    def redact_token(token):
+        if EMAIL_PATTERN.fullmatch(token):
+            return '<email>'
+        if URL_PATTERN.match(token):
+            return '<url>'
+        return WORD_PATTERN.sub(mask, token)
+
+    text = DIGIT_RUN_PATTERN.sub(mask_digits, text)
+    return ' '.join(redact_token(token) for token in text.split(' '))
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes the captures"""
+
+    def __init__(self, every_n: int = 0, slow_ms: float = 0.0, directory=None,
+                 keep: int = DEFAULT_KEEP, enabled: bool = False):
+        """
+        Args:
+            every_n: Profile every Nth request (0: none)
+            slow_ms: Keep profiles of requests at least this slow (0: none)
+            directory: Where captures are written
+            keep: Captures kept in the directory (oldest are deleted)
+            enabled: Start switched on
+        """
+        self.every_n = every_n
+        self.slow_ms = slow_ms
+        self.directory = Path(directory or DEFAULT_PROFILE_DIR)
+        self.keep = keep
+        self.enabled = enabled
+        self.profiled = 0
+        self.written = 0
+        self._requests = itertools.count(1)
+        self._capture_ids = itertools.count(1)
+        # Only one request is profiled at a time; concurrent ones run unprofiled
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, value: Optional[str] = None) -> 'RequestProfiler':
+        """
+        Profiler configured by AGYRUS_PROFILE ("every=N,slow_ms=M,keep=K,dir=PATH")
+        Enabled when the variable is set; raises ValueError for a malformed value.
+        """
+        value = os.environ.get('AGYRUS_PROFILE', '') if value is None else value
+        if not value.strip():
+            return cls()
+        options = {}
+        for item in value.split(','):
+            key, separator, setting = item.strip().partition('=')
+            if not separator or key not in ('every', 'slow_ms', 'keep', 'dir'):
+                raise ValueError(f"Invalid AGYRUS_PROFILE setting: {item.strip()!r}")
+            options[key] = setting.strip()
+        profiler = cls(int(options.get('every', 0)), float(options.get('slow_ms', 0)),
+                       options.get('dir'), int(options.get('keep', DEFAULT_KEEP)), enabled=True)
+        if not profiler.every_n and not profiler.slow_ms:
+            profiler.every_n, profiler.slow_ms = DEFAULT_EVERY_N, DEFAULT_SLOW_MS
+        return profiler
+
+    def toggle(self, *_):
+        """Switch on or off (usable as a signal handler)"""
+        if not self.enabled and not self.every_n and not self.slow_ms:
+            self.every_n, self.slow_ms = DEFAULT_EVERY_N, DEFAULT_SLOW_MS
+        self.enabled = not self.enabled
+        print(f"Request profiler {'on' if self.enabled else 'off'} (pid {os.getpid()})", file=sys.stderr)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'every_n': self.every_n,
+            'slow_ms': self.slow_ms,
+            'directory': str(self.directory),
+            'profiled': self.profiled,
+            'written': self.written
+        }
+
+    def call(self, func: Callable[..., Dict[str, Any]], message: str, *args) -> Dict[str, Any]:
+        """func(message, *args), profiled when this request is selected"""
+        sampled = self.every_n > 0 and next(self._requests) % self.every_n == 0
+        if not (sampled or self.slow_ms > 0) or not self._lock.acquire(blocking=False):
+            return func(message, *args)
+        try:
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                result = func(message, *args)
+            finally:
+                profile.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.profiled += 1
+        finally:
+            self._lock.release()
+
+        slow = self.slow_ms > 0 and elapsed_ms >= self.slow_ms
+        if sampled or slow:
+            try:
+                self._write(profile, message, result, elapsed_ms, 'slow' if slow else 'sampled')
+            except OSError as e:
+                print(f"Could not write request profile: {e}", file=sys.stderr)
+        return result
+
+    def _write(self, profile: cProfile.Profile, message: str, result: Dict[str, Any],
+               elapsed_ms: float, reason: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        name = (f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}"
+                f"-{os.getpid()}-{next(self._capture_ids)}-{reason}")
+
+        summary = StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+        details = {
+            'reason': reason,
+            'elapsed_ms': elapsed_ms,
+            'every_n': self.every_n,
+            'slow_ms': self.slow_ms,
+            'message': redact_message(message),
+            'message_length': len(message),
+            'intent': result.get('intent'),
+            'confidence': result.get('confidence'),
+            'timings': result.get('timings'),
+            'pid': os.getpid(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+            'top_functions': summary.getvalue()
+        }
+
+        # .json last: a capture is listed only once both files are complete
+        tmp_path = self.directory / f".{name}.tmp"
+        profile.dump_stats(str(tmp_path))
+        os.replace(tmp_path, self.directory / f"{name}.prof")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(details, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.directory / f"{name}.json")
+        self.written += 1
+        self._rotate()
+
+    def _rotate(self):
+        """Delete the oldest captures beyond keep (names sort by time)"""
+        captures = sorted(self.directory.glob('*.json'))
+        for path in captures[:max(0, len(captures) - self.keep)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List or show captured request profiles')
+    parser.add_argument('--dir', default=DEFAULT_PROFILE_DIR, help='profile directory')
+    parser.add_argument('--show', default=None, help='capture name: print its summary')
+    args = parser.parse_args()
+
+    directory = Path(args.dir)
+    if args.show:
+        with open(directory / f"{Path(args.show).stem}.json", 'r', encoding='utf-8') as f:
+            details = json.load(f)
+        top = details.pop('top_functions')
+        print(json.dumps(details, ensure_ascii=False, indent=2))
+        print(top)
+    else:
+        for path in sorted(directory.glob('*.json')):
+            with open(path, 'r', encoding='utf-8') as f:
+                details = json.load(f)
+            print(f"{path.stem:48} {details['elapsed_ms']:9.2f} ms  {details['intent'] or '':16} "
+                  f"{details['message']}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Session store - server-side dialog context keyed by chat session id
+
+Clients send only a session id and the new message; the merged entity
+context from DialogManager.process_message is kept here between turns.
+
+Two backends with the same interface (get / put / delete / stats):
+  - MemorySessionStore: in-process dict with sliding TTL, for a single server
+  - SQLiteSessionStore: local SQLite file, shared by several worker processes
+    (and by the exec fallback, which starts a fresh process per message)
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_SESSION_TTL = 30 * 60
+DEFAULT_SESSION_DB = os.environ.get('AGYRUS_SESSION_DB', '/tmp/agyrus_sessions.sqlite3')
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+# Per-message fields that should not be carried over to the next turn
+TRANSIENT_KEYS = ('original_text',)
+
+
+def valid_session_id(session_id: Any) -> bool:
+    """Session ids are short opaque tokens (UUIDs, random hex)"""
+    return isinstance(session_id, str) and SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def session_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a merged context worth keeping for the next turn"""
+    return {k: v for k, v in context.items() if k not in TRANSIENT_KEYS and v is not None}
+
+
+class MemorySessionStore:
+    """Thread-safe in-process store; sessions expire ttl seconds after their last turn"""
+
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL, max_sessions: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_sessions <= 0:
+            raise ValueError("max_sessions must be positive")
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._clock = clock
+        # Ordered by last access, so expired sessions are always at the front
+        self._sessions = OrderedDict()  # session_id -> (touched_at, context)
+        self._lock = threading.Lock()
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Stored context of a session ({} for new or expired sessions)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return {}
+            touched_at, context = entry
+            if self.ttl is not None and self._clock() - touched_at > self.ttl:
+                del self._sessions[session_id]
+                self.expirations += 1
+                return {}
+            return dict(context)
+
+    def put(self, session_id: str, context: Dict[str, Any]):
+        """Replace the context of a session and refresh its TTL"""
+        with self._lock:
+            now = self._clock()
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (now, dict(context))
+            self._purge_locked(now)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _purge_locked(self, now: float):
+        if self.ttl is not None:
+            while self._sessions:
+                touched_at, _ = next(iter(self._sessions.values()))
+                if now - touched_at <= self.ttl:
+                    break
+                self._sessions.popitem(last=False)
+                self.expirations += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'ttl': self.ttl,
+                'expirations': self.expirations,
+                'evictions': self.evictions
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Store backed by a local SQLite file, safe to share between processes
+    Each thread gets its own connection; expired rows are purged periodically.
+    """
+
+    PURGE_EVERY = 500  # puts between purges of expired rows
+
+    def __init__(self, path: str = DEFAULT_SESSION_DB, ttl: float = DEFAULT_SESSION_TTL,
+                 clock: Callable[[], float] = time.time):
+        # Wall clock, not monotonic: timestamps are compared across processes
+        self.path = str(path)
+        self.ttl = ttl
+        self._clock = clock
+        self._local = threading.local()
+        self._puts = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dialog_session ("
+            " session_id TEXT PRIMARY KEY,"
+            " context TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_dialog_session_updated ON dialog_session (updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not be shared with a forked child (prefork workers)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = None
+            self._local.pid = os.getpid()
+        conn = self._local.conn
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT context, updated_at FROM dialog_session WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return {}
+        context, updated_at = row
+        if self.ttl is not None and self._clock() - updated_at > self.ttl:
+            self.delete(session_id)
+            return {}
+        return json.loads(context)
+
+    def put(self, session_id: str, context: Dict[str, Any]):
+        now = self._clock()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO dialog_session (session_id, context, updated_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(context, ensure_ascii=False), now)
+        )
+        self._puts += 1
+        if self.ttl is not None and self._puts % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM dialog_session WHERE updated_at < ?", (now - self.ttl,))
+
+    def delete(self, session_id: str) -> bool:
+        cursor = self._connection().execute(
+            "DELETE FROM dialog_session WHERE session_id = ?", (session_id,)
+        )
+        return cursor.rowcount > 0
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM dialog_session").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'sqlite', 'path': self.path, 'sessions': len(self), 'ttl': self.ttl}
+
+
+def create_session_store(backend: str = 'memory', path: Optional[str] = None,
+                         ttl: float = DEFAULT_SESSION_TTL):
+    """Build a session store by backend name ('memory' or 'sqlite')"""
+    if backend == 'memory':
+        return MemorySessionStore(ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path or DEFAULT_SESSION_DB, ttl=ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
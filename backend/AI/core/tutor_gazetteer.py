@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tutor gazetteer - resolves tutor mentions to tutor_id with a token trie
+
+Each tutor from the `tutor` table is indexed under its first name, surname
+and full name. A message is scanned once, left to right, taking the
+longest trie match at each token, so lookup cost depends on message length
+rather than on the number of tutors. Tokens of 5+ letters that are not in
+the trie are corrected within edit distance 1 through a symmetric-delete
+index ("Walterr" -> "walter"), but only when they look like a name: the
+token is capitalized mid-sentence or continues an exact match ("walter
+whitmann"), and it is not a word the TextNormalizer dictionary knows, so
+ordinary words ("grade", "charges") never resolve to a tutor. Given a
+MessageAnalysis, the scan walks its whitespace tokens and also tries the
+typo-corrected token ("walterr" -> "walter") where the one as written does
+not match.
+"""
+
+import re
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Union
+from nlp_utils import MessageAnalysis, SymSpellIndex, TextNormalizer
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+SENTENCE_END_PATTERN = re.compile(r'[.!?]')
+
+
+class TutorGazetteer:
+    """In-memory tutor name index with incremental updates"""
+
+    # Shorter tokens are too ambiguous for fuzzy matching
+    FUZZY_MIN_LENGTH = 5
+    # Root-level fuzzy correction cache size; cleared when full
+    FUZZY_CACHE_SIZE = 10000
+
+    def __init__(self):
+        self.tutors = {}        # tutor_id -> (name, surname)
+        self.root = {}          # token -> node; node = {'children': {}, 'ids': {tutor_id: alias}}
+        self.token_counts = {}  # token -> number of aliases using it
+        self.fuzzy_index = SymSpellIndex(max_edit_distance=1)
+        self._fuzzy_cache = {}  # token -> root-level correction (or None); reset on updates
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tutors)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercase name tokens; possessives are dropped ("curie's" -> "curie")"""
+        tokens = []
+        for token in WORD_PATTERN.findall(text):
+            token = token.lower()
+            if token.endswith(("'s", "’s")):
+                token = token[:-2]
+            tokens.append(token)
+        return tokens
+
+    @classmethod
+    def _scan(cls, message: Union[str, MessageAnalysis]) -> List[Tuple[str, bool, Optional[str]]]:
+        """
+        (token, capitalized, corrected) triples, tokens as tokenize() returns them
+        A capital at the start of a sentence does not count. corrected is the
+        typo-corrected spelling from the analysis when it differs (else None).
+        """
+        if isinstance(message, MessageAnalysis):
+            text = message.text
+            words = cls._with_corrections(message)
+        else:
+            text = message
+            words = [(match, None) for match in WORD_PATTERN.finditer(text)]
+        scanned = []
+        previous_end = None
+        for match, corrected in words:
+            word = match.group()
+            sentence_start = previous_end is None or SENTENCE_END_PATTERN.search(text, previous_end, match.start())
+            token = cls.tokenize(word)[0]
+            scanned.append((token, word[0].isupper() and not sentence_start,
+                            corrected if corrected != token else None))
+            previous_end = match.end()
+        return scanned
+
+    @classmethod
+    def _with_corrections(cls, analysis: MessageAnalysis) -> List[Tuple[Any, Optional[str]]]:
+        """Words of each analysis token, with the corrected word when the token holds just one"""
+        words = []
+        for (start, end), corrected in zip(analysis.token_offsets, analysis.tokens):
+            matches = list(WORD_PATTERN.finditer(analysis.text, start, end))
+            corrected_words = cls.tokenize(corrected)
+            if len(matches) != 1 or len(corrected_words) != 1:
+                corrected_words = [None] * len(matches)
+            words.extend(zip(matches, corrected_words))
+        return words
+
+    @staticmethod
+    def _aliases(name: str, surname: str) -> List[str]:
+        aliases = [name, surname, f"{name} {surname}"]
+        return [alias for alias in aliases if alias.strip()]
+
+    def _add_alias(self, tutor_id: int, alias: str):
+        tokens = self.tokenize(alias)
+        if not tokens:
+            return
+        children = self.root
+        node = None
+        for token in tokens:
+            node = children.setdefault(token, {'children': {}, 'ids': {}})
+            children = node['children']
+            count = self.token_counts.get(token, 0)
+            if count == 0:
+                self.fuzzy_index.add_word(token)
+            self.token_counts[token] = count + 1
+        node['ids'][tutor_id] = alias
+
+    def _remove_alias(self, tutor_id: int, alias: str):
+        tokens = self.tokenize(alias)
+        path = []
+        children = self.root
+        for token in tokens:
+            node = children.get(token)
+            if node is None:
+                return
+            path.append((children, token, node))
+            children = node['children']
+        if not path:
+            return
+        path[-1][2]['ids'].pop(tutor_id, None)
+
+        # Prune empty nodes bottom-up and release token references
+        for children, token, node in reversed(path):
+            count = self.token_counts.get(token, 0) - 1
+            if count <= 0:
+                self.token_counts.pop(token, None)
+                self.fuzzy_index.remove_word(token)
+            else:
+                self.token_counts[token] = count
+            if not node['ids'] and not node['children']:
+                del children[token]
+
+    def upsert(self, tutor_id: int, name: str, surname: str):
+        """Add or update one tutor"""
+        name, surname = (name or '').strip(), (surname or '').strip()
+        with self._lock:
+            if self.tutors.get(tutor_id) == (name, surname):
+                return
+            self._remove_locked(tutor_id)
+            self._fuzzy_cache = {}
+            self.tutors[tutor_id] = (name, surname)
+            for alias in self._aliases(name, surname):
+                self._add_alias(tutor_id, alias)
+
+    def remove(self, tutor_id: int):
+        """Remove one tutor"""
+        with self._lock:
+            self._remove_locked(tutor_id)
+
+    def _remove_locked(self, tutor_id: int):
+        current = self.tutors.pop(tutor_id, None)
+        if current is not None:
+            self._fuzzy_cache = {}
+            for alias in self._aliases(*current):
+                self._remove_alias(tutor_id, alias)
+
+    def sync(self, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Bring the gazetteer in line with rows of the `tutor` table
+        Only changed rows are touched; returns counts of added/updated/removed
+        """
+        wanted = {
+            int(row['tutor_id']): ((row.get('name') or '').strip(), (row.get('surname') or '').strip())
+            for row in rows
+        }
+        stats = {'added': 0, 'updated': 0, 'removed': 0}
+        for tutor_id in [tid for tid in self.tutors if tid not in wanted]:
+            self.remove(tutor_id)
+            stats['removed'] += 1
+        for tutor_id, (name, surname) in wanted.items():
+            current = self.tutors.get(tutor_id)
+            if current == (name, surname):
+                continue
+            stats['updated' if current is not None else 'added'] += 1
+            self.upsert(tutor_id, name, surname)
+        return stats
+
+    def _resolve_token(self, token: str, children: Dict, fuzzy: bool) -> Tuple[Optional[Dict], bool]:
+        """Trie node for token and whether it matched exactly; fuzzy allows a correction"""
+        node = children.get(token)
+        if node is not None:
+            return node, True
+        if (not fuzzy or len(token) < self.FUZZY_MIN_LENGTH
+                or TextNormalizer.is_known_word(token)):
+            return None, False
+        
+        # Only tokens that can continue the current trie path are candidates
+        if children is self.root:
+            if token not in self._fuzzy_cache:
+                if len(self._fuzzy_cache) >= self.FUZZY_CACHE_SIZE:
+                    self._fuzzy_cache.clear()
+                self._fuzzy_cache[token] = self.fuzzy_index.lookup(token, allowed=children)
+            corrected = self._fuzzy_cache[token]
+        else:
+            corrected = self.fuzzy_index.lookup(token, allowed=children)
+        return (children.get(corrected) if corrected is not None else None), False
+
+    def find_all(self, message: Union[str, MessageAnalysis]) -> List[Dict[str, Any]]:
+        """
+        All tutor mentions in a message (longest match per position)
+        Each match has: text, alias, tutor_ids, start_token, end_token
+        """
+        scanned = self._scan(message)
+        tokens = [token for token, _, _ in scanned]
+        matches = []
+        with self._lock:
+            i = 0
+            while i < len(tokens):
+                children = self.root
+                best = None
+                j = i
+                exact = True
+                while j < len(tokens):
+                    # Fuzzy only for name-like tokens: capitalized, or after an exact match
+                    fuzzy = scanned[j][1] or (j > i and exact)
+                    node, matched_exactly = self._resolve_token(tokens[j], children, fuzzy)
+                    if node is None and scanned[j][2] is not None:
+                        node, matched_exactly = children.get(scanned[j][2]), False
+                    if node is None:
+                        break
+                    exact = exact and matched_exactly
+                    j += 1
+                    if node['ids']:
+                        best = (j, dict(node['ids']))
+                    children = node['children']
+
+                if best is None:
+                    i += 1
+                    continue
+
+                end, ids = best
+                matches.append({
+                    'text': ' '.join(tokens[i:end]),
+                    'alias': next(iter(ids.values())),
+                    'tutor_ids': sorted(ids),
+                    'start_token': i,
+                    'end_token': end
+                })
+                i = end
+        return matches
+
+    def resolve(self, message: Union[str, MessageAnalysis]) -> Optional[Dict[str, Any]]:
+        """
+        Best tutor mention: the first one that names a single tutor, else the
+        first (ambiguous) mention. Returns None when nothing matches.
+        """
+        matches = self.find_all(message)
+        if not matches:
+            return None
+        for match in matches:
+            if len(match['tutor_ids']) == 1:
+                return match
+        return matches[0]
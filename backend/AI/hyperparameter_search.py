@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cross-validated hyperparameter search for the intent models
+
+Candidates are (vectorizer, classifier) parameter pairs from SEARCH_SPACES,
+either the full grid or a random sample of it. Candidates sharing a
+vectorizer configuration are evaluated together in one worker: the TF-IDF
+features of every fold are fitted once and reused by all classifier
+variations, so classifier-only changes never refit TF-IDF. Workers run in
+a process pool, one vectorizer configuration per task.
+
+For every candidate the mean/std cross-validated accuracy and the
+per-message inference latency (one message per call, as served) are
+reported. The winner can be refitted on the whole corpus and saved with
+its parameters in models/intent_model_<type>.params.json.
+
+Run through train_models.py:
+    python3 train_models.py search --model logistic [--strategy random --n-iter 30]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import statistics
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import MODEL_PARAMS, build_classifier, tuned_params_path
+
+# Values tried for each parameter (merged over MODEL_PARAMS defaults)
+SEARCH_SPACES = {
+    'logistic': {
+        'tfidf': {'ngram_range': [(1, 1), (1, 2), (1, 3)], 'max_features': [200, 500, 1000, None],
+                  'min_df': [1, 2]},
+        'clf': {'C': [0.1, 0.3, 1.0, 3.0, 10.0]}
+    },
+    'decision_tree': {
+        'tfidf': {'ngram_range': [(1, 1), (1, 2)], 'max_features': [300, 1000, None], 'min_df': [1, 2]},
+        'clf': {'max_depth': [5, 10, 20, None], 'min_samples_leaf': [1, 2, 4]}
+    },
+    'knn': {
+        'tfidf': {'ngram_range': [(1, 1), (1, 2)], 'max_features': [200, 500, None], 'min_df': [1, 2]},
+        'clf': {'n_neighbors': [3, 5, 7, 11], 'weights': ['uniform', 'distance']}
+    }
+}
+
+# Messages timed one at a time for the latency column
+LATENCY_SAMPLE_SIZE = 50
+
+# Corpus and fold indices shared with pool workers through the initializer
+_shared = {}
+
+
+def _init_worker(texts, labels, folds):
+    _shared['texts'] = texts
+    _shared['labels'] = labels
+    _shared['folds'] = folds
+
+
+def expand_grid(space):
+    """All combinations of a {param: [values]} dict, as a list of dicts"""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def candidates(model_type, strategy='grid', n_iter=20, seed=42):
+    """(tfidf_params, clf_params) pairs to evaluate"""
+    space = SEARCH_SPACES[model_type]
+    grid = list(itertools.product(expand_grid(space['tfidf']), expand_grid(space['clf'])))
+    if strategy == 'random' and n_iter < len(grid):
+        grid = random.Random(seed).sample(grid, n_iter)
+    elif strategy not in ('grid', 'random'):
+        raise ValueError("strategy must be 'grid' or 'random'")
+    return grid
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def evaluate_vectorizer_group(model_type, tfidf_params, clf_param_list):
+    """
+    Evaluate every classifier variation on one vectorizer configuration
+    TF-IDF is fitted once per fold and the features are reused for all variations.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    texts, labels, folds = _shared['texts'], _shared['labels'], _shared['folds']
+    vectorizer_params = {**MODEL_PARAMS[model_type]['tfidf'], **tfidf_params}
+
+    start = time.perf_counter()
+    features = []  # per fold: (vectorizer, X_train, y_train, X_val, y_val)
+    for train_idx, val_idx in folds:
+        vectorizer = TfidfVectorizer(**vectorizer_params)
+        X_train = vectorizer.fit_transform([texts[i] for i in train_idx])
+        X_val = vectorizer.transform([texts[i] for i in val_idx])
+        features.append((vectorizer, X_train, [labels[i] for i in train_idx],
+                         X_val, [labels[i] for i in val_idx]))
+    vectorize_seconds = time.perf_counter() - start
+
+    results = []
+    for clf_params in clf_param_list:
+        scores = []
+        for _, X_train, y_train, X_val, y_val in features:
+            clf = build_classifier(model_type, clf_params)
+            clf.fit(X_train, y_train)
+            predicted = clf.predict(X_val)
+            scores.append(sum(p == y for p, y in zip(predicted, y_val)) / len(y_val))
+
+        # Serving classifies one message per call: time exactly that
+        vectorizer, _, _, _, _ = features[-1]
+        sample = [texts[i] for i in folds[-1][1][:LATENCY_SAMPLE_SIZE]]
+        start = time.perf_counter()
+        for text in sample:
+            clf.predict_proba(vectorizer.transform([text]))
+        latency_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        results.append({
+            'tfidf': tfidf_params,
+            'clf': clf_params,
+            'accuracy': statistics.mean(scores),
+            'accuracy_std': statistics.pstdev(scores),
+            'latency_us': latency_us,
+            'n_features': len(vectorizer.vocabulary_)
+        })
+    return results, vectorize_seconds
+
+
+def run_search(model_type, texts, labels, strategy='grid', n_iter=20, folds=5, jobs=None, seed=42):
+    """
+    Cross-validated search over SEARCH_SPACES[model_type]
+    Returns (results sorted best first, summary dict)
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    fold_indices = [(list(train), list(val)) for train, val in splitter.split(texts, labels)]
+
+    groups = {}
+    for tfidf_params, clf_params in candidates(model_type, strategy, n_iter, seed):
+        groups.setdefault(_key(tfidf_params), (tfidf_params, []))[1].append(clf_params)
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(groups)))
+    start = time.perf_counter()
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(texts, labels, fold_indices)) as pool:
+            futures = [pool.submit(evaluate_vectorizer_group, model_type, tfidf_params, clf_list)
+                       for tfidf_params, clf_list in groups.values()]
+            outcomes = [future.result() for future in futures]
+    else:
+        _init_worker(texts, labels, fold_indices)
+        outcomes = [evaluate_vectorizer_group(model_type, tfidf_params, clf_list)
+                    for tfidf_params, clf_list in groups.values()]
+    elapsed = time.perf_counter() - start
+
+    results = [result for group_results, _ in outcomes for result in group_results]
+    # Best accuracy first; among equals the faster candidate wins
+    results.sort(key=lambda r: (-round(r['accuracy'], 6), r['latency_us']))
+    summary = {
+        'model': model_type,
+        'strategy': strategy,
+        'folds': folds,
+        'candidates': len(results),
+        'vectorizer_configs': len(groups),
+        'tfidf_fits': len(groups) * folds,
+        'tfidf_fits_without_cache': len(results) * folds,
+        'vectorize_seconds': sum(seconds for _, seconds in outcomes),
+        'seconds': elapsed,
+        'jobs': jobs
+    }
+    return results, summary
+
+
+def _format_params(params):
+    return ' '.join(f"{name}={value}" for name, value in sorted(params.items())) or '-'
+
+
+def print_results(results, summary, top=None):
+    shown = results[:top] if top else results
+    print(f"{'rank':>4} {'accuracy':>9} {'± std':>7} {'µs/msg':>8} {'feats':>6}  parameters")
+    for rank, result in enumerate(shown, 1):
+        print(f"{rank:4d} {result['accuracy']:9.4f} {result['accuracy_std']:7.4f} "
+              f"{result['latency_us']:8.1f} {result['n_features']:6d}  "
+              f"{_format_params(result['tfidf'])} | {_format_params(result['clf'])}")
+    if top and len(results) > top:
+        print(f"  ... {len(results) - top} more")
+    print(f"\n{summary['candidates']} candidates x {summary['folds']} folds in {summary['seconds']:.2f} s "
+          f"({summary['jobs']} workers); TF-IDF fitted {summary['tfidf_fits']} times "
+          f"instead of {summary['tfidf_fits_without_cache']} "
+          f"({summary['vectorize_seconds']:.2f} s spent vectorizing)")
+
+
+def save_best_params(best, summary, models_dir=None):
+    """Write the winning configuration next to the model; returns the path"""
+    path = tuned_params_path(summary['model'], models_dir)
+    record = {
+        'model': summary['model'],
+        'tfidf': {**MODEL_PARAMS[summary['model']]['tfidf'], **best['tfidf']},
+        'clf': {**MODEL_PARAMS[summary['model']]['clf'], **best['clf']},
+        'cv_accuracy': best['accuracy'],
+        'cv_accuracy_std': best['accuracy_std'],
+        'latency_us': best['latency_us'],
+        'folds': summary['folds'],
+        'strategy': summary['strategy'],
+        'candidates': summary['candidates'],
+        'searched_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
@@ -16,10 +16,14 @@ if str(CORE_DIR) not in sys.path:
 
 from dialog_manager import DialogManager
 from intent_classifier import load_model, predict_intent
+from ensemble import EnsembleModel, ENSEMBLE_MODELS
+
+# Loaded on first use and kept, instead of reading every pickle per comparison
+_loaded_models = {}
 
 
 def compare_all_models(text):
-    """Compare all three ML models on the same input"""
+    """Compare all three ML models and their ensemble on the same input"""
     models = ['logistic', 'decision_tree', 'knn']
     results = {}
     
@@ -29,8 +33,9 @@ def compare_all_models(text):
     
     for model_type in models:
         try:
-            model = load_model(model_type)
-            result = predict_intent(model, text)
+            if model_type not in _loaded_models:
+                _loaded_models[model_type] = load_model(model_type)
+            result = predict_intent(_loaded_models[model_type], text)
             results[model_type] = result
             
             # Format model name for display
@@ -40,6 +45,13 @@ def compare_all_models(text):
             model_display = model_type.replace('_', ' ').title()
             print(f"{model_display:20} → Error: {str(e)[:30]}...")
     
+    if all(model_type in _loaded_models for model_type in ENSEMBLE_MODELS):
+        if 'ensemble' not in _loaded_models:
+            _loaded_models['ensemble'] = EnsembleModel({t: _loaded_models[t] for t in ENSEMBLE_MODELS})
+        result = predict_intent(_loaded_models['ensemble'], text)
+        results['ensemble'] = result
+        print(f"{'Ensemble':20} → {result['intent']:15} ({result['confidence']:.1%})")
+    
     print("="*70)
     return results
 
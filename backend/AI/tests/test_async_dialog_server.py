@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async dialog server: a failed batch retries only the requests that did not complete
+
+Usage:
+    python3 -m pytest tests/test_async_dialog_server.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from async_dialog_server import MicroBatcher
+from dialog_manager import DialogManager
+from session_store import create_session_store
+
+
+@pytest.fixture
+def batcher():
+    batcher = MicroBatcher(DialogManager(session_store=create_session_store('memory')))
+    yield batcher
+    batcher.executor.shutdown(wait=True)
+
+
+def test_failed_batch_does_not_apply_session_updates_twice(batcher, monkeypatch):
+    manager = batcher.manager
+    writes = []
+    put = manager.session_store.put
+    monkeypatch.setattr(manager.session_store, 'put',
+                        lambda session_id, context: (writes.append(session_id), put(session_id, context)))
+    respond = manager._respond
+    failed = []
+
+    def respond_failing_once(intent_result, entities, context, session_id, timer=None):
+        if session_id == 'bad' and not failed:
+            failed.append(session_id)
+            raise RuntimeError("model hiccup")
+        return respond(intent_result, entities, context, session_id, timer)
+
+    monkeypatch.setattr(manager, '_respond', respond_failing_once)
+    outcomes = batcher._process([("find math tutor", None, 'a'), ("book it tomorrow", None, 'b'),
+                                 ("hello", None, 'bad'), ("show my bookings", None, 'c')])
+
+    assert [ok for ok, _ in outcomes] == [True, True, True, True]
+    assert failed == ['bad']
+    # Requests completed before the failure were not run again
+    assert writes == ['a', 'b', 'bad', 'c']
+    assert outcomes[0][1]['entities']['subject'] == 'math'
+
+
+def test_message_failing_on_retry_only_fails_itself(batcher, monkeypatch):
+    respond = batcher.manager._respond
+
+    def respond_failing(intent_result, entities, context, session_id, timer=None):
+        if session_id == 'bad':
+            raise RuntimeError("bad message")
+        return respond(intent_result, entities, context, session_id, timer)
+
+    monkeypatch.setattr(batcher.manager, '_respond', respond_failing)
+    outcomes = batcher._process([("hi", None, 'a'), ("hello", None, 'bad'), ("find math tutor", None, 'c')])
+    assert [ok for ok, _ in outcomes] == [True, False, True]
+    assert isinstance(outcomes[1][1], RuntimeError)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact KNN: the batched postings search finds the same neighbors as the full scan
+
+Usage:
+    python3 -m pytest tests/test_compact_knn.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from compact_model import load_compact_model
+from intent_classifier import train_model, export_compact_model, preprocess_texts, load_corpus
+
+
+def test_postings_search_matches_full_scan(tmp_path):
+    texts, labels = load_corpus()
+    model = load_compact_model(export_compact_model(train_model('knn', texts, labels), tmp_path))
+    model.scan_max_rows = 0
+    queries = texts[::7] + preprocess_texts(["can i book a math lesson tomorrow", "cancel it", "", "zzz qqq"])
+    features = model.featurize(queries)
+
+    scan_distances = model.kneighbors_scan(features)[0]
+    distances = model.kneighbors(features)[0]
+    assert np.allclose(distances, scan_distances, rtol=0, atol=1e-12)
+    # Rows tied at the same distance may come in another order, but the votes are the same
+    probabilities = model.predict_proba_features(features)
+    model.scan_max_rows = len(texts)
+    assert (probabilities == model.predict_proba_features(features)).all()
+    model.scan_max_rows = 0
+    # A batch finds the neighbors of its queries like one query at a time
+    for row, query in enumerate(queries):
+        single = model.featurize([query])
+        assert (model.kneighbors(single)[0][0] == distances[row]).all()
+        assert (model.predict_proba_features(single)[0] == probabilities[row]).all()
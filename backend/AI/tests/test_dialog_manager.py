@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dialog manager: response cache and context carried between turns
+
+Usage:
+    python3 -m pytest tests/test_dialog_manager.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from entity_extractor import EntityExtractor
+from nlp_utils import TextNormalizer
+from session_store import create_session_store, session_context
+from tutor_gazetteer import TutorGazetteer
+
+TUTORS = [
+    {'tutor_id': 1, 'name': 'Walter', 'surname': 'White'},
+    {'tutor_id': 2, 'name': 'Jesse', 'surname': 'Pinkman'},
+    {'tutor_id': 3, 'name': 'Jesse', 'surname': 'James'},
+]
+
+
+@pytest.fixture(scope='module')
+def uncached():
+    return DialogManager()
+
+
+@pytest.fixture
+def tutors(monkeypatch):
+    monkeypatch.setattr(EntityExtractor, 'tutor_gazetteer', TutorGazetteer())
+    monkeypatch.setattr(TextNormalizer, '_extra_words', {})
+    monkeypatch.setattr(TextNormalizer, '_token_cache', {})
+    EntityExtractor.load_tutors(TUTORS)
+
+
+@pytest.mark.parametrize('first, second', [
+    ("find mth tutor", "find math tutor"),
+    ("find englis tutor", "find english tutor"),
+    ("book a lesson tommorow at 5pm", "book a lesson tomorrow at 5pm"),
+    ("find math tutor", "find maths tutor"),
+])
+def test_cache_hit_between_misspelled_and_correct_message(uncached, first, second):
+    manager = DialogManager(cache_size=16)
+    manager.process_message(first)
+    result = manager.process_message(second)
+    assert manager.cache_stats()['hits'] == 1
+    expected = uncached.process_message(second)
+    assert result['entities'] == expected['entities']
+    assert result['response'] == expected['response']
+
+
+def test_new_tutor_replaces_the_whole_tutor_context(uncached, tutors):
+    first = uncached.process_message("book a math lesson with Walter White tomorrow")
+    assert first['context']['tutor_id'] == 1
+    context = uncached.process_message("actually with Jesse at 5pm", first['context'])['context']
+    # Ambiguous now: the resolved id of the earlier tutor must not survive
+    assert context['tutor_name'] == 'Jesse'
+    assert context['tutor_ids'] == [2, 3]
+    assert 'tutor_id' not in context
+    assert context['subject'] == 'math'
+
+    context = uncached.process_message("with Jesse Pinkman please", context)['context']
+    assert (context['tutor_name'], context['tutor_id']) == ('Jesse Pinkman', 2)
+    assert 'tutor_ids' not in context
+
+
+def test_new_time_without_end_drops_the_earlier_range(uncached):
+    context = uncached.process_message("book a math lesson tomorrow between 2 and 4pm")['context']
+    assert (context['time'], context['time_end']) == ('14:00', '16:00')
+    context = uncached.process_message("actually at 5pm", context)['context']
+    assert context['time'] == '17:00'
+    assert 'time_end' not in context
+    assert context['date'] == uncached.process_message("tomorrow")['entities']['date']
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_session_store_keeps_only_the_replaced_groups(tutors, tmp_path, backend):
+    store = create_session_store(backend, str(tmp_path / 'sessions.sqlite3'))
+    manager = DialogManager(session_store=store)
+    manager.process_message("book a math lesson with Walter White tomorrow between 2 and 4pm", session_id='s1')
+    result = manager.process_message("actually with Jesse at 5pm", session_id='s1')
+    stored = store.get('s1')
+    assert stored == session_context(result['context'])
+    assert (stored['tutor_ids'], stored['time'], stored['subject']) == ([2, 3], '17:00', 'math')
+    assert 'tutor_id' not in stored and 'time_end' not in stored
+
+    # A legacy client context replaces the stored tutor the same way
+    result = manager.process_message("ok", {'tutor_name': 'Walter White', 'tutor_id': 1}, session_id='s1')
+    assert 'tutor_ids' not in store.get('s1')
+    assert result['context']['tutor_id'] == 1
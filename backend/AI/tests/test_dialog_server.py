@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dialog server: reference tables synced in chunks below the request line limit,
+socket permissions and startup next to a running server
+
+Usage:
+    python3 -m pytest tests/test_dialog_server.py
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from dialog_server import MAX_REQUEST_BYTES, ChunkedTables, DialogServer, bind_socket, handle_request
+from entity_extractor import EntityExtractor
+from nlp_utils import TextNormalizer
+from tutor_gazetteer import TutorGazetteer
+
+TUTORS = [{'tutor_id': i, 'name': f"Name{i}", 'surname': f"Surname{i}"} for i in range(1, 2001)]
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(EntityExtractor, 'tutor_gazetteer', TutorGazetteer())
+    monkeypatch.setattr(TextNormalizer, '_extra_words', {})
+    monkeypatch.setattr(TextNormalizer, '_token_cache', {})
+    monkeypatch.setattr('dialog_server.chunked_tables', ChunkedTables())
+    return DialogManager()
+
+
+def chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield {'action': 'load_tutors', 'tutors': rows[start:start + size],
+               'append': start > 0, 'more': start + size < len(rows)}
+
+
+def test_large_tutor_table_is_applied_with_the_last_chunk(manager):
+    assert len(json.dumps({'action': 'load_tutors', 'tutors': TUTORS})) > MAX_REQUEST_BYTES
+    requests = list(chunks(TUTORS, 500))
+    assert all(len(json.dumps(request)) < MAX_REQUEST_BYTES for request in requests)
+
+    for request in requests[:-1]:
+        assert handle_request(manager, request) == {'success': True, 'result': {'pending': True}}
+        # Nothing is served until the table is complete
+        assert not EntityExtractor.tutor_gazetteer.tutors
+    response = handle_request(manager, requests[-1])
+    assert response['success']
+    assert len(EntityExtractor.tutor_gazetteer.tutors) == len(TUTORS)
+
+
+def test_first_chunk_replaces_an_unfinished_sync(manager):
+    handle_request(manager, next(chunks(TUTORS[:10], 5)))
+    for request in chunks(TUTORS[100:110], 5):
+        response = handle_request(manager, request)
+    assert response['success']
+    assert sorted(EntityExtractor.tutor_gazetteer.tutors) == list(range(101, 111))
+
+
+def test_append_without_a_sync_in_progress_fails(manager):
+    response = handle_request(manager, {'action': 'load_tutors', 'tutors': TUTORS[:5], 'append': True})
+    assert response == {'success': False, 'error': 'No load_tutors sync in progress'}
+    response = handle_request(manager, {'action': 'load_tutors', 'tutors': 'x'})
+    assert response == {'success': False, 'error': 'Tutors must be a list'}
+
+
+def test_whole_table_in_one_request_still_works(manager):
+    response = handle_request(manager, {'action': 'load_tutors', 'tutors': TUTORS[:3]})
+    assert response['success']
+    assert sorted(EntityExtractor.tutor_gazetteer.tutors) == [1, 2, 3]
+
+
+def test_socket_is_not_world_accessible(tmp_path):
+    sock = bind_socket(str(tmp_path / 'dialog.sock'))
+    try:
+        assert stat.S_IMODE(os.stat(tmp_path / 'dialog.sock').st_mode) == 0o660
+    finally:
+        sock.close()
+
+
+def test_stale_socket_is_replaced_but_a_live_server_is_not(tmp_path, manager):
+    socket_path = str(tmp_path / 'dialog.sock')
+    bind_socket(socket_path).close()  # bound, never listening: left over from a crash
+    server = DialogServer(socket_path, manager)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(RuntimeError, match='already listening'):
+            DialogServer(socket_path, manager)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(b'{"action": "ping"}\n')
+            assert json.loads(client.makefile().readline()) == {'success': True, 'result': 'pong'}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_regular_file_is_never_removed(tmp_path, manager):
+    path = tmp_path / 'dialog.sock'
+    path.write_text('not a socket')
+    with pytest.raises(RuntimeError, match='not a socket'):
+        DialogServer(str(path), manager)
+    assert path.read_text() == 'not a socket'
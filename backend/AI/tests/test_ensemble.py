@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ensemble serving: members promoted in the model registry are swapped in
+
+Usage:
+    python3 -m pytest tests/test_ensemble.py
+"""
+
+import sys
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from ensemble import EnsembleModel, ENSEMBLE_MODELS
+from intent_classifier import load_model
+from model_registry import ModelRegistry
+
+
+def test_promoted_member_is_swapped_in(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    manager = DialogManager(registry=registry, ensemble=True)
+    watcher = manager.model_watcher(interval=0)
+    assert manager.model_info() == {'type': 'ensemble', 'version': None,
+                                    'versions': {model_type: None for model_type in ENSEMBLE_MODELS}}
+    assert not watcher.check()
+
+    old_ensemble = manager.intent_model
+    version = registry.publish(load_model('logistic'), 'logistic')
+    registry.promote('logistic', version)
+    assert watcher.check()
+
+    assert isinstance(manager.intent_model, EnsembleModel)
+    assert manager.intent_model is not old_ensemble
+    assert manager.intent_model.models['logistic'] is not old_ensemble.models['logistic']
+    assert manager.intent_model.models['knn'] is old_ensemble.models['knn']
+    assert manager.model_info()['versions']['logistic'] == version
+    assert manager.process_message("cancel my booking")['intent'] == 'cancel_booking'
+    # Nothing new was promoted
+    assert not watcher.check()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Entity extractor: course tables and action keywords
+
+Usage:
+    python3 -m pytest tests/test_entity_extractor.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from entity_extractor import EntityExtractor, DEFAULT_SUBJECTS, subject_table_from_courses
+from nlp_utils import TextNormalizer, analyze_message
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    monkeypatch.setattr(EntityExtractor, 'SUBJECTS', EntityExtractor.SUBJECTS)
+    monkeypatch.setattr(EntityExtractor, '_subject_matcher', None)
+    monkeypatch.setattr(TextNormalizer, '_extra_words', {})
+    monkeypatch.setattr(TextNormalizer, '_token_cache', {})
+    return EntityExtractor()
+
+
+def test_deleted_courses_disappear(extractor):
+    EntityExtractor.load_subjects(subject_table_from_courses(
+        [{'course_name': 'Mathematics'}, {'course_name': 'Computer Science'}]))
+    assert extractor.extract_subject("help with computer science") == 'computer science'
+
+    EntityExtractor.load_subjects(subject_table_from_courses([{'course_name': 'Biology'}]))
+    assert extractor.extract_subject("help with computer science") is None
+    assert extractor.extract_subject("help with biology") == 'biology'
+    assert 'computer science' not in DEFAULT_SUBJECTS
+
+
+@pytest.mark.parametrize('text, action', [
+    ("I want to make a booking", 'book'),
+    ("I need to reschedule", 'book'),
+    ("my scheduled lessons", 'book'),
+    ("reserving a slot for friday", 'book'),
+    ("request a cancellation", 'cancel'),
+    ("please cancel it", 'cancel'),
+    ("showing my lessons", 'view'),
+    ("I like to listen to music", None),
+])
+def test_action_inflections(extractor, text, action):
+    assert extractor.extract_action_type(text) == action
+
+
+@pytest.mark.parametrize('text, subject, mention', [
+    ("find maths tutor", 'math', "maths"),
+    ("find englis tutor", 'english', "englis"),
+    ("find phisics tutor", 'physics', "phisics"),
+    ("i need a mathh teacher", 'math', "mathh"),
+    ("Any (Maths) tutors?", 'math', "Maths"),
+])
+def test_subjects_are_matched_after_typo_correction(extractor, text, subject, mention):
+    analysis = analyze_message(text)
+    assert extractor.extract_all(analysis)['subject'] == subject
+    span = analysis.spans['subject'][0]
+    # Spans point into the original text, not the corrected one
+    assert text[span['start']:span['end']] == mention
+
+
+def test_actions_are_matched_after_typo_correction(extractor):
+    analysis = analyze_message("sheduel a lesson")
+    assert extractor.extract_all(analysis)['action'] == 'book'
+    assert [(span['start'], span['end']) for span in analysis.spans['action']] == [(0, 7)]
+
+
+def test_misspelled_subject_needs_no_clarification(extractor):
+    result = DialogManager().process_message("find englis tutor")
+    assert result['entities']['subject'] == 'english'
+    assert not result['needs_clarification']
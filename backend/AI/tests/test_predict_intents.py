@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+predict_intents: top_k is validated instead of failing inside the ranking
+
+Usage:
+    python3 -m pytest tests/test_predict_intents.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from dialog_manager import DialogManager
+from dialog_server import handle_request
+from intent_classifier import predict_intents
+
+
+@pytest.fixture(scope='module')
+def manager():
+    return DialogManager()
+
+
+@pytest.mark.parametrize('top_k', [0, -1, 1.5, '2', True, None])
+def test_invalid_top_k_is_rejected(manager, top_k):
+    with pytest.raises(ValueError):
+        predict_intents(manager.intent_model, ["cancel my booking"], top_k)
+    response = handle_request(manager, {'action': 'predict_intents', 'texts': ["cancel my booking"],
+                                        'top_k': top_k})
+    assert response == {'success': False, 'error': 'top_k must be a positive integer'}
+
+
+def test_top_k_limits_the_ranking(manager):
+    response = handle_request(manager, {'action': 'predict_intents', 'texts': ["cancel my booking", "hi"],
+                                        'top_k': 2})
+    assert response['success']
+    assert [len(result['top_intents']) for result in response['result']] == [2, 2]
+    assert response['result'][0]['intent'] == 'cancel_booking'
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request profiler: redaction of personal data in captures
+
+Usage:
+    python3 -m pytest tests/test_request_profiler.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from request_profiler import redact_message
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("call me at 555-123-4567", "xxxx me at ###-###-####"),
+    ("call me at 555.123.4567", "xxxx me at ###.###.####"),
+    ("+7 912 345 67 89", "+# ### ### ## ##"),
+    ("my number is +7 (912) 345-67-89", "my xxxxxx is +# (###) ###-##-##"),
+    ("call at 12 345 67 89", "xxxx at ## ### ## ##"),
+])
+def test_phone_numbers_are_masked(text, expected):
+    assert redact_message(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("card 4111 1111 1111 1111", "xxxx #### #### #### ####"),
+    ("card 4111-1111-1111-1111", "xxxx ####-####-####-####"),
+    ("card 4111111111111111", "xxxx ################"),
+])
+def test_card_numbers_are_masked(text, expected):
+    assert redact_message(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    "find math tutor on 20.10.2026 at 14:30",
+    "book 2025-10-20 at 15:00",
+    "between 2 and 4pm tomorrow",
+])
+def test_dates_and_times_are_kept(text):
+    assert redact_message(text) == text
+
+
+def test_other_numbers_are_masked():
+    assert redact_message("room 42 at 5pm") == "xxxx ## at 5pm"
+    assert redact_message("my student id is 20261234") == "my student xx is ########"
+
+
+def test_names_and_emails_are_masked():
+    assert redact_message("book with Walter Whitman, mail walter@example.com") == \
+        "book with Xxxxxx Xxxxxxx, xxxx <email>"
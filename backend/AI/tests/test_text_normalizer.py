@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TextNormalizer: valid words and proper nouns are never rewritten
+
+Usage:
+    python3 -m pytest tests/test_text_normalizer.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from nlp_utils import TextNormalizer, analyze_message
+from entity_extractor import EntityExtractor
+
+
+@pytest.fixture(autouse=True)
+def clean_known_words(monkeypatch):
+    monkeypatch.setattr(TextNormalizer, '_extra_words', {})
+    monkeypatch.setattr(TextNormalizer, '_token_cache', {})
+    monkeypatch.setattr(EntityExtractor, 'tutor_gazetteer', EntityExtractor.tutor_gazetteer.__class__())
+
+
+def test_capitalized_names_are_kept():
+    text = "Book with Walter White on Friday at 3pm"
+    assert TextNormalizer.normalize(text) == "book with walter white on friday at 3pm"
+    assert analyze_message(text).normalized == TextNormalizer.normalize(text)
+
+
+def test_english_words_are_kept():
+    assert TextNormalizer.correct_token('informatics') == 'informatics'
+    assert TextNormalizer.normalize("informatics lessons") == "informatics lessons"
+
+
+def test_tutor_names_are_known_words():
+    assert TextNormalizer.correct_token('walter') == 'later'
+    EntityExtractor.load_tutors([{'tutor_id': 1, 'name': 'Walter', 'surname': 'Whitman'}])
+    assert TextNormalizer.normalize("lesson with walter whitman") == "lesson with walter whitman"
+
+
+def test_course_names_are_known_words(monkeypatch):
+    monkeypatch.setattr(EntityExtractor, 'SUBJECTS', dict(EntityExtractor.SUBJECTS))
+    monkeypatch.setattr(EntityExtractor, '_subject_matcher', None)
+    EntityExtractor.load_subjects({'numerics': ['numerics']})
+    assert TextNormalizer.correct_token('numerics') == 'numerics'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("cancle my bookig", "cancel my booking"),
+    ("find a tutr for tommorow", "find a tutor for tomorrow"),
+    ("Cancle my lesn", "cancel my lesson"),
+    ("show my apointmentss", "show my appointments"),
+])
+def test_typos_are_still_corrected(text, expected):
+    assert TextNormalizer.normalize(text) == expected
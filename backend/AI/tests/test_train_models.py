@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+train_models.py: compact model directories are swapped without a gap
+
+Usage:
+    python3 -m pytest tests/test_train_models.py
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+AI_DIR = (CURRENT_DIR / '..').resolve()
+if str(AI_DIR) not in sys.path:
+    sys.path.insert(0, str(AI_DIR))
+
+from train_models import replace_dir_atomically, versioned_dir
+
+
+def write_version(target: Path, content: str) -> Path:
+    new_dir = versioned_dir(target)
+    new_dir.mkdir()
+    (new_dir / 'config.json').write_text(content)
+    return new_dir
+
+
+def test_plain_directory_is_converted_to_a_link(tmp_path):
+    target = tmp_path / 'intent_model_logistic'
+    target.mkdir()
+    (target / 'config.json').write_text('old')
+
+    replace_dir_atomically(write_version(target, 'new'), target)
+    assert target.is_symlink()
+    assert (target / 'config.json').read_text() == 'new'
+    # The previous directory is kept until the next swap
+    assert (tmp_path / '.intent_model_logistic.v0' / 'config.json').read_text() == 'old'
+
+
+def test_only_the_previous_version_is_kept(tmp_path):
+    target = tmp_path / 'intent_model_knn'
+    first = write_version(target, '1')
+    replace_dir_atomically(first, target)
+    second = write_version(target, '2')
+    replace_dir_atomically(second, target)
+    third = write_version(target, '3')
+    replace_dir_atomically(third, target)
+
+    assert (target / 'config.json').read_text() == '3'
+    assert not first.exists() and second.exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ['intent_model_knn', second.name, third.name])
+
+
+def test_readers_never_see_a_missing_directory(tmp_path):
+    target = tmp_path / 'intent_model_logistic'
+    replace_dir_atomically(write_version(target, '0'), target)
+    missing = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            if not (target / 'config.json').exists():
+                missing.append(1)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(200):
+            replace_dir_atomically(write_version(target, str(i)), target)
+    finally:
+        done.set()
+        reader.join()
+    assert not missing
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tutor gazetteer: fuzzy matching only for name-like tokens
+
+Usage:
+    python3 -m pytest tests/test_tutor_gazetteer.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / '..' / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from nlp_utils import analyze_message
+from tutor_gazetteer import TutorGazetteer
+
+TUTORS = [
+    {'tutor_id': 1, 'name': 'Walter', 'surname': 'Whitman'},
+    {'tutor_id': 5, 'name': 'Marie', 'surname': 'Curie'},
+    {'tutor_id': 7, 'name': 'Charles', 'surname': 'Darwin'},
+    {'tutor_id': 8, 'name': 'Grace', 'surname': 'Hopper'},
+    {'tutor_id': 9, 'name': 'John', 'surname': 'Smith'},
+]
+
+
+@pytest.fixture
+def gazetteer():
+    gazetteer = TutorGazetteer()
+    gazetteer.sync(TUTORS)
+    return gazetteer
+
+
+@pytest.mark.parametrize('text', [
+    "find math tutor for my grade 9 exam",
+    "what charges apply",
+    "curve sketching help",
+    "Curve sketching help",
+    "I need help. Curve sketching is hard",
+])
+def test_ordinary_words_do_not_resolve(gazetteer, text):
+    assert gazetteer.resolve(text) is None
+    assert gazetteer.resolve(analyze_message(text)) is None
+
+
+@pytest.mark.parametrize('text, tutor_id', [
+    ("book with walter on friday", 1),
+    ("book with Walterr on friday", 1),
+    ("lesson with Hoper tomorrow", 8),
+    ("book with walter whitmann", 1),
+    ("Is Curie's class full?", 5),
+])
+def test_names_resolve(gazetteer, text, tutor_id):
+    assert gazetteer.resolve(text)['tutor_ids'] == [tutor_id]
+    assert gazetteer.resolve(analyze_message(text))['tutor_ids'] == [tutor_id]
+
+
+def test_lowercase_typo_is_not_fuzzed(gazetteer):
+    assert gazetteer.resolve("book with walterr") is None
+
+
+def test_fuzzy_cache_is_bounded(gazetteer):
+    gazetteer.FUZZY_CACHE_SIZE = 3
+    for name in ('Aaaaax', 'Bbbbbx', 'Cccccx', 'Dddddx'):
+        gazetteer.resolve(f"book with {name}")
+    assert len(gazetteer._fuzzy_cache) <= 3
+
+
+def test_analysis_tokens_supply_typo_corrections(gazetteer):
+    # "smithh" is lowercase, so not fuzzed here, but the shared analysis corrects it
+    assert gazetteer.resolve("lesson with smithh") is None
+    assert gazetteer.resolve(analyze_message("lesson with smithh"))['tutor_ids'] == [9]
+    assert gazetteer.resolve(analyze_message("lesson with john smithh"))['alias'] == 'John Smith'
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Train all intent models in parallel from one preprocessed corpus
+
+The corpus is loaded and preprocessed once (each distinct text normalized
+once, in parallel chunks for large corpora), then every requested model
+type is trained concurrently in a process pool. Models are written to a
+temporary file and renamed into models/, so a serving process never reads
+a half-written pickle; the compact model types are also re-exported to
+the compact serving format, checked for parity and published by pointing
+the models/intent_model_<type> symlink at the new directory. Every model is published to
+the model registry (models/registry) as a new version and promoted, so
+running servers reload it; --no-promote only publishes it.
+
+The search subcommand runs a cross-validated hyperparameter search
+(hyperparameter_search.py); with --save the winner is refitted, saved and
+its parameters written next to the model, where "train --tuned" finds them.
+
+Usage:
+    python3 train_models.py [train] [--models logistic,decision_tree,knn] [--jobs N]
+                            [--data-dir DIR] [--output-dir DIR] [--tuned] [--no-promote]
+    python3 train_models.py search --model logistic [--strategy grid|random] [--n-iter N]
+                            [--folds K] [--jobs N] [--top N] [--save]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+CURRENT_DIR = Path(__file__).parent
+CORE_DIR = (CURRENT_DIR / 'core').resolve()
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from intent_classifier import (MODEL_TYPES, COMPACT_MODEL_TYPES, load_training_data, preprocess_texts,
+                               train_model, save_model, export_compact_model, verify_compact_model,
+                               load_tuned_params)
+from compact_model import load_compact_model
+from model_registry import ModelRegistry
+
+# Below this many distinct texts, starting preprocessing workers costs more than it saves
+PARALLEL_PREPROCESS_MIN_TEXTS = 20000
+
+# Corpus shared with pool workers through the initializer (inherited, not re-sent per task)
+_corpus = {}
+
+
+def _init_worker(texts, labels):
+    _corpus['texts'] = texts
+    _corpus['labels'] = labels
+
+
+def _chunks(items, count):
+    size = max(1, -(-len(items) // count))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def preprocess_corpus(raw_texts, jobs):
+    """Preprocess every distinct text once, in parallel chunks for large corpora"""
+    unique = list(dict.fromkeys(raw_texts))
+    if jobs > 1 and len(unique) >= PARALLEL_PREPROCESS_MIN_TEXTS:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            processed = [text for chunk in pool.map(preprocess_texts, _chunks(unique, jobs * 4))
+                         for text in chunk]
+    else:
+        processed = preprocess_texts(unique)
+    lookup = dict(zip(unique, processed))
+    return [lookup[text] for text in raw_texts]
+
+
+def versioned_dir(target: Path) -> Path:
+    """New hidden directory next to target, to be linked with replace_dir_atomically()"""
+    return target.with_name(f".{target.name}.v{time.time_ns()}-{os.getpid()}")
+
+
+def replace_dir_atomically(new_dir: Path, target: Path):
+    """
+    Point target, a symlink, at the fully written new_dir with one os.replace
+    
+    Readers resolve target to either the old or the new directory, never to
+    nothing. The directory linked before is kept until the next swap, so a
+    process still loading from it can finish; older ones are removed. A
+    target that is still a plain directory is converted once, and that
+    first conversion is not atomic.
+    """
+    if target.is_symlink():
+        previous = os.readlink(target)
+    elif target.exists():
+        previous = f".{target.name}.v0"
+        os.replace(target, target.with_name(previous))
+    else:
+        previous = None
+    
+    link = target.with_name(f".{target.name}.{os.getpid()}.link")
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(new_dir.name, link)
+    os.replace(link, target)
+    
+    for path in target.parent.glob(f".{target.name}.v*"):
+        if path.name not in (new_dir.name, previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def train_and_save(model_type: str, output_dir: str, tfidf_params=None, clf_params=None,
+                   registry_dir=None, promote=True):
+    """
+    Fit one model type on the shared corpus, save it and publish it to the registry
+    Returns (model type, path, stage timings, registry version)
+    """
+    texts, labels = _corpus['texts'], _corpus['labels']
+    output_dir = Path(output_dir)
+    timings = {}
+
+    start = time.perf_counter()
+    model = train_model(model_type, texts, labels, tfidf_params, clf_params)
+    timings['fit'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model_path = output_dir / f'intent_model_{model_type}.pkl'
+    save_model(model, model_type, model_path)
+
+    if model_type in COMPACT_MODEL_TYPES:
+        # Keep the compact serving artifact in sync with the pickle
+        compact_dir = output_dir / f'intent_model_{model_type}'
+        new_dir = versioned_dir(compact_dir)
+        try:
+            export_compact_model(model, new_dir)
+            verify_compact_model(model, load_compact_model(new_dir), texts[:2000])
+        except Exception:
+            shutil.rmtree(new_dir, ignore_errors=True)
+            raise
+        replace_dir_atomically(new_dir, compact_dir)
+    timings['save'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry = ModelRegistry(registry_dir)
+    version = registry.publish(model, model_type, {'examples': len(texts)})
+    if promote:
+        registry.promote(model_type, version)
+    timings['publish'] = time.perf_counter() - start
+
+    return model_type, str(model_path), timings, version
+
+
+def train_all(model_types, data_dir=None, output_dir=None, jobs=None, tuned=False,
+              registry_dir=None, promote=True):
+    """
+    Load, preprocess and train; returns (stage timings, per-model results, example count)
+    tuned: use the parameters saved by a hyperparameter search where available
+    registry_dir/promote: where models are published, and whether they become active
+    """
+    output_dir = Path(output_dir or (CURRENT_DIR / 'models')).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    stages = {}
+
+    start = time.perf_counter()
+    training_data = load_training_data(data_dir)
+    stages['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = preprocess_corpus([text for text, _ in training_data], jobs)
+    labels = [label for _, label in training_data]
+    stages['preprocess'] = time.perf_counter() - start
+
+    params = {
+        model_type: load_tuned_params(model_type, output_dir) if tuned else (None, None)
+        for model_type in model_types
+    }
+
+    start = time.perf_counter()
+    workers = min(jobs, len(model_types))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(texts, labels)) as pool:
+            futures = [pool.submit(train_and_save, model_type, str(output_dir), *params[model_type],
+                                   registry_dir, promote)
+                       for model_type in model_types]
+            results = [future.result() for future in futures]
+    else:
+        _init_worker(texts, labels)
+        results = [train_and_save(model_type, str(output_dir), *params[model_type], registry_dir, promote)
+                   for model_type in model_types]
+    stages['train'] = time.perf_counter() - start
+
+    return stages, results, len(training_data)
+
+
+def run_train(args, parser):
+    model_types = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in model_types if m not in MODEL_TYPES]
+    if unknown:
+        parser.error(f"unknown model type(s): {', '.join(unknown)}")
+
+    total_start = time.perf_counter()
+    stages, results, examples = train_all(model_types, args.data_dir, args.output_dir, args.jobs, args.tuned,
+                                          args.registry, not args.no_promote)
+    total = time.perf_counter() - total_start
+
+    print(f"Trained {len(results)} model(s) on {examples} examples\n")
+    print(f"{'stage':24} {'seconds':>9}")
+    for name, seconds in stages.items():
+        print(f"{name:24} {seconds:9.3f}")
+    for model_type, _, timings, _ in results:
+        for name, seconds in timings.items():
+            print(f"  {model_type + ' ' + name:22} {seconds:9.3f}")
+    print(f"{'total (wall clock)':24} {total:9.3f}")
+    for model_type, path, _, version in results:
+        print(f"Saved {path}, {model_type} version {version}"
+              f"{' (published, not promoted)' if args.no_promote else ' (active)'}")
+
+
+def run_search(args):
+    from hyperparameter_search import run_search as search, print_results, save_best_params
+
+    jobs = max(1, args.jobs or os.cpu_count() or 1)
+    training_data = load_training_data(args.data_dir)
+    texts = preprocess_corpus([text for text, _ in training_data], jobs)
+    labels = [label for _, label in training_data]
+
+    results, summary = search(args.model, texts, labels, args.strategy, args.n_iter,
+                              args.folds, jobs, args.seed)
+    print(f"Hyperparameter search: {args.model}, {summary['strategy']}, {len(texts)} examples\n")
+    print_results(results, summary, args.top)
+
+    if not args.save:
+        print("\nRun with --save to refit the best configuration and save it")
+        return
+
+    output_dir = Path(args.output_dir or (CURRENT_DIR / 'models')).resolve()
+    params_path = save_best_params(results[0], summary, output_dir)
+    _init_worker(texts, labels)
+    _, model_path, _, version = train_and_save(args.model, str(output_dir),
+                                               *load_tuned_params(args.model, output_dir), args.registry)
+    print(f"\nSaved {model_path}, {args.model} version {version} (active)")
+    print(f"Saved {params_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train intent models or search their hyperparameters')
+    subparsers = parser.add_subparsers(dest='command')
+
+    train_parser = subparsers.add_parser('train', help='train models in parallel (default)')
+    train_parser.add_argument('--models', default=','.join(MODEL_TYPES),
+                              help='comma-separated model types')
+    train_parser.add_argument('--tuned', action='store_true',
+                              help='use parameters saved by "search --save" where available')
+    train_parser.add_argument('--no-promote', action='store_true',
+                              help='publish new versions to the registry without activating them')
+
+    search_parser = subparsers.add_parser('search', help='cross-validated hyperparameter search')
+    search_parser.add_argument('--model', choices=MODEL_TYPES, default='logistic')
+    search_parser.add_argument('--strategy', choices=['grid', 'random'], default='grid')
+    search_parser.add_argument('--n-iter', type=int, default=20,
+                               help='candidates sampled by the random strategy')
+    search_parser.add_argument('--folds', type=int, default=5)
+    search_parser.add_argument('--seed', type=int, default=42)
+    search_parser.add_argument('--top', type=int, default=15, help='rows shown (0: all)')
+    search_parser.add_argument('--save', action='store_true',
+                               help='refit the winner on all data and save model + parameters')
+
+    for sub in (train_parser, search_parser):
+        sub.add_argument('--jobs', type=int, default=None,
+                         help='worker processes (default: number of CPUs)')
+        sub.add_argument('--data-dir', default=None, help='training data directory')
+        sub.add_argument('--output-dir', default=None, help='where models are written (default: models/)')
+        sub.add_argument('--registry', default=None, help='model registry directory (default: models/registry)')
+
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in ('train', 'search', '-h', '--help'):
+        argv = ['train'] + argv
+    args = parser.parse_args(argv)
+
+    if args.command == 'search':
+        run_search(args)
+    else:
+        run_train(args, parser)
+
+
+if __name__ == '__main__':
+    main()
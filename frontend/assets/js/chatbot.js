@@ -2,9 +2,16 @@
 (function () {
     let dialogState = 'idle';
     let currentData = {};
+    let sessionId = newSessionId();
     const API_BASE = window.CONFIG ? window.CONFIG.API_BASE : '../../backend/api/';
     let input, sendBtn, chat;
     
+    // Dialog context is kept server-side under this id; only the id travels with each message
+    function newSessionId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+    
     // Utility: scroll to bottom
     function scrollToBottom() {
         setTimeout(() => window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' }), 100);
@@ -99,6 +106,7 @@
     function showMainMenu() {
         dialogState = 'idle';
         currentData = {};
+        sessionId = newSessionId();
         
         appendBotBubble('Hi! I can help you with appointments. What would you like to do?', [
             { text: '🔍 Find Tutor', action: () => startTutorSearch() },
@@ -302,11 +310,11 @@
         });
     }
 
-    function processMessage(text, context = {}) {
+    function processMessage(text) {
         return fetch(API_BASE + '../AI/api/process_message.php', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message: text, context })
+            body: JSON.stringify({ message: text, session_id: sessionId })
         })
         .then(response => response.json())
         .catch(error => {
@@ -329,7 +337,7 @@
         }
 
         // Process message with AI
-        processMessage(text, currentData).then(result => {
+        processMessage(text).then(result => {
             if (!result.success) return handleFallback(text);
             
             console.log(`Intent: ${result.intent} (confidence: ${result.confidence})`);